@@ -1,7 +1,7 @@
 import logging
 import os
 
-from flask import Flask
+from flask import Flask, request
 from flask_cors import CORS
 
 from config import Config
@@ -10,8 +10,11 @@ from routes import register_blueprints
 from services.dispatch_engine import DispatchEngine
 from services.hex_service import HexService
 from services.intelligence_engine import IncidentIntelligenceEngine
+from services.osrm_client import OsrmClient
+from services.route_cache import RouteCache
 from services.route_service import RouteService
 from services.simulation_engine import SimulationEngine
+from services.vehicle_index import VehicleSpatialIndex
 from sockets.events import register_socket_handlers
 
 
@@ -25,45 +28,209 @@ def create_app() -> Flask:
 
     socketio.init_app(app)
 
-    route_service = RouteService(app.config["OSRM_BASE_URL"])
+    route_cache = None
+    if app.config["ROUTE_CACHE_SIZE"] > 0:
+        route_cache = RouteCache(
+            max_entries=app.config["ROUTE_CACHE_SIZE"],
+            ttl_s=app.config["ROUTE_CACHE_TTL_S"],
+            snap_resolution=app.config["ROUTE_CACHE_SNAP_RES"],
+        )
+    osrm_client = OsrmClient(
+        app.config["OSRM_BASE_URL"],
+        pool_size=app.config["OSRM_POOL_SIZE"],
+        retries=app.config["OSRM_RETRIES"],
+        failure_threshold=app.config["OSRM_BREAKER_THRESHOLD"],
+        reset_timeout_s=app.config["OSRM_BREAKER_RESET_S"],
+    )
+    local_router = None
+    if app.config["ROAD_GRAPH_PATH"]:
+        from services.road_graph import LocalRouter
+        try:
+            local_router = LocalRouter(app.config["ROAD_GRAPH_PATH"])
+        except (OSError, ValueError) as error:
+            logger.warning("Road graph not loaded from %s: %s", app.config["ROAD_GRAPH_PATH"], error)
+    route_service = RouteService(
+        app.config["OSRM_BASE_URL"],
+        table_timeout_s=app.config["ETA_TABLE_TIMEOUT_S"],
+        cache=route_cache,
+        client=osrm_client,
+        local_router=local_router,
+        engine=app.config["ROUTE_ENGINE"],
+        simplify_zoom=app.config["ROUTE_SIMPLIFY_ZOOM"],
+    )
     hex_service = HexService(
         app.config["CHENNAI_BBOX"],
         app.config["H3_RESOLUTION"],
     )
+    # Cell boundaries and grid version, built once instead of per GET /api/hex-grid.
+    hex_service.warm_grid()
+    if app.config["HEX_MATRIX_PATH"]:
+        from services.hex_matrix import HexTravelMatrix
+        try:
+            hex_service.travel_matrix = HexTravelMatrix(
+                app.config["HEX_MATRIX_PATH"],
+                resolution=hex_service.resolution,
+                hex_ids=hex_service.generate_chennai_hex_ids(),
+            )
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("Hex travel matrix not loaded from %s: %s", app.config["HEX_MATRIX_PATH"], error)
     intelligence_engine = IncidentIntelligenceEngine(
         incident_density_threshold=app.config["INCIDENT_DENSITY_THRESHOLD"],
         accident_alert_threshold=app.config["ACCIDENT_ALERT_THRESHOLD"],
     )
-    dispatch_engine = DispatchEngine(route_service=route_service, hex_service=hex_service)
+    vehicle_index = VehicleSpatialIndex(
+        resolution=app.config["VEHICLE_INDEX_RESOLUTION"],
+        resync_interval_s=app.config["VEHICLE_INDEX_RESYNC_S"],
+    )
+    dispatch_engine = DispatchEngine(
+        route_service=route_service,
+        hex_service=hex_service,
+        vehicle_index=vehicle_index,
+        eta_ranking=app.config["ETA_RANKING_ENABLED"],
+        fallback_speed_kmh=app.config["ETA_FALLBACK_SPEED_KMH"],
+    )
     simulation_engine = SimulationEngine(
         hex_service=hex_service,
         dispatch_engine=dispatch_engine,
         intelligence_engine=intelligence_engine,
     )
 
+    app.extensions["route_service"] = route_service
     app.extensions["hex_service"] = hex_service
     app.extensions["dispatch_engine"] = dispatch_engine
+    app.extensions["vehicle_index"] = vehicle_index
     app.extensions["intelligence_engine"] = intelligence_engine
     app.extensions["simulation_engine"] = simulation_engine
 
+    if app.config["DISPATCH_ASYNC"]:
+        from services.dispatch_queue import DispatchQueue
+        from services.dispatch_scheduler import CRITICAL, ROUTINE, URGENT
+
+        dispatch_queue = DispatchQueue(
+            dispatch_engine,
+            workers=app.config["DISPATCH_WORKERS"],
+            max_depth=app.config["DISPATCH_QUEUE_MAX"],
+            aging_s=app.config["DISPATCH_AGING_S"],
+            max_boost=app.config["DISPATCH_MAX_BOOST"],
+            slo_s={
+                CRITICAL: app.config["DISPATCH_SLO_CRITICAL_S"],
+                URGENT: app.config["DISPATCH_SLO_URGENT_S"],
+                ROUTINE: app.config["DISPATCH_SLO_ROUTINE_S"],
+            },
+        )
+        dispatch_queue.start()
+        app.extensions["dispatch_queue"] = dispatch_queue
+
+    preemption_engine = None
+    if app.config["PREEMPTION_ENABLED"]:
+        from services.preemption import PreemptionEngine
+
+        preemption_engine = PreemptionEngine(
+            dispatch_engine,
+            max_radius_km=app.config["PREEMPTION_MAX_RADIUS_KM"],
+            resolution=app.config["VEHICLE_INDEX_RESOLUTION"],
+        )
+        if "dispatch_queue" in app.extensions:
+            preemption_engine.requeue = app.extensions["dispatch_queue"].submit
+        dispatch_engine.preemption = preemption_engine
+        app.extensions["preemption_engine"] = preemption_engine
+
     register_blueprints(app)
     register_socket_handlers(socketio)
 
     with app.app_context():
         try:
-            from utils.db import ensure_vehicles_table, ensure_incidents_table
-            ensure_vehicles_table()
-            ensure_incidents_table()
+            from utils.migrations import run_migrations
+            run_migrations()
         except RuntimeError as error:
             logger.warning("DB init skipped: %s", error)
         try:
-            hex_service.ensure_hex_cells_in_db()
+            hex_service.ensure_bootstrapped()
         except RuntimeError as error:
             logger.warning("Hex bootstrap skipped at startup: %s", error)
+        try:
+            vehicle_index.resync()
+        except RuntimeError as error:
+            logger.warning("Vehicle index load skipped at startup: %s", error)
+        if preemption_engine is not None:
+            try:
+                preemption_engine.resync()
+            except RuntimeError as error:
+                logger.warning("Busy unit index load skipped at startup: %s", error)
+
+    if app.config["CHANGE_FEED_ENABLED"]:
+        from services.change_feed import ChangeFeed, CoalescingTrigger
+
+        change_feed = ChangeFeed()
+
+        def dispatch_waiting():
+            # With a queue, its workers own dispatching: hand them the waiting incidents they
+            # do not already hold instead of racing them with a batch pass.
+            waiting = dispatch_engine.unassigned_incidents()
+            dispatch_queue = app.extensions.get("dispatch_queue")
+            if dispatch_queue is not None:
+                for incident in waiting:
+                    if not dispatch_queue.owns(incident["id"]):
+                        dispatch_queue.submit(incident)
+            elif waiting:
+                dispatch_engine.dispatch_unassigned()
+
+        redispatch = CoalescingTrigger(dispatch_waiting, name="auto-dispatch")
+
+        def on_vehicle_change(event):
+            # A unit became dispatchable: give it to any incident still waiting.
+            if event.op != "DELETE" and event.status in ("available", "patrolling"):
+                redispatch()
+
+        def sync_vehicle_index(event):
+            # Keeps the index current with status changes made by other processes.
+            if event.op == "DELETE":
+                vehicle_index.remove(event.id)
+                if preemption_engine is not None:
+                    preemption_engine.busy_index.remove(event.id)
+            elif event.data.get("latitude") is not None:
+                vehicle_index.upsert({"id": event.id, **event.data})
+            else:
+                vehicle_index.update_status(event.id, event.status)
+
+        change_feed.subscribe(sync_vehicle_index, tables=("vehicles",))
+        change_feed.subscribe(on_vehicle_change, tables=("vehicles",))
+        change_feed.start()
+        app.extensions["change_feed"] = change_feed
+
+    @app.before_request
+    def begin_db_metrics():
+        from utils.db import start_request_metrics
+        start_request_metrics()
+
+    @app.after_request
+    def add_db_server_timing(response):
+        from utils.db import finish_request_metrics
+        metrics = finish_request_metrics()
+        if metrics is None:
+            return response
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={metrics["db_ms"]:.2f};desc="{metrics["queries"]} queries"',
+        )
+        for statement, calls in metrics["repeated"].items():
+            logger.warning("%s %s ran the same query %d times: %s", request.method, request.path, calls, statement)
+        return response
 
     @app.get("/health")
     def healthcheck():
-        return {"status": "ok"}, 200
+        from services.dispatch_routes import write_stats as route_write_stats
+        from utils.db import REPLICA, get_pool_stats
+        dispatch_queue = app.extensions.get("dispatch_queue")
+        return {
+            "status": "ok",
+            "db_pool": get_pool_stats(),
+            "db_read_pool": get_pool_stats(REPLICA),
+            "dispatch_queue": dispatch_queue.stats() if dispatch_queue is not None else None,
+            "route_cache": route_cache.stats() if route_cache is not None else None,
+            "osrm": osrm_client.stats(),
+            "dispatch_routes": route_write_stats(),
+        }, 200
 
     @app.errorhandler(RuntimeError)
     def handle_runtime_error(error: RuntimeError):
@@ -27,4 +27,57 @@ class Config:
 
     OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "https://router.project-osrm.org")
 
+    # Shared OSRM client: keep-alive pool, retries with jitter, circuit breaker
+    OSRM_POOL_SIZE = int(os.getenv("OSRM_POOL_SIZE", "16"))
+    OSRM_RETRIES = int(os.getenv("OSRM_RETRIES", "2"))
+    OSRM_BREAKER_THRESHOLD = int(os.getenv("OSRM_BREAKER_THRESHOLD", "5"))
+    OSRM_BREAKER_RESET_S = float(os.getenv("OSRM_BREAKER_RESET_S", "30"))
+
+    # Offline road graph (scripts/build_road_graph.py). ROUTE_ENGINE=local routes in-process first;
+    # with "osrm" the graph only replaces straight-line fallbacks when OSRM is down.
+    ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH", "")
+    ROUTE_ENGINE = os.getenv("ROUTE_ENGINE", "osrm").lower()
+
+    # Precomputed hex-to-hex durations (scripts/build_hex_matrix.py); ETA ranking uses it when OSRM fails
+    HEX_MATRIX_PATH = os.getenv("HEX_MATRIX_PATH", "")
+
+    # LRU + TTL cache of OSRM routes keyed by endpoints snapped to H3 cells
+    ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "5000"))
+    ROUTE_CACHE_TTL_S = float(os.getenv("ROUTE_CACHE_TTL_S", "600"))
+    ROUTE_CACHE_SNAP_RES = int(os.getenv("ROUTE_CACHE_SNAP_RES", "10"))
+
+    # Route payloads are Douglas–Peucker simplified for this map zoom unless a client asks for full precision
+    ROUTE_SIMPLIFY_ZOOM = float(os.getenv("ROUTE_SIMPLIFY_ZOOM", "15"))
+
+    # GET /api/dispatches/active: concurrent route fetches and per-request deadline
+    ACTIVE_ROUTES_WORKERS = int(os.getenv("ACTIVE_ROUTES_WORKERS", "8"))
+    ACTIVE_ROUTES_DEADLINE_S = float(os.getenv("ACTIVE_ROUTES_DEADLINE_S", "2.5"))
+
+    # Rank nearby units by driving ETA (one OSRM /table call); haversine when off or OSRM is slow
+    ETA_RANKING_ENABLED = os.getenv("ETA_RANKING_ENABLED", "true").lower() in ("1", "true", "yes")
+    ETA_TABLE_TIMEOUT_S = float(os.getenv("ETA_TABLE_TIMEOUT_S", "1.0"))
+    ETA_FALLBACK_SPEED_KMH = float(os.getenv("ETA_FALLBACK_SPEED_KMH", "30"))
+
+    # In-memory vehicle spatial index (H3 buckets) for nearest-unit queries
+    VEHICLE_INDEX_RESOLUTION = int(os.getenv("VEHICLE_INDEX_RESOLUTION", "8"))
+    VEHICLE_INDEX_RESYNC_S = float(os.getenv("VEHICLE_INDEX_RESYNC_S", "30"))
+
+    # Background dispatch: intake returns 202 and a worker pool dispatches
+    DISPATCH_ASYNC = os.getenv("DISPATCH_ASYNC", "true").lower() in ("1", "true", "yes")
+    DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "4"))
+    DISPATCH_QUEUE_MAX = int(os.getenv("DISPATCH_QUEUE_MAX", "500"))
+    # Priority classes (critical > urgent > routine): aging and time-to-dispatch SLOs
+    DISPATCH_AGING_S = float(os.getenv("DISPATCH_AGING_S", "60"))
+    DISPATCH_MAX_BOOST = float(os.getenv("DISPATCH_MAX_BOOST", "2"))
+    DISPATCH_SLO_CRITICAL_S = float(os.getenv("DISPATCH_SLO_CRITICAL_S", "5"))
+    DISPATCH_SLO_URGENT_S = float(os.getenv("DISPATCH_SLO_URGENT_S", "30"))
+    DISPATCH_SLO_ROUTINE_S = float(os.getenv("DISPATCH_SLO_ROUTINE_S", "300"))
+
+    # Redirect a busy unit from lower-priority work when no matching unit is free
+    PREEMPTION_ENABLED = os.getenv("PREEMPTION_ENABLED", "true").lower() in ("1", "true", "yes")
+    PREEMPTION_MAX_RADIUS_KM = float(os.getenv("PREEMPTION_MAX_RADIUS_KM", "8"))
+
+    # Postgres LISTEN/NOTIFY feed: auto-dispatch waiting incidents when a unit frees up
+    CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() in ("1", "true", "yes")
+
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -8,6 +8,7 @@ from routes.radio import radio_bp
 from routes.simulation import simulation_bp
 from routes.vehicles import vehicles_bp
 from routes.dispatches import dispatches_bp
+from routes.db_stats import db_stats_bp
 
 
 def register_blueprints(app):
@@ -21,3 +22,4 @@ def register_blueprints(app):
     app.register_blueprint(simulation_bp)
     app.register_blueprint(vehicles_bp)
     app.register_blueprint(dispatches_bp)
+    app.register_blueprint(db_stats_bp)
@@ -0,0 +1,23 @@
+from flask import Blueprint, request
+
+from utils.db import REPLICA, get_pool_stats, query_stats
+
+
+db_stats_bp = Blueprint("db_stats", __name__, url_prefix="/api/db")
+
+
+@db_stats_bp.get("/stats")
+def get_db_stats():
+    """Pool usage plus the statements with the most total DB time and recent slow queries."""
+    limit = max(1, min(request.args.get("limit", 20, type=int), 200))
+    return {
+        "pool": get_pool_stats(),
+        "read_pool": get_pool_stats(REPLICA),
+        **query_stats.summary(limit=limit),
+    }, 200
+
+
+@db_stats_bp.post("/stats/reset")
+def reset_db_stats():
+    query_stats.reset()
+    return {"ok": True}, 200
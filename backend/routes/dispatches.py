@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from flask import Blueprint, current_app
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
 
-from utils.db import fetch_all
+from flask import Blueprint, Response, current_app, request
+
+from services.dispatch_routes import TO_HOSPITAL, record_route, route_from_row, write_failed
+from services.route_service import FULL, LOCAL, OSRM, SIMPLIFIED
+from utils.db import fetch_all_read
 
 
 dispatches_bp = Blueprint("dispatches", __name__, url_prefix="/api/dispatches")
@@ -11,12 +18,24 @@ dispatches_bp = Blueprint("dispatches", __name__, url_prefix="/api/dispatches")
 @dispatches_bp.get("/active")
 def list_active_dispatches():
     """
-    Return currently active dispatches with recomputed routes.
+    Return currently active dispatches with their routes.
 
     Used by the frontend on initial load so that the glowing dispatch route
-    persists across page refreshes.
+    persists across page refreshes. Routes come from ``dispatch_routes`` (the
+    route the unit was sent on, current leg) in the same query. Dispatches with
+    no stored route (assigned before it existed, or the write after dispatch was
+    lost) are routed to the leg's destination concurrently on a bounded pool,
+    and road routes found that way are stored so the row heals; those not back
+    within the deadline
+    (``ACTIVE_ROUTES_DEADLINE_S``, or a shorter ``deadline_ms``) are returned as
+    straight-line fallbacks with ``route_timed_out`` set and ``partial: true``.
+    ``route_stored`` says whether the route came from ``dispatch_routes``;
+    ``route_store_failed`` marks dispatches whose route write failed, as
+    opposed to one that is still being computed.
+    ``format=ndjson`` streams each dispatch as its route resolves. Routes are
+    encoded polylines, simplified for ``zoom`` unless ``precision=full``.
     """
-    rows = fetch_all(
+    rows = fetch_all_read(
         """
         SELECT
             i.id AS incident_id,
@@ -27,57 +46,177 @@ def list_active_dispatches():
             i.assigned_vehicle_id,
             i.status AS incident_status,
             i.created_at AS incident_created_at,
+            i.hospital_lat,
+            i.hospital_lng,
             v.id AS vehicle_id,
             v.type AS vehicle_type,
             v.latitude AS veh_lat,
             v.longitude AS veh_lng,
             v.status AS vehicle_status,
-            v.current_hex_id
+            v.current_hex_id,
+            COALESCE(i.leg_phase, 'to_scene') AS leg,
+            dr.geometry AS route_geometry,
+            dr.distance_m AS route_distance_m,
+            dr.duration_s AS route_duration_s,
+            dr.source AS route_source,
+            dr.corridor_hexes AS route_corridor_hexes
         FROM incidents i
         JOIN vehicles v ON i.assigned_vehicle_id = v.id
+        LEFT JOIN dispatch_routes dr
+            ON dr.incident_id = i.id
+            AND dr.leg = COALESCE(i.leg_phase, 'to_scene')
+            AND dr.vehicle_id = i.assigned_vehicle_id
         WHERE i.attended = FALSE
         """
     )
 
     if not rows:
+        if request.args.get("format") == "ndjson":
+            return Response("", mimetype="application/x-ndjson")
         return {"dispatches": []}, 200
 
     dispatch_engine = current_app.extensions["dispatch_engine"]
-    route_service = dispatch_engine.route_service
-    hex_service = current_app.extensions["hex_service"]
+    deadline_s = current_app.config["ACTIVE_ROUTES_DEADLINE_S"]
+    if request.args.get("deadline_ms"):
+        try:
+            deadline_s = min(deadline_s, max(0.0, float(request.args["deadline_ms"]) / 1000))
+        except ValueError:
+            return {"error": "deadline_ms must be a number"}, 400
+    precision = request.args.get("precision", SIMPLIFIED)
+    if precision not in (FULL, SIMPLIFIED):
+        return {"error": "precision must be 'full' or 'simplified'"}, 400
+    zoom = None
+    if request.args.get("zoom"):
+        try:
+            zoom = min(22.0, max(0.0, float(request.args["zoom"])))
+        except ValueError:
+            return {"error": "zoom must be a number"}, 400
+
+    stored = [r for r in rows if r["route_geometry"] is not None]
+    missing = [r for r in rows if r["route_geometry"] is None]
+    futures = {}
+    if missing:
+        pool = _route_pool(current_app.config["ACTIVE_ROUTES_WORKERS"])
+        futures = {pool.submit(_fetch_route, dispatch_engine, r): r for r in missing}
+
+    if request.args.get("format") == "ndjson":
+        # One dispatch per line as soon as its route resolves; stragglers follow as fallbacks.
+        def generate():
+            for row, fetched, timed_out in _resolve(stored, futures, deadline_s):
+                payload = _dispatch_payload(dispatch_engine, row, fetched, timed_out, precision, zoom)
+                yield json.dumps(payload, default=str) + "\n"
+
+        return Response(generate(), mimetype="application/x-ndjson")
 
     dispatches = []
-    for r in rows:
-        route = route_service.get_route(
-            start_lat=float(r["veh_lat"]),
-            start_lng=float(r["veh_lng"]),
-            end_lat=float(r["inc_lat"]),
-            end_lng=float(r["inc_lng"]),
-        )
-        green_corridor_hexes = list(
-            {
-                hex_service.get_hex_id_from_latlng(lat=pt[0], lng=pt[1])
-                for pt in route.get("geometry", [])
-            }
-        )
-
-        vehicle_payload = {
-            "id": str(r["vehicle_id"]),
-            "type": r["vehicle_type"],
-            "latitude": float(r["veh_lat"]),
-            "longitude": float(r["veh_lng"]),
-            "status": r["vehicle_status"],
-            "current_hex_id": r["current_hex_id"],
-        }
-
-        dispatch_payload = {
-            "incident_id": str(r["incident_id"]),
-            "vehicle": vehicle_payload,
-            "route": route,
-            "green_corridor_hexes": green_corridor_hexes,
-        }
-
-        dispatches.append(dispatch_payload)
-
-    return {"dispatches": dispatches}, 200
+    partial = False
+    for row, fetched, timed_out in _resolve(stored, futures, deadline_s):
+        partial = partial or timed_out
+        dispatches.append(_dispatch_payload(dispatch_engine, row, fetched, timed_out, precision, zoom))
+    return {"dispatches": dispatches, "partial": partial}, 200
+
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _route_pool(workers: int) -> ThreadPoolExecutor:
+    """Process-wide bounded pool, so concurrent page loads share ``workers`` OSRM slots."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="active-routes")
+        return _pool
+
+
+def _destination(r: dict) -> tuple[float, float]:
+    """Where the current leg ends: the hospital on ``to_hospital`` (when known), else the scene."""
+    if r["leg"] == TO_HOSPITAL and r.get("hospital_lat") is not None and r.get("hospital_lng") is not None:
+        return float(r["hospital_lat"]), float(r["hospital_lng"])
+    return float(r["inc_lat"]), float(r["inc_lng"])
+
+
+def _fetch_route(dispatch_engine, r: dict) -> tuple[dict, list[str]]:
+    """Route a dispatch with no stored row and store road routes, so the next load reads them."""
+    end_lat, end_lng = _destination(r)
+    route = dispatch_engine.route_service.get_route(
+        start_lat=float(r["veh_lat"]),
+        start_lng=float(r["veh_lng"]),
+        end_lat=end_lat,
+        end_lng=end_lng,
+    )
+    green_corridor_hexes = dispatch_engine._extract_route_hexes(route.get("geometry", []))
+    # A straight-line fallback is not stored; OSRM gets another chance on the next load.
+    if route.get("source") in (OSRM, LOCAL):
+        record_route(r["incident_id"], r["vehicle_id"], r["leg"], route, green_corridor_hexes)
+    return route, green_corridor_hexes
+
+
+def _resolve(stored: list[dict], futures: dict, deadline_s: float):
+    """
+    Yield (row, fetched, timed_out): stored routes first (fetched None, read
+    from the row), then fetched (route, corridor hexes) in completion order
+    until the deadline, then straight-line fallbacks for the rest. Late
+    fetches keep running, store their routes and warm the cache for the next
+    load.
+    """
+    for row in stored:
+        yield row, None, False
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline_s):
+            pending.discard(future)
+            row = futures[future]
+            try:
+                yield row, future.result(), False
+            except Exception:
+                yield row, None, False
+    except FuturesTimeout:
+        pass
+    for future in pending:
+        yield futures[future], None, True
+
+
+def _dispatch_payload(
+    dispatch_engine,
+    r: dict,
+    fetched: tuple[dict, list[str]] | None,
+    timed_out: bool,
+    precision: str,
+    zoom: float | None,
+) -> dict:
+    route_service = dispatch_engine.route_service
+    if r["route_geometry"] is not None:
+        green_corridor_hexes = list(r["route_corridor_hexes"] or [])
+        if precision == FULL:
+            # Stored polylines are already full precision; no decode/encode round trip.
+            route_payload = {**route_from_row(r, decode=False), "precision": FULL}
+        else:
+            route_payload = route_service.encode_route(route_from_row(r), precision, zoom)
+    elif fetched is not None:
+        route, green_corridor_hexes = fetched
+        route_payload = route_service.encode_route(route, precision, zoom)
+    else:
+        route = route_service._fallback_route(float(r["veh_lat"]), float(r["veh_lng"]), *_destination(r))
+        green_corridor_hexes = dispatch_engine._extract_route_hexes(route.get("geometry", []))
+        route_payload = route_service.encode_route(route, precision, zoom)
+
+    vehicle_payload = {
+        "id": str(r["vehicle_id"]),
+        "type": r["vehicle_type"],
+        "latitude": float(r["veh_lat"]),
+        "longitude": float(r["veh_lng"]),
+        "status": r["vehicle_status"],
+        "current_hex_id": r["current_hex_id"],
+    }
 
+    return {
+        "incident_id": str(r["incident_id"]),
+        "leg": r["leg"],
+        "vehicle": vehicle_payload,
+        "route": route_payload,
+        "green_corridor_hexes": green_corridor_hexes,
+        "route_timed_out": timed_out,
+        "route_stored": r["route_geometry"] is not None,
+        "route_store_failed": r["route_geometry"] is None and write_failed(r["incident_id"], r["leg"]),
+    }
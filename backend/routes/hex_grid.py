@@ -1,33 +1,43 @@
-from flask import Blueprint, current_app
+from flask import Blueprint, current_app, request
 
-from utils.db import fetch_all
+from utils.db import fetch_all_read
 
 hex_grid_bp = Blueprint("hex_grid", __name__, url_prefix="/api/hex-grid")
 
 
 @hex_grid_bp.get("")
 def get_hex_grid():
+    """
+    Grid cells with polygons and counts. Geometry comes from memory; only the
+    counts are read per request. The ETag covers both, so a client whose copy
+    is current gets 304 without the payload being built.
+    """
     hex_service = current_app.extensions["hex_service"]
-    inserted = hex_service.ensure_hex_cells_in_db()
-    cells = hex_service.get_hex_grid_payload()
+    inserted = hex_service.ensure_bootstrapped()
+    counts = hex_service.fetch_cell_counts()
+    etag = hex_service.grid_etag(counts)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return "", 304, headers
     return {
         "resolution": hex_service.resolution,
+        "version": hex_service.grid_version,
         "inserted": inserted,
-        "cells": cells,
-    }, 200
+        "cells": hex_service.get_hex_grid_payload(counts),
+    }, 200, headers
 
 
 @hex_grid_bp.get("/incidents-summary")
 def get_hex_incidents_summary():
     """Hex cells with incident count and type breakdown, sorted by incident_count DESC."""
-    rows = fetch_all(
+    rows = fetch_all_read(
         """
         SELECT hc.hex_id, hc.center_lat, hc.center_lng, hc.incident_count, hc.patrol_priority_score
         FROM hex_cells hc
         ORDER BY hc.incident_count DESC, hc.hex_id ASC
         """
     )
-    type_rows = fetch_all(
+    type_rows = fetch_all_read(
         """
         SELECT hex_id, type, COUNT(*)::int AS cnt
         FROM incidents
@@ -45,10 +55,9 @@ def get_hex_incidents_summary():
     hex_service = current_app.extensions["hex_service"]
     cells = []
     for r in rows:
-        boundary = hex_service._hex_boundary(r["hex_id"])
         cells.append({
             "hex_id": r["hex_id"],
-            "polygon": boundary,
+            "polygon": hex_service.cell_geometry(r["hex_id"])["polygon"],
             "center": [r["center_lat"], r["center_lng"]],
             "incident_count": r["incident_count"],
             "patrol_priority_score": float(r["patrol_priority_score"]),
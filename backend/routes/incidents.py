@@ -1,10 +1,15 @@
+import base64
+import binascii
+import json
 import os
+import uuid
+from datetime import datetime
 
 import requests
-from flask import Blueprint, current_app, request, Response
+from flask import Blueprint, current_app, request, Response, stream_with_context
 
 from extensions import socketio
-from utils.db import fetch_all, fetch_one
+from utils.db import fetch_all_read, fetch_one, stream_rows, transaction
 
 
 incidents_bp = Blueprint("incidents", __name__, url_prefix="/api/incidents")
@@ -47,37 +52,39 @@ def create_incident():
     hex_service = current_app.extensions["hex_service"]
     intelligence_engine = current_app.extensions["intelligence_engine"]
     dispatch_engine = current_app.extensions["dispatch_engine"]
+    dispatch_queue = current_app.extensions.get("dispatch_queue")
 
     hex_id = hex_service.get_hex_id_from_latlng(float(latitude), float(longitude))
-    hex_service.ensure_hex_exists(hex_id)
     db_type = _normalize_incident_type(str(incident_type))
+    # Rank units by ETA before the transaction so OSRM never runs while rows are locked.
+    ranking = None
+    if dispatch_queue is None:
+        ranking = dispatch_engine.rank_candidates(
+            {"type": db_type, "latitude": float(latitude), "longitude": float(longitude)}
+        )
 
-    incident = fetch_one(
-        """
-        INSERT INTO incidents (type, latitude, longitude, hex_id, status)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, created_at
-        """,
-        (db_type, float(latitude), float(longitude), hex_id, "new"),
-    )
+    # Create, score and (without the dispatch queue) assign in one transaction;
+    # routing and socket events follow the commit.
+    with transaction():
+        hex_service.ensure_hex_exists(hex_id)
+        incident = fetch_one(
+            """
+            INSERT INTO incidents (type, latitude, longitude, hex_id, status)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, created_at
+            """,
+            (db_type, float(latitude), float(longitude), hex_id, "new"),
+        )
 
-    if not incident:
-        return {"error": "Failed to create incident"}, 500
+        if not incident:
+            return {"error": "Failed to create incident"}, 500
 
-    alerts = intelligence_engine.process_incident(incident)
-    dispatch_payload = dispatch_engine.dispatch(incident)
+        alerts = intelligence_engine.process_incident(incident)
+        vehicle = dispatch_engine.assign(incident, ranking) if dispatch_queue is None else None
 
-    latest_incident = fetch_one(
-        """
-        SELECT id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, created_at
-        FROM incidents
-        WHERE id = %s
-        """,
-        (incident["id"],),
-    )
-
-    if not latest_incident:
-        return {"error": "Failed to load incident state"}, 500
+    if dispatch_queue is None:
+        dispatch_payload = dispatch_engine.complete_dispatch(incident, vehicle)
+    latest_incident = incident
 
     created_at = latest_incident["created_at"]
     created_at_iso = created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at)
@@ -96,6 +103,12 @@ def create_incident():
         },
     )
 
+    dispatch_status = None
+    if dispatch_queue is not None:
+        # Queued after new_incident so clients know the incident before vehicle_dispatched arrives.
+        dispatch_payload = None
+        dispatch_status = dispatch_queue.submit(incident)
+
     return {
         "incident": {
             "id": latest_incident["id"],
@@ -108,6 +121,7 @@ def create_incident():
             "created_at": created_at_iso,
         },
         "dispatch": dispatch_payload,
+        "dispatch_status": dispatch_status,
         "alerts": [
             {
                 "id": alert["id"],
@@ -117,7 +131,7 @@ def create_incident():
             }
             for alert in alerts
         ],
-    }, 201
+    }, 202 if dispatch_status else 201
 
 
 @incidents_bp.post("/telegram")
@@ -134,48 +148,51 @@ def create_incident_telegram():
     hex_service = current_app.extensions["hex_service"]
     intelligence_engine = current_app.extensions["intelligence_engine"]
     dispatch_engine = current_app.extensions["dispatch_engine"]
+    dispatch_queue = current_app.extensions.get("dispatch_queue")
 
     hex_id = hex_service.get_hex_id_from_latlng(float(latitude), float(longitude))
-    hex_service.ensure_hex_exists(hex_id)
     db_type = _normalize_incident_type(str(incident_type))
+    # Rank units by ETA before the transaction so OSRM never runs while rows are locked.
+    ranking = None
+    if dispatch_queue is None:
+        ranking = dispatch_engine.rank_candidates(
+            {"type": db_type, "latitude": float(latitude), "longitude": float(longitude)}
+        )
 
-    incident = fetch_one(
-        """
-        INSERT INTO incidents (
-            type, latitude, longitude, hex_id, status, report_id, photo_file_id, video_url, voice_url, source
+    with transaction():
+        hex_service.ensure_hex_exists(hex_id)
+        incident = fetch_one(
+            """
+            INSERT INTO incidents (
+                type, latitude, longitude, hex_id, status, report_id, photo_file_id, video_url, voice_url, source
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, report_id,
+                      photo_file_id, photo_url, created_at
+            """,
+            (
+                db_type,
+                float(latitude),
+                float(longitude),
+                hex_id,
+                "new",
+                payload.get("report_id"),
+                payload.get("photo_file_id"),
+                payload.get("video_file_id"),
+                payload.get("voice_file_id"),
+                "telegram",
+            ),
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, report_id, photo_file_id, created_at
-        """,
-        (
-            db_type,
-            float(latitude),
-            float(longitude),
-            hex_id,
-            "new",
-            payload.get("report_id"),
-            payload.get("photo_file_id"),
-            payload.get("video_file_id"),
-            payload.get("voice_file_id"),
-            "telegram",
-        ),
-    )
 
-    if not incident:
-        return {"error": "Failed to create incident"}, 500
+        if not incident:
+            return {"error": "Failed to create incident"}, 500
 
-    alerts = intelligence_engine.process_incident(incident)
-    dispatch_payload = dispatch_engine.dispatch(incident)
+        alerts = intelligence_engine.process_incident(incident)
+        vehicle = dispatch_engine.assign(incident, ranking) if dispatch_queue is None else None
 
-    latest = fetch_one(
-        """
-        SELECT id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, report_id, photo_url, created_at
-        FROM incidents WHERE id = %s
-        """,
-        (incident["id"],),
-    )
-    if not latest:
-        return {"error": "Failed to load incident"}, 500
+    if dispatch_queue is None:
+        dispatch_payload = dispatch_engine.complete_dispatch(incident, vehicle)
+    latest = incident
 
     created_at = latest["created_at"]
     created_at_iso = created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at)
@@ -196,6 +213,11 @@ def create_incident_telegram():
         },
     )
 
+    dispatch_status = None
+    if dispatch_queue is not None:
+        dispatch_payload = None
+        dispatch_status = dispatch_queue.submit(incident)
+
     return {
         "incident": {
             "id": str(latest["id"]),
@@ -210,46 +232,135 @@ def create_incident_telegram():
             "created_at": created_at_iso,
         },
         "dispatch": dispatch_payload,
+        "dispatch_status": dispatch_status,
         "alerts": [{"id": a["id"], "hex_id": a["hex_id"], "alert_type": a["alert_type"], "message": a["message"]} for a in alerts],
-    }, 201
+    }, 202 if dispatch_status else 201
+
+
+INCIDENT_LIST_COLUMNS = """
+    id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, attended,
+    report_id, photo_url, photo_file_id, video_url, voice_url, source, created_at
+"""
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+def _encode_cursor(created_at, incident_id) -> str:
+    raw = f"{created_at.isoformat()}|{incident_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of _encode_cursor. Raises ValueError on malformed input."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, incident_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), str(uuid.UUID(incident_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError("invalid cursor") from error
+
+
+def _parse_bool(raw: str) -> bool:
+    value = raw.strip().lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+    raise ValueError(f"invalid boolean: {raw}")
+
+
+def _incident_filters(args) -> tuple[list[str], list]:
+    """WHERE clauses and params for list filters. Raises ValueError on bad input."""
+    clauses: list[str] = []
+    params: list = []
+    for column in ("status", "type", "hex_id", "source"):
+        value = args.get(column)
+        if value:
+            clauses.append(f"{column} = %s")
+            params.append(value)
+    if args.get("attended"):
+        clauses.append("attended = %s")
+        params.append(_parse_bool(args["attended"]))
+    if args.get("since"):
+        clauses.append("created_at >= %s")
+        params.append(datetime.fromisoformat(args["since"]))
+    if args.get("until"):
+        clauses.append("created_at < %s")
+        params.append(datetime.fromisoformat(args["until"]))
+    if args.get("before"):
+        before_created_at, before_id = _decode_cursor(args["before"])
+        clauses.append("(created_at, id) < (%s, %s::uuid)")
+        params.extend([before_created_at, before_id])
+    return clauses, params
+
+
+def _incident_list_item(r: dict, base: str) -> dict:
+    created = r.get("created_at")
+    photo_file_id = r.get("photo_file_id")
+    photo_url = r.get("photo_url")
+    if photo_file_id:
+        photo_url = f"{base}/api/incidents/photo?file_id={photo_file_id}"
+    return {
+        "id": str(r["id"]),
+        "type": r["type"],
+        "latitude": r["latitude"],
+        "longitude": r["longitude"],
+        "hex_id": r["hex_id"],
+        "assigned_vehicle_id": str(r["assigned_vehicle_id"]) if r.get("assigned_vehicle_id") else None,
+        "status": r["status"],
+        "attended": bool(r.get("attended", False)),
+        "report_id": r.get("report_id"),
+        "photo_url": photo_url,
+        "video_url": r.get("video_url"),
+        "voice_url": r.get("voice_url"),
+        "source": r.get("source", "web"),
+        "created_at": created.isoformat() if created and hasattr(created, "isoformat") else str(created or ""),
+    }
 
 
 @incidents_bp.get("")
 def list_incidents():
-    """List all incidents."""
-    rows = fetch_all(
-        """
-        SELECT id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, attended,
-               report_id, photo_url, photo_file_id, video_url, voice_url, source, created_at
-        FROM incidents
-        ORDER BY created_at DESC
-        """
-    )
+    """
+    List incidents, newest first, one page at a time.
+
+    Query params: limit (default 200, max 1000), before (next_cursor from the previous
+    page), status, type, hex_id, source, attended, since, until (ISO timestamps).
+    format=ndjson streams every matching row as newline-delimited JSON instead
+    (at most ``limit`` rows when one is given).
+    """
+    try:
+        clauses, params = _incident_filters(request.args)
+        limit = request.args.get("limit", type=int)
+    except ValueError as error:
+        return {"error": f"Invalid filter: {error}"}, 400
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT {INCIDENT_LIST_COLUMNS} FROM incidents {where} ORDER BY created_at DESC, id DESC"
     base = os.getenv("API_BASE_URL", "").rstrip("/") or (request.host_url or "").rstrip("/") or f"http://localhost:{os.getenv('PORT', '8000')}"
-    incidents = []
-    for r in rows:
-        created = r.get("created_at")
-        photo_file_id = r.get("photo_file_id")
-        photo_url = r.get("photo_url")
-        if photo_file_id:
-            photo_url = f"{base}/api/incidents/photo?file_id={photo_file_id}"
-        incidents.append({
-            "id": str(r["id"]),
-            "type": r["type"],
-            "latitude": r["latitude"],
-            "longitude": r["longitude"],
-            "hex_id": r["hex_id"],
-            "assigned_vehicle_id": str(r["assigned_vehicle_id"]) if r.get("assigned_vehicle_id") else None,
-            "status": r["status"],
-            "attended": bool(r.get("attended", False)),
-            "report_id": r.get("report_id"),
-            "photo_url": photo_url,
-            "video_url": r.get("video_url"),
-            "voice_url": r.get("voice_url"),
-            "source": r.get("source", "web"),
-            "created_at": created.isoformat() if created and hasattr(created, "isoformat") else str(created or ""),
-        })
-    return {"incidents": incidents}
+
+    if request.args.get("format") == "ndjson":
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(max(1, min(limit, MAX_PAGE_SIZE)))
+
+        def generate():
+            for r in stream_rows(query, params, read=True):
+                yield json.dumps(_incident_list_item(r, base)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    # One extra row tells us whether another page exists.
+    rows = fetch_all_read(query + " LIMIT %s", (*params, limit + 1))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
+    return {
+        "incidents": [_incident_list_item(r, base) for r in rows],
+        "next_cursor": next_cursor,
+    }
 
 
 @incidents_bp.get("/photo")
@@ -292,21 +403,54 @@ def proxy_telegram_photo():
 
 @incidents_bp.post("/dispatch-unassigned")
 def dispatch_unassigned():
-    """Assign nearest vehicle to any unassigned incidents. Called by patrol simulator."""
-    rows = fetch_all(
-        "SELECT id, type, latitude, longitude, hex_id FROM incidents WHERE attended = FALSE AND assigned_vehicle_id IS NULL"
-    )
-    if not rows:
-        return {"dispatched": 0}, 200
+    """
+    Assign vehicles to all unassigned incidents. Called by patrol simulator.
+    Solves one global assignment by default; ``?mode=greedy`` dispatches one by one.
+    """
     dispatch_engine = current_app.extensions["dispatch_engine"]
-    count = 0
-    for r in rows:
-        incident = dict(r)
-        incident["id"] = str(incident["id"])
-        result = dispatch_engine.dispatch(incident)
-        if result.get("vehicle"):
-            count += 1
-    return {"dispatched": count}, 200
+    batch = request.args.get("mode", "batch") != "greedy"
+    return {"dispatched": dispatch_engine.dispatch_unassigned(batch=batch)}, 200
+
+
+@incidents_bp.get("/dispatch-queue")
+def dispatch_queue_stats():
+    """Depth, backpressure and latency counters of the background dispatch queue."""
+    dispatch_queue = current_app.extensions.get("dispatch_queue")
+    preemption = current_app.extensions.get("preemption_engine")
+    preemptions = preemption.preemptions if preemption is not None else None
+    if dispatch_queue is None:
+        return {"enabled": False, "preemptions": preemptions}, 200
+    return {"enabled": True, **dispatch_queue.stats(), "preemptions": preemptions}, 200
+
+
+@incidents_bp.get("/<incident_id>/dispatch-status")
+def dispatch_status(incident_id: str):
+    """
+    Progress of an incident's dispatch. Uses the queue's record when this process
+    handled it, otherwise derives the state from the incident row.
+    """
+    dispatch_queue = current_app.extensions.get("dispatch_queue")
+    entry = dispatch_queue.status(incident_id) if dispatch_queue is not None else None
+    if entry is not None:
+        return entry, 200
+
+    row = fetch_one(
+        "SELECT assigned_vehicle_id, status, attended FROM incidents WHERE id = %s",
+        (incident_id,),
+    )
+    if not row:
+        return {"error": "Incident not found"}, 404
+    if row["attended"]:
+        state = "attended"
+    elif row["assigned_vehicle_id"]:
+        state = "assigned"
+    else:
+        state = "waiting"
+    return {
+        "incident_id": incident_id,
+        "state": state,
+        "vehicle_id": str(row["assigned_vehicle_id"]) if row["assigned_vehicle_id"] else None,
+    }, 200
 
 
 @incidents_bp.patch("/<incident_id>/attended")
@@ -337,6 +481,10 @@ def mark_attended(incident_id: str):
                 (vehicle_id,),
             )
             if vehicle:
+                current_app.extensions["vehicle_index"].upsert(vehicle)
+                preemption = current_app.extensions.get("preemption_engine")
+                if preemption is not None:
+                    preemption.busy_index.remove(vehicle_id)
                 vehicle_payload = {
                     "id": str(vehicle["id"]),
                     "type": vehicle["type"],
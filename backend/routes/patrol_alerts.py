@@ -1,6 +1,6 @@
 from flask import Blueprint
 
-from utils.db import fetch_all
+from utils.db import fetch_all_read
 
 
 patrol_alerts_bp = Blueprint("patrol_alerts", __name__, url_prefix="/api/patrol-alerts")
@@ -8,7 +8,7 @@ patrol_alerts_bp = Blueprint("patrol_alerts", __name__, url_prefix="/api/patrol-
 
 @patrol_alerts_bp.get("")
 def get_patrol_alerts():
-    alerts = fetch_all(
+    alerts = fetch_all_read(
         """
         SELECT id, hex_id, alert_type, message, created_at
         FROM patrol_alerts
@@ -1,8 +1,11 @@
+import math
+
 from flask import Blueprint, current_app, request
 
 from extensions import socketio
-from utils.db import execute_insert_returning, execute_query, fetch_all, fetch_one
-from utils.geo import haversine_km
+from services.dispatch_routes import TO_HOSPITAL, record_route
+from utils.db import execute_query, execute_values, fetch_all, fetch_all_read, fetch_one
+from utils.geo_vector import as_points, distances_from, nearest_k
 
 # Distance threshold (km) to auto-mark incident as attended when vehicle arrives.
 # Slightly generous (150 m) so minor OSRM / GPS offsets still count as \"arrived\".
@@ -15,17 +18,21 @@ HOSPITALS = [
 ]
 
 
+_HOSPITAL_POINTS = as_points([(h["lat"], h["lng"]) for h in HOSPITALS])
+
+
 def _nearest_hospital(lat: float, lng: float) -> dict | None:
     if not HOSPITALS:
         return None
-    return min(HOSPITALS, key=lambda h: haversine_km(lat, lng, h["lat"], h["lng"]))
+    indices, _ = nearest_k(_HOSPITAL_POINTS, lat, lng, k=1)
+    return HOSPITALS[int(indices[0])]
 
 vehicles_bp = Blueprint("vehicles", __name__, url_prefix="/api/vehicles")
 
 
 @vehicles_bp.get("")
 def list_vehicles():
-    rows = fetch_all(
+    rows = fetch_all_read(
         "SELECT id, type, latitude, longitude, status, current_hex_id FROM vehicles ORDER BY type, id"
     )
     vehicles = [
@@ -75,27 +82,28 @@ def deploy_vehicles():
         latitude, longitude = 13.0827, 80.2707
         hex_id = hex_service.get_hex_id_from_latlng(latitude, longitude)
 
+    rows = execute_values(
+        """
+        INSERT INTO vehicles (type, latitude, longitude, status, current_hex_id)
+        VALUES %s
+        RETURNING id, type, latitude, longitude, status, current_hex_id
+        """,
+        [(vehicle_type, latitude, longitude, status, hex_id)] * count,
+        fetch=True,
+    )
     deployed = []
-    for _ in range(count):
-        row = execute_insert_returning(
-            """
-            INSERT INTO vehicles (type, latitude, longitude, status, current_hex_id)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id, type, latitude, longitude, status, current_hex_id
-            """,
-            (vehicle_type, latitude, longitude, status, hex_id),
-        )
-        if row:
-            vehicle = {
-                "id": str(row["id"]),
-                "type": row["type"],
-                "latitude": float(row["latitude"]),
-                "longitude": float(row["longitude"]),
-                "status": row["status"],
-                "current_hex_id": row["current_hex_id"],
-            }
-            deployed.append(vehicle)
-            socketio.emit("vehicle_position", {"vehicle": vehicle})
+    for row in rows:
+        vehicle = {
+            "id": str(row["id"]),
+            "type": row["type"],
+            "latitude": float(row["latitude"]),
+            "longitude": float(row["longitude"]),
+            "status": row["status"],
+            "current_hex_id": row["current_hex_id"],
+        }
+        deployed.append(vehicle)
+        current_app.extensions["vehicle_index"].upsert(vehicle)
+        socketio.emit("vehicle_position", {"vehicle": vehicle})
 
     return {"deployed": len(deployed), "vehicles": deployed}, 201
 
@@ -116,6 +124,10 @@ def delete_vehicle(vehicle_id: str):
         ("new", vehicle_id),
     )
     execute_query("DELETE FROM vehicles WHERE id = %s", (vehicle_id,))
+    current_app.extensions["vehicle_index"].remove(vehicle_id)
+    preemption = current_app.extensions.get("preemption_engine")
+    if preemption is not None:
+        preemption.busy_index.remove(vehicle_id)
     socketio.emit("vehicle_removed", {"vehicle_id": vehicle_id})
 
     return {"ok": True, "deleted": vehicle_id}, 200
@@ -143,6 +155,11 @@ def update_vehicle_position():
     )
     if not row:
         return {"error": "Vehicle not found"}, 404
+    vehicle_index = current_app.extensions["vehicle_index"]
+    vehicle_index.upsert(row)
+    preemption = current_app.extensions.get("preemption_engine")
+    if preemption is not None:
+        preemption.busy_index.update_position(row["id"], latitude, longitude, row["current_hex_id"])
     vehicle = {
         "id": str(row["id"]),
         "type": row["type"],
@@ -162,7 +179,20 @@ def update_vehicle_position():
         """,
         (vehicle_id,),
     )
-    for inc in incidents:
+    # Distances to every open scene and hospital leg in two array ops; NaN (no hospital yet) never matches.
+    scene_km = distances_from(latitude, longitude, [(inc["latitude"], inc["longitude"]) for inc in incidents])
+    hospital_km = distances_from(
+        latitude,
+        longitude,
+        [
+            (
+                float(inc["hospital_lat"]) if inc.get("hospital_lat") is not None else math.nan,
+                float(inc["hospital_lng"]) if inc.get("hospital_lng") is not None else math.nan,
+            )
+            for inc in incidents
+        ],
+    )
+    for i, inc in enumerate(incidents):
         inc_type = (inc["type"] or "").lower()
         leg_phase = (inc.get("leg_phase") or "to_scene").lower()
 
@@ -170,7 +200,7 @@ def update_vehicle_position():
         is_ambulance_case = inc_type in ("road_accident", "medical")
 
         # Distance to scene
-        dist_to_scene = haversine_km(latitude, longitude, inc["latitude"], inc["longitude"])
+        dist_to_scene = float(scene_km[i])
 
         if is_ambulance_case and vehicle["type"] == "ambulance":
             # Leg 1: reach scene, then compute and start route to nearest hospital
@@ -181,6 +211,9 @@ def update_vehicle_position():
                         "UPDATE incidents SET hospital_lat = %s, hospital_lng = %s, leg_phase = %s WHERE id = %s",
                         (hospital["lat"], hospital["lng"], "to_hospital", inc["id"]),
                     )
+                    if preemption is not None:
+                        # Patient on board: this unit can no longer be preempted.
+                        preemption.busy_index.remove(vehicle_id)
                     dispatch_engine = current_app.extensions["dispatch_engine"]
                     route = dispatch_engine.route_service.get_route(
                         start_lat=latitude,
@@ -189,6 +222,7 @@ def update_vehicle_position():
                         end_lng=hospital["lng"],
                     )
                     green_corridor_hexes = dispatch_engine._extract_route_hexes(route["geometry"])
+                    record_route(inc["id"], vehicle_id, TO_HOSPITAL, route, green_corridor_hexes)
                     try:
                         from services.green_corridor_engine import activate
                         activate(green_corridor_hexes)
@@ -199,7 +233,7 @@ def update_vehicle_position():
                         {
                             "incident_id": inc["id"],
                             "vehicle_id": vehicle_id,
-                            "route": route,
+                            "route": dispatch_engine.route_service.encode_route(route),
                             "green_corridor_hexes": green_corridor_hexes,
                         },
                     )
@@ -207,12 +241,7 @@ def update_vehicle_position():
 
             # Leg 2: travelling to hospital – mark attended when we arrive there
             if leg_phase == "to_hospital" and inc.get("hospital_lat") is not None and inc.get("hospital_lng") is not None:
-                dist_to_hospital = haversine_km(
-                    latitude,
-                    longitude,
-                    float(inc["hospital_lat"]),
-                    float(inc["hospital_lng"]),
-                )
+                dist_to_hospital = float(hospital_km[i])
                 if dist_to_hospital <= ARRIVAL_THRESHOLD_KM:
                     execute_query(
                         "UPDATE incidents SET attended = TRUE, status = %s WHERE id = %s",
@@ -222,6 +251,9 @@ def update_vehicle_position():
                         "UPDATE vehicles SET status = %s WHERE id = %s",
                         ("patrolling", vehicle_id),
                     )
+                    vehicle_index.update_status(vehicle_id, "patrolling")
+                    if preemption is not None:
+                        preemption.busy_index.remove(vehicle_id)
                     try:
                         from services.green_corridor_engine import clear
                         clear()
@@ -240,6 +272,9 @@ def update_vehicle_position():
                     "UPDATE vehicles SET status = %s WHERE id = %s",
                     ("patrolling", vehicle_id),
                 )
+                vehicle_index.update_status(vehicle_id, "patrolling")
+                if preemption is not None:
+                    preemption.busy_index.remove(vehicle_id)
                 try:
                     from services.green_corridor_engine import clear
                     clear()
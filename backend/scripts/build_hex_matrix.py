@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Build the hex-to-hex travel matrix used by services/hex_matrix.py.
+
+Computes driving duration and distance between the centres of every pair of
+H3 cells in CHENNAI_BBOX at H3_RESOLUTION, either from OSRM /table requests in
+source x destination batches, or from the offline road graph (one Dijkstra per
+cell). Unroutable pairs, and OSRM blocks that still failed after waiting out
+an open circuit, are NaN. The output directory is replaced atomically once all
+arrays are written.
+
+Usage (from backend):
+  python scripts/build_hex_matrix.py --output data/hex_matrix
+  python scripts/build_hex_matrix.py --source local --graph data/road_graph --output data/hex_matrix
+
+Then set HEX_MATRIX_PATH=data/hex_matrix.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import h3
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.hex_matrix import FORMAT_VERSION, grid_version  # noqa: E402
+from services.hex_service import HexService  # noqa: E402
+from services.osrm_client import OPEN, OsrmClient, OsrmError, OsrmUnavailable  # noqa: E402
+from services.road_graph import ACCESS_SPEED_KMH, LocalRouter  # noqa: E402
+
+
+def _get_block(client: OsrmClient, path: str) -> dict | None:
+    """
+    One /table call. When the failure opened the circuit, wait for it to
+    half-open and try the block once more, so a brief outage does not also
+    skip every following block. None if the block could not be fetched.
+    """
+    for attempt in range(2):
+        try:
+            return client.get(path, timeout=60)
+        except OsrmError as error:
+            print(f"    OSRM could not serve the block: {error}")
+            return None
+        except OsrmUnavailable as error:
+            print(f"    OSRM unavailable: {error}")
+            if attempt or client.stats()["state"] != OPEN:
+                return None
+            print(f"    circuit open; waiting {client.reset_timeout_s:.0f} s")
+            time.sleep(client.reset_timeout_s)
+    return None
+
+
+def from_osrm(centers: list[tuple[float, float]], batch: int) -> tuple[np.ndarray, np.ndarray]:
+    """Fill the matrix with OSRM /table calls of ``batch`` sources x ``batch`` destinations."""
+    client = OsrmClient(Config.OSRM_BASE_URL, retries=3, backoff_s=0.5, reset_timeout_s=10.0)
+    n = len(centers)
+    durations = np.full((n, n), np.nan, dtype=np.float32)
+    distances = np.full((n, n), np.nan, dtype=np.float32)
+    blocks = [range(start, min(start + batch, n)) for start in range(0, n, batch)]
+    for done, sources in enumerate(blocks, start=1):
+        for destinations in blocks:
+            points = [centers[i] for i in sources] + [centers[j] for j in destinations]
+            coordinates = ";".join(f"{lng},{lat}" for lat, lng in points)
+            path = (
+                f"/table/v1/driving/{coordinates}"
+                f"?sources={';'.join(str(k) for k in range(len(sources)))}"
+                f"&destinations={';'.join(str(len(sources) + k) for k in range(len(destinations)))}"
+                "&annotations=duration,distance"
+            )
+            data = _get_block(client, path)
+            if data is None:
+                print(f"  block {sources.start}x{destinations.start} skipped (left NaN)")
+                continue
+            block = np.ix_(list(sources), list(destinations))
+            durations[block] = np.array(data["durations"], dtype=np.float64)
+            distances[block] = np.array(data["distances"], dtype=np.float64)
+        print(f"  {done}/{len(blocks)} source batches")
+    return durations, distances
+
+
+def from_road_graph(centers: list[tuple[float, float]], graph_path: str) -> tuple[np.ndarray, np.ndarray]:
+    """Fill the matrix with one single-source Dijkstra per cell on the offline road graph."""
+    router = LocalRouter(graph_path)
+    n = len(centers)
+    durations = np.full((n, n), np.nan, dtype=np.float32)
+    distances = np.full((n, n), np.nan, dtype=np.float32)
+    snapped = [router.nearest_node(lat, lng) for lat, lng in centers]
+    cells = np.array([i for i, snap in enumerate(snapped) if snap is not None], dtype=np.int64)
+    nodes = np.array([snapped[i][0] for i in cells], dtype=np.int64)
+    access_m = np.array([snapped[i][1] * 1000 for i in cells])
+    access_s = access_m / (ACCESS_SPEED_KMH / 3.6)
+    for done, i in enumerate(cells.tolist(), start=1):
+        node, km = snapped[i]
+        duration, length = router.shortest_paths_from(node, targets=nodes.tolist())
+        row_s = duration[nodes] + km * 1000 / (ACCESS_SPEED_KMH / 3.6) + access_s
+        row_m = length[nodes] + km * 1000 + access_m
+        reachable = np.isfinite(row_s)
+        durations[i, cells[reachable]] = row_s[reachable]
+        distances[i, cells[reachable]] = row_m[reachable]
+        if done % 50 == 0 or done == len(cells):
+            print(f"  {done}/{len(cells)} cells")
+    return durations, distances
+
+
+def write(output: str, durations: np.ndarray, distances: np.ndarray, meta: dict) -> None:
+    """Write to a sibling temp directory, then swap it in so readers never see a partial matrix."""
+    staging = f"{output}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "durations_s.npy"), durations)
+    np.save(os.path.join(staging, "distances_m.npy"), distances)
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(output):
+        previous = f"{output}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(output, previous)
+        os.replace(staging, output)
+        shutil.rmtree(previous, ignore_errors=True)
+    else:
+        os.replace(staging, output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("osrm", "local"), default="osrm")
+    parser.add_argument("--graph", default=Config.ROAD_GRAPH_PATH or "data/road_graph", help="Road graph for --source local")
+    parser.add_argument("--batch", type=int, default=50, help="Sources (and destinations) per OSRM /table call")
+    parser.add_argument("--resolution", type=int, default=Config.H3_RESOLUTION)
+    parser.add_argument("--output", default="data/hex_matrix")
+    args = parser.parse_args()
+
+    hex_ids = sorted(HexService(Config.CHENNAI_BBOX, args.resolution).generate_chennai_hex_ids())
+    centers = [h3.cell_to_latlng(hex_id) for hex_id in hex_ids]
+    print(f"{len(hex_ids)} cells at resolution {args.resolution}, source {args.source}")
+
+    started = time.perf_counter()
+    if args.source == "osrm":
+        durations, distances = from_osrm(centers, args.batch)
+    else:
+        durations, distances = from_road_graph(centers, args.graph)
+    np.fill_diagonal(durations, 0.0)
+    np.fill_diagonal(distances, 0.0)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "resolution": args.resolution,
+        "grid_version": grid_version(hex_ids, args.resolution),
+        "hex_ids": hex_ids,
+        "source": args.source,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "bbox": Config.CHENNAI_BBOX,
+        "unroutable_pairs": int(np.isnan(durations).sum()),
+    }
+    write(args.output, durations, distances, meta)
+    print(
+        f"Wrote {len(hex_ids)}x{len(hex_ids)} matrix ({meta['unroutable_pairs']} unroutable pairs) "
+        f"to {args.output} in {time.perf_counter() - started:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Build the offline road graph used by services/road_graph.py.
+
+Downloads drivable OpenStreetMap ways inside CHENNAI_BBOX from the Overpass API
+(or reads a saved Overpass JSON with --input), keeps only nodes that are way
+ends or junctions as graph nodes, and writes CSR arrays plus meta.json to the
+output directory. The way vertices between two graph nodes are kept as each
+edge's shape, so routes follow curved roads instead of cutting corners.
+
+Usage (from backend):
+  python scripts/build_road_graph.py --output data/road_graph
+  python scripts/build_road_graph.py --input chennai_roads.json --output data/road_graph
+
+Then set ROAD_GRAPH_PATH=data/road_graph.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from utils.geo_vector import haversine_km  # noqa: E402
+
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+KMH_PER_MPH = 1.609
+
+# Typical urban speeds (km/h) by OSM highway class.
+SPEED_KMH = {
+    "motorway": 80, "motorway_link": 50,
+    "trunk": 60, "trunk_link": 40,
+    "primary": 45, "primary_link": 35,
+    "secondary": 40, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25,
+    "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15,
+}
+
+
+def fetch_ways(bbox: dict) -> dict:
+    classes = "|".join(SPEED_KMH)
+    query = f"""
+    [out:json][timeout:300];
+    way["highway"~"^({classes})$"]({bbox['south']},{bbox['west']},{bbox['north']},{bbox['east']});
+    (._;>;);
+    out body;
+    """
+    response = requests.post(OVERPASS_URL, data={"data": query}, timeout=360)
+    response.raise_for_status()
+    return response.json()
+
+
+def _speed(tags: dict) -> float:
+    """km/h from ``maxspeed`` ("50", "30 mph", "40;60" takes the first), else the class default."""
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(tags.get("maxspeed", "")))
+    if match and float(match.group(1)) > 0:
+        speed = float(match.group(1))
+        return speed * KMH_PER_MPH if match.group(2) else speed
+    return float(SPEED_KMH.get(tags.get("highway"), 25))
+
+
+def _direction(tags: dict) -> int:
+    """1 forward only, -1 backward only, 0 both ways."""
+    oneway = str(tags.get("oneway", "")).lower()
+    if oneway in ("yes", "true", "1") or tags.get("junction") == "roundabout" or tags.get("highway") == "motorway":
+        return 1
+    if oneway == "-1":
+        return -1
+    return 0
+
+
+def build(osm: dict) -> dict[str, np.ndarray]:
+    coords = {e["id"]: (e["lat"], e["lon"]) for e in osm["elements"] if e["type"] == "node"}
+    ways = [e for e in osm["elements"] if e["type"] == "way" and len(e.get("nodes", [])) >= 2]
+
+    # Graph nodes: way ends and nodes shared by more than one way; other vertices only shape edges.
+    usage: dict[int, int] = {}
+    for way in ways:
+        for node in way["nodes"]:
+            usage[node] = usage.get(node, 0) + 1
+    keep = {node for node, count in usage.items() if count > 1}
+    for way in ways:
+        keep.update((way["nodes"][0], way["nodes"][-1]))
+    keep &= coords.keys()
+
+    ordered = sorted(keep, key=lambda node: coords[node][0])  # latitude order for band searches
+    index = {node: i for i, node in enumerate(ordered)}
+
+    sources, targets, lengths, durations, shapes = [], [], [], [], []
+
+    def add_edge(u: int, v: int, length: float, duration: float, shape: list) -> None:
+        sources.append(u)
+        targets.append(v)
+        lengths.append(length)
+        durations.append(duration)
+        shapes.append(shape)
+
+    for way in ways:
+        nodes = [n for n in way["nodes"] if n in coords]
+        if len(nodes) < 2:
+            continue
+        speed_mps = _speed(way.get("tags", {})) / 3.6
+        direction = _direction(way.get("tags", {}))
+        points = np.array([coords[n] for n in nodes])
+        steps = haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]) * 1000
+        segment_start, length, shape = nodes[0], 0.0, []
+        for node, step in zip(nodes[1:], steps):
+            length += float(step)
+            if node not in index:
+                shape.append(coords[node])
+                continue
+            u, v = index[segment_start], index[node]
+            if u != v:
+                if direction >= 0:
+                    add_edge(u, v, length, length / speed_mps, shape)
+                if direction <= 0:
+                    add_edge(v, u, length, length / speed_mps, shape[::-1])
+            segment_start, length, shape = node, 0.0, []
+
+    sources = np.asarray(sources, dtype=np.int64)
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(len(ordered) + 1, dtype=np.int64)
+    np.add.at(indptr, sources + 1, 1)
+    # Edge shapes in CSR order: points of edge i are shape_lat/lng[shape_ptr[i]:shape_ptr[i + 1]].
+    ordered_shapes = [shapes[i] for i in order.tolist()]
+    shape_ptr = np.zeros(len(ordered_shapes) + 1, dtype=np.int64)
+    shape_ptr[1:] = np.cumsum([len(shape) for shape in ordered_shapes])
+    shape_points = np.array([point for shape in ordered_shapes for point in shape], dtype=np.float64).reshape(-1, 2)
+    return {
+        "node_lat": np.array([coords[n][0] for n in ordered], dtype=np.float64),
+        "node_lng": np.array([coords[n][1] for n in ordered], dtype=np.float64),
+        "indptr": np.cumsum(indptr),
+        "indices": np.asarray(targets, dtype=np.int32)[order],
+        "length_m": np.asarray(lengths, dtype=np.float32)[order],
+        "duration_s": np.asarray(durations, dtype=np.float32)[order],
+        "shape_ptr": shape_ptr,
+        "shape_lat": shape_points[:, 0].copy(),
+        "shape_lng": shape_points[:, 1].copy(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="Saved Overpass JSON instead of downloading")
+    parser.add_argument("--output", default="data/road_graph")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            osm = json.load(f)
+    else:
+        print(f"Downloading roads for {Config.CHENNAI_BBOX} from {OVERPASS_URL} ...")
+        osm = fetch_ways(Config.CHENNAI_BBOX)
+
+    arrays = build(osm)
+    os.makedirs(args.output, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(args.output, f"{name}.npy"), array)
+    meta = {
+        "bbox": Config.CHENNAI_BBOX,
+        "nodes": int(arrays["node_lat"].shape[0]),
+        "edges": int(arrays["indices"].shape[0]),
+        "shape_points": int(arrays["shape_lat"].shape[0]),
+        # Fastest edge speed, so the A* heuristic never overestimates.
+        "max_speed_kmh": float((arrays["length_m"] / np.maximum(arrays["duration_s"], 1e-6)).max() * 3.6)
+        if arrays["indices"].size
+        else 1.0,
+    }
+    with open(os.path.join(args.output, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Wrote {meta['nodes']} nodes, {meta['edges']} edges to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
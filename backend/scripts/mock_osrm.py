@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Minimal mock OSRM server for exercising the OSRM client locally.
+
+Serves /route/v1/driving/... (straight-line geometry, distance and duration at
+MOCK_OSRM_SPEED_KMH) and /table/v1/driving/... (durations from each source to
+each destination, plus distances with annotations=distance). Latency and
+failures can be injected to watch retries and the circuit breaker:
+
+  python scripts/mock_osrm.py --port 5005 --delay-ms 50 --fail-rate 0.3
+  OSRM_BASE_URL=http://localhost:5005 python app.py
+
+Then watch the "osrm" block of GET /health.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.geo import haversine_km  # noqa: E402
+
+SPEED_KMH = float(os.getenv("MOCK_OSRM_SPEED_KMH", "30"))
+
+
+def _coordinates(path_part: str) -> list[tuple[float, float]]:
+    """'lng,lat;lng,lat' -> [(lat, lng), ...]"""
+    points = []
+    for pair in path_part.split(";"):
+        lng, lat = pair.split(",")
+        points.append((float(lat), float(lng)))
+    return points
+
+
+def _indices(raw: str | None, n: int) -> list[int]:
+    if not raw or raw == "all":
+        return list(range(n))
+    return [int(i) for i in raw.split(";")]
+
+
+class MockOsrmHandler(BaseHTTPRequestHandler):
+    delay_ms = 0.0
+    fail_rate = 0.0
+
+    def _send(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        if random.random() < self.fail_rate:
+            self._send(503, {"code": "Unavailable"})
+            return
+
+        url = urlparse(self.path)
+        # OSRM separates coordinates with ';', which urlparse would split off as params.
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 4 or parts[1] != "v1":
+            self._send(400, {"code": "InvalidUrl"})
+            return
+        service, coordinates = parts[0], _coordinates(parts[3])
+        query = parse_qs(url.query)
+
+        if service == "route" and len(coordinates) >= 2:
+            distance_km = sum(haversine_km(*a, *b) for a, b in zip(coordinates, coordinates[1:]))
+            self._send(
+                200,
+                {
+                    "code": "Ok",
+                    "routes": [
+                        {
+                            "distance": distance_km * 1000,
+                            "duration": distance_km / SPEED_KMH * 3600,
+                            "geometry": {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in coordinates]},
+                        }
+                    ],
+                },
+            )
+        elif service == "table":
+            sources = _indices(query.get("sources", [None])[0], len(coordinates))
+            destinations = _indices(query.get("destinations", [None])[0], len(coordinates))
+            km = [[haversine_km(*coordinates[s], *coordinates[d]) for d in destinations] for s in sources]
+            body = {"code": "Ok", "durations": [[k / SPEED_KMH * 3600 for k in row] for row in km]}
+            if "distance" in query.get("annotations", ["duration"])[0].split(","):
+                body["distances"] = [[k * 1000 for k in row] for row in km]
+            self._send(200, body)
+        else:
+            self._send(400, {"code": "InvalidService"})
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Latency added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    MockOsrmHandler.delay_ms = args.delay_ms
+    MockOsrmHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockOsrmHandler)
+    print(f"Mock OSRM on http://127.0.0.1:{args.port} (delay {args.delay_ms} ms, fail rate {args.fail_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
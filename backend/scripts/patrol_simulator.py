@@ -16,6 +16,7 @@ from __future__ import annotations
 
 import os
 import random
+import sys
 import time
 from typing import Any
 
@@ -34,13 +35,19 @@ H3_RESOLUTION = int(os.getenv("H3_RESOLUTION", "7"))
 # Smaller step + 1 point per step = smoother \"gliding\" movement
 STEP_SECONDS = float(os.getenv("PATROL_STEP_SECONDS", "0.4"))
 POINTS_PER_STEP = int(os.getenv("PATROL_POINTS_PER_STEP", "1"))  # Route points to advance per tick
+# Refresh vehicle lists on Postgres change notifications instead of re-querying every tick
+USE_CHANGE_FEED = os.getenv("PATROL_USE_CHANGE_FEED", "true").lower() in ("1", "true", "yes")
 
 
-def get_connection():
+def database_url() -> str:
     url = DATABASE_URL
     if url.startswith("postgresql+psycopg2://"):
         url = url.replace("postgresql+psycopg2://", "postgresql://", 1)
-    return psycopg2.connect(url)
+    return url
+
+
+def get_connection():
+    return psycopg2.connect(database_url())
 
 
 def fetch_patrolling_vehicles(conn) -> list[dict[str, Any]]:
@@ -110,22 +117,40 @@ def random_point_in_hex(hex_id: str) -> tuple[float, float]:
     return float(lat), float(lng)
 
 
+_route_service = None
+
+
+def route_service():
+    """RouteService with the API's pooled OSRM client and LRU/TTL route cache."""
+    global _route_service
+    if _route_service is None:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from services.osrm_client import OsrmClient
+        from services.route_cache import RouteCache
+        from services.route_service import RouteService
+
+        _route_service = RouteService(
+            OSRM_BASE,
+            route_timeout_s=8,
+            client=OsrmClient(
+                OSRM_BASE,
+                retries=int(os.getenv("OSRM_RETRIES", "2")),
+                failure_threshold=int(os.getenv("OSRM_BREAKER_THRESHOLD", "5")),
+                reset_timeout_s=float(os.getenv("OSRM_BREAKER_RESET_S", "30")),
+            ),
+            cache=RouteCache(
+                max_entries=int(os.getenv("ROUTE_CACHE_SIZE", "5000")),
+                ttl_s=float(os.getenv("ROUTE_CACHE_TTL_S", "600")),
+                snap_resolution=int(os.getenv("ROUTE_CACHE_SNAP_RES", "10")),
+            ),
+        )
+    return _route_service
+
+
 def get_osrm_route(start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> list[tuple[float, float]]:
-    """Fetch driving route from OSRM. Returns list of (lat, lng) points along the road."""
-    url = (
-        f"{OSRM_BASE}/route/v1/driving/"
-        f"{start_lng},{start_lat};{end_lng},{end_lat}"
-        "?overview=full&geometries=geojson"
-    )
-    try:
-        resp = requests.get(url, timeout=8)
-        resp.raise_for_status()
-        data = resp.json()
-        route = data.get("routes", [{}])[0]
-        coords = route.get("geometry", {}).get("coordinates", [])
-        return [(float(lat), float(lng)) for lng, lat in coords]
-    except Exception:
-        return [(start_lat, start_lng), (end_lat, end_lng)]
+    """Fetch driving route from OSRM (cached). Returns list of (lat, lng) points along the road."""
+    route = route_service().get_route(start_lat, start_lng, end_lat, end_lng)
+    return [(float(lat), float(lng)) for lat, lng in route["geometry"]]
 
 
 def pick_next_target(
@@ -153,6 +178,26 @@ def pick_next_target(
     return next_hex, lat, lng
 
 
+def start_change_feed():
+    """Start a LISTEN/NOTIFY feed (services/change_feed.py), or None if unavailable."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        from services.change_feed import ChangeFeed
+    except ImportError as e:
+        print(f"Change feed unavailable ({e}); falling back to polling.")
+        return None
+    return ChangeFeed(dsn=database_url()).start()
+
+
+def move_vehicle(v: dict[str, Any], pt: tuple[float, float]) -> bool:
+    """Push the vehicle's next position and keep the cached row in step with it."""
+    pt_hex = h3.latlng_to_cell(pt[0], pt[1], H3_RESOLUTION)
+    if not push_position(str(v["id"]), pt[0], pt[1], pt_hex):
+        return False
+    v["latitude"], v["longitude"], v["current_hex_id"] = pt[0], pt[1], pt_hex
+    return True
+
+
 def push_position(
     vehicle_id: str,
     latitude: float,
@@ -182,15 +227,31 @@ def main():
     # Per-vehicle state: { "route": [(lat,lng),...], "index": int }
     vehicle_routes: dict[str, dict[str, Any]] = {}
 
+    feed = start_change_feed() if USE_CHANGE_FEED else None
+    if feed:
+        # The API auto-dispatches when units free up; clear any backlog once at startup.
+        print("Using Postgres change feed; vehicle lists refresh on change.")
+        dispatch_unassigned_incidents()
+    busy: list[dict[str, Any]] = []
+    vehicles: list[dict[str, Any]] = []
+
     while True:
         try:
-            # 0. Assign unassigned incidents to nearest patrolling/available vehicle
-            dispatched = dispatch_unassigned_incidents()
-            if dispatched:
-                print(f"  Dispatched {dispatched} vehicle(s) to unassigned incident(s)")
+            if feed is None:
+                # 0. Assign unassigned incidents to nearest patrolling/available vehicle
+                dispatched = dispatch_unassigned_incidents()
+                if dispatched:
+                    print(f"  Dispatched {dispatched} vehicle(s) to unassigned incident(s)")
+                refresh = True
+            else:
+                refresh = feed.wait_for_change(0)
+
+            if refresh:
+                busy = fetch_busy_vehicles_with_incidents(conn)
+                vehicles = fetch_patrolling_vehicles(conn)
+                conn.commit()
 
             # 1. Move busy (dispatched) vehicles toward their incident
-            busy = fetch_busy_vehicles_with_incidents(conn)
             for v in busy:
                 vid = str(v["id"])
                 lat, lng = float(v["latitude"]), float(v["longitude"])
@@ -201,10 +262,7 @@ def main():
                     idx = state["index"]
                     advance = min(POINTS_PER_STEP, len(route) - idx)
                     new_idx = idx + advance
-                    pt = route[new_idx - 1]
-                    pt_hex = h3.latlng_to_cell(pt[0], pt[1], H3_RESOLUTION)
-                    if push_position(vid, pt[0], pt[1], pt_hex):
-                        pass
+                    move_vehicle(v, route[new_idx - 1])
                     state["index"] = new_idx
                     if state["index"] >= len(route):
                         del vehicle_routes[vid]
@@ -214,13 +272,10 @@ def main():
                         geometry = [(lat, lng), (inc_lat, inc_lng)]
                     vehicle_routes[vid] = {"route": geometry, "index": 1, "incident_route": True}
                     if len(geometry) > 1:
-                        pt = geometry[1]
-                        pt_hex = h3.latlng_to_cell(pt[0], pt[1], H3_RESOLUTION)
-                        if push_position(vid, pt[0], pt[1], pt_hex):
+                        if move_vehicle(v, geometry[1]):
                             print(f"  {v['type']} {vid[:8]}… -> incident (road route)")
 
             # 2. Move patrolling vehicles
-            vehicles = fetch_patrolling_vehicles(conn)
             if not vehicles and not busy:
                 print("No patrolling or dispatched vehicles. Deploy some from the /simulation page.")
             if vehicles:
@@ -236,10 +291,7 @@ def main():
                         idx = state["index"]
                         advance = min(POINTS_PER_STEP, len(route) - idx)
                         new_idx = idx + advance
-                        pt = route[new_idx - 1]
-                        pt_hex = h3.latlng_to_cell(pt[0], pt[1], H3_RESOLUTION)
-                        if push_position(vid, pt[0], pt[1], pt_hex):
-                            pass
+                        move_vehicle(v, route[new_idx - 1])
                         state["index"] = new_idx
                         if state["index"] >= len(route):
                             del vehicle_routes[vid]
@@ -254,15 +306,15 @@ def main():
                         # Skip first point (we're already there), start from index 1
                         vehicle_routes[vid] = {"route": geometry, "index": 1}
                         if len(geometry) > 1:
-                            pt = geometry[1]
-                            pt_hex = h3.latlng_to_cell(pt[0], pt[1], H3_RESOLUTION)
-                            if push_position(vid, pt[0], pt[1], pt_hex):
+                            if move_vehicle(v, geometry[1]):
                                 print(f"  {v['type']} {vid[:8]}… -> {next_hex[:12]}… (road route)")
                             vehicle_routes[vid]["index"] = 2
 
             time.sleep(STEP_SECONDS)
         except KeyboardInterrupt:
             print("\nStopped.")
+            if feed:
+                feed.stop()
             break
         except Exception as e:
             print(f"Error: {e}")
@@ -0,0 +1,244 @@
+"""
+Global batch assignment for waiting incidents.
+
+Instead of dispatching unassigned incidents one at a time (each re-reading the
+fleet and taking whatever is nearest at that moment), build one incident ×
+vehicle cost matrix and solve it as a linear assignment problem:
+
+- incompatible vehicle types are infeasible;
+- cost is straight-line distance in km minus a per-priority bonus, so when
+  units are scarce higher-priority incidents are served first and, within a
+  priority tier, total travel distance is minimised.
+
+All assignments are claimed in one statement (locks re-checked with
+``SKIP LOCKED``) inside one transaction; routes are then fetched concurrently.
+A pair that lost its vehicle or incident to a concurrent dispatcher is retried
+through ``DispatchEngine.dispatch``; only incidents the solve left without a
+unit are announced as having none.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.db import after_commit, fetch_all, transaction
+from utils.geo import haversine_km
+from utils.geo_vector import distance_matrix_km
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # in requirements.txt; the NumPy solver below covers installs without it
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
+INFEASIBLE = 1e9
+# Larger than any in-city distance, so priority always dominates distance.
+PRIORITY_BONUS_KM = 1000.0
+ROUTE_FETCH_WORKERS = 8
+
+
+def _hungarian(cost: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Minimum-cost assignment for an (n, m) matrix with n <= m (O(n² m), row-vectorised)."""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j]: row (1-based) matched to column j
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improve = free & (reduced < minv[1:])
+            minv[1:][improve] = reduced[improve]
+            way[1:][improve] = j0
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            used_cols = np.nonzero(used)[0]
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.nonzero(p[1:])[0]
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def solve_assignment(cost: np.ndarray) -> list[tuple[int, int]]:
+    """(row, col) pairs of a minimum-cost assignment, excluding infeasible pairs."""
+    if cost.size == 0:
+        return []
+    transposed = cost.shape[0] > cost.shape[1]
+    matrix = cost.T if transposed else cost
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(matrix)
+    else:
+        rows, cols = _hungarian(matrix)
+    if transposed:
+        rows, cols = cols, rows
+    return [
+        (int(r), int(c))
+        for r, c in zip(rows, cols)
+        if cost[r, c] < INFEASIBLE
+    ]
+
+
+class BatchDispatcher:
+    def __init__(self, dispatch_engine) -> None:
+        self.dispatch_engine = dispatch_engine
+
+    def build_cost_matrix(self, incidents: list[dict], vehicles: list[dict]) -> np.ndarray:
+        engine = self.dispatch_engine
+        distances = distance_matrix_km(
+            [(i["latitude"], i["longitude"]) for i in incidents],
+            [(v["latitude"], v["longitude"]) for v in vehicles],
+        )
+        vehicle_types = np.array([v["type"] for v in vehicles])
+        cost = np.full(distances.shape, INFEASIBLE)
+        for row, incident in enumerate(incidents):
+            compatible = np.isin(vehicle_types, engine._wanted_vehicle_types(incident))
+            bonus = PRIORITY_BONUS_KM * engine.incident_priority(incident)
+            cost[row, compatible] = distances[row, compatible] - bonus
+        return cost
+
+    def _claim_pairs(self, pairs: list[tuple[dict, dict]]) -> list[dict]:
+        """Claim all (incident, vehicle) pairs in one statement; pairs whose rows are taken are skipped."""
+        if not pairs:
+            return []
+        return fetch_all(
+            """
+            WITH pairs AS (
+                SELECT * FROM unnest(%s::uuid[], %s::uuid[], %s::text[]) AS p(incident_id, vehicle_id, hex_id)
+            ),
+            locked_vehicles AS (
+                SELECT v.id, v.status
+                FROM vehicles v JOIN pairs p ON p.vehicle_id = v.id
+                WHERE v.status IN ('available', 'patrolling')
+                FOR UPDATE OF v SKIP LOCKED
+            ),
+            locked_incidents AS (
+                SELECT i.id
+                FROM incidents i JOIN pairs p ON p.incident_id = i.id
+                WHERE i.assigned_vehicle_id IS NULL AND i.attended = FALSE
+                FOR UPDATE OF i SKIP LOCKED
+            ),
+            ok AS (
+                SELECT p.incident_id, p.vehicle_id, p.hex_id, lv.status AS prev_status
+                FROM pairs p
+                JOIN locked_vehicles lv ON lv.id = p.vehicle_id
+                JOIN locked_incidents li ON li.id = p.incident_id
+            ),
+            claimed AS (
+                UPDATE vehicles v
+                SET status = 'busy', current_hex_id = ok.hex_id
+                FROM ok
+                WHERE v.id = ok.vehicle_id
+                RETURNING v.id, v.type, v.latitude, v.longitude, ok.prev_status AS status,
+                          v.current_hex_id, ok.incident_id
+            ),
+            assigned AS (
+                UPDATE incidents i
+                SET assigned_vehicle_id = ok.vehicle_id, status = 'assigned'
+                FROM ok
+                WHERE i.id = ok.incident_id
+            )
+            SELECT * FROM claimed
+            """,
+            (
+                [incident["id"] for incident, _ in pairs],
+                [str(vehicle["id"]) for _, vehicle in pairs],
+                [incident["hex_id"] for incident, _ in pairs],
+            ),
+        )
+
+    def _after_claim(self, claimed: list[dict], incidents: list[dict]) -> None:
+        """Mirror the committed claims into the in-memory indexes."""
+        engine = self.dispatch_engine
+        incidents_by_id = {incident["id"]: incident for incident in incidents}
+        for row in claimed:
+            if engine.vehicle_index is not None:
+                engine.vehicle_index.update_status(row["id"], "busy")
+            if engine.preemption is not None:
+                engine.preemption.note_assigned(row, incidents_by_id[str(row["incident_id"])])
+
+    def dispatch_unassigned(self) -> int:
+        engine = self.dispatch_engine
+        with transaction():
+            incidents = fetch_all(
+                """
+                SELECT id, type, latitude, longitude, hex_id, created_at
+                FROM incidents
+                WHERE attended = FALSE AND assigned_vehicle_id IS NULL
+                ORDER BY created_at
+                """
+            )
+            if not incidents:
+                return 0
+            for incident in incidents:
+                incident["id"] = str(incident["id"])
+            vehicles = fetch_all(
+                """
+                SELECT id, type, latitude, longitude, status, current_hex_id
+                FROM vehicles
+                WHERE status IN ('available', 'patrolling')
+                """
+            )
+
+            pairs = []
+            if vehicles:
+                cost = self.build_cost_matrix(incidents, vehicles)
+                pairs = [(incidents[r], vehicles[c]) for r, c in solve_assignment(cost)]
+            claimed = self._claim_pairs(pairs)
+
+            if claimed:
+                after_commit(lambda: self._after_claim(claimed, incidents))
+
+        by_incident = {str(row["incident_id"]): row for row in claimed}
+        # Matched by the solve but not claimed: a concurrent dispatcher took the unit or the incident.
+        lost_race = [incident for incident, _ in pairs if incident["id"] not in by_incident]
+        lost_ids = {incident["id"] for incident in lost_race}
+        results = []
+        for incident in incidents:
+            if incident["id"] in lost_ids:
+                continue
+            row = by_incident.get(incident["id"])
+            vehicle = None
+            if row is not None:
+                vehicle = {k: row[k] for k in ("id", "type", "latitude", "longitude", "status", "current_hex_id")}
+                vehicle["eta_s"] = engine._haversine_eta_s(
+                    haversine_km(incident["latitude"], incident["longitude"], vehicle["latitude"], vehicle["longitude"])
+                )
+                vehicle["eta_source"] = "haversine"
+                incident["assigned_vehicle_id"] = vehicle["id"]
+                incident["status"] = "assigned"
+            results.append((incident, vehicle))
+
+        # Routes and socket events for every assignment, fetched concurrently; the
+        # "No available vehicles" events are for incidents the solve gave no unit.
+        with ThreadPoolExecutor(max_workers=ROUTE_FETCH_WORKERS, thread_name_prefix="batch-route") as pool:
+            list(pool.map(lambda item: engine.complete_dispatch(*item), results))
+            # Race losers get a fresh single dispatch against the fleet as it is now.
+            retried = list(pool.map(engine.dispatch, lost_race))
+        assigned = len(claimed) + sum(1 for payload in retried if payload.get("vehicle"))
+
+        logger.info(
+            "Batch dispatch: %d incidents, %d vehicles, %d assigned (%d retried after losing a race)",
+            len(incidents), len(vehicles), assigned, len(lost_race),
+        )
+        return assigned
@@ -0,0 +1,178 @@
+"""
+Postgres LISTEN/NOTIFY change feed.
+
+Triggers installed by migration 4 publish a small JSON payload on the
+``civic_changes`` channel whenever an incident is inserted, deleted or changes
+assignment/status, and whenever a vehicle is inserted, deleted or changes status.
+``ChangeFeed`` holds one dedicated LISTEN connection, turns notifications into
+``ChangeEvent`` objects and hands them to subscribers on a background thread.
+
+Used by the API process (auto-dispatch when a unit frees up) and by the patrol
+simulator (refresh only when something changed instead of polling every tick).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+import psycopg2
+from psycopg2 import extensions as pg_extensions
+
+from utils.db import get_database_url
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "civic_changes"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    table: str  # "incidents" | "vehicles"
+    op: str  # "INSERT" | "UPDATE" | "DELETE"
+    id: str
+    data: dict = field(default_factory=dict)
+
+    @property
+    def status(self) -> str | None:
+        return self.data.get("status")
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "ChangeEvent":
+        data = json.loads(payload)
+        return cls(
+            table=data.pop("table"),
+            op=data.pop("op"),
+            id=str(data.pop("id")),
+            data=data,
+        )
+
+
+Subscriber = Callable[[ChangeEvent], None]
+
+
+class ChangeFeed:
+    def __init__(self, dsn: str | None = None, reconnect_delay_s: float = 2.0) -> None:
+        self.dsn = dsn or get_database_url()
+        self.reconnect_delay_s = reconnect_delay_s
+        self._subscribers: list[tuple[Subscriber, frozenset[str] | None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._changed = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.events_received = 0
+
+    def subscribe(self, callback: Subscriber, tables: Iterable[str] | None = None) -> Callable[[], None]:
+        """Register callback for events on ``tables`` (all tables if None). Returns an unsubscribe function."""
+        entry = (callback, frozenset(tables) if tables else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+
+        return unsubscribe
+
+    def wait_for_change(self, timeout: float | None = None) -> bool:
+        """Block until any event arrives (or timeout). Returns True if one did; clears the flag."""
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def start(self) -> "ChangeFeed":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _publish(self, event: ChangeEvent) -> None:
+        self.events_received += 1
+        self._changed.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, tables in subscribers:
+            if tables is not None and event.table not in tables:
+                continue
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Change feed subscriber failed for %s %s", event.table, event.op)
+
+    def _listen(self) -> None:
+        connection = psycopg2.connect(self.dsn)
+        try:
+            connection.set_isolation_level(pg_extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            logger.info("Change feed listening on %s", CHANNEL)
+            # Anything may have changed while we were disconnected.
+            self._changed.set()
+            while not self._stop.is_set():
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        event = ChangeEvent.from_payload(notify.payload)
+                    except (ValueError, KeyError):
+                        logger.warning("Ignoring malformed change payload: %s", notify.payload)
+                        continue
+                    self._publish(event)
+        finally:
+            connection.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error as error:
+                logger.warning("Change feed connection lost (%s); retrying in %.0fs", error, self.reconnect_delay_s)
+                time.sleep(self.reconnect_delay_s)
+            except Exception:
+                # Never let a bug end the listener silently: indexes and auto-dispatch depend on it.
+                logger.exception("Change feed listener failed; reconnecting in %.0fs", self.reconnect_delay_s)
+                time.sleep(self.reconnect_delay_s)
+
+
+class CoalescingTrigger:
+    """
+    Callable that runs ``fn`` on a worker thread. Calls that arrive while ``fn`` is
+    running collapse into a single rerun, so a burst of events (e.g. deploying 50
+    vehicles) costs at most two runs instead of fifty.
+    """
+
+    def __init__(self, fn: Callable[[], object], name: str) -> None:
+        self._fn = fn
+        self._name = name
+        self._pending = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *_args) -> None:
+        self._pending.set()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            try:
+                self._fn()
+            except Exception:
+                logger.exception("%s failed", self._name)
@@ -2,63 +2,304 @@ from __future__ import annotations
 
 from typing import Dict, List
 
+import numpy as np
+
 from extensions import socketio
-from utils.db import execute_query, fetch_all
+from services.dispatch_routes import TO_SCENE, record_route
+from utils.db import after_commit, fetch_all, fetch_one, transaction
 from utils.geo import haversine_km
 
+# Nearest candidates (by straight-line distance) ranked by ETA before the locking claim.
+INDEX_CANDIDATES = 5
+
+# Higher is more urgent (3 critical, 2 urgent, 1 routine; see services.dispatch_scheduler).
+# Keys cover both the stored categories and raw report types.
+INCIDENT_PRIORITY = {
+    "fire": 3,
+    "medical": 3,
+    "accident": 3,
+    "road_accident": 3,
+    "crime": 2,
+    "theft": 2,
+    "suspicious": 2,
+    "public_disturbance": 2,
+    "public_safety_issue": 2,
+}
+DEFAULT_PRIORITY = 1
+
 
 class DispatchEngine:
-    def __init__(self, route_service, hex_service) -> None:
+    def __init__(
+        self,
+        route_service,
+        hex_service,
+        vehicle_index=None,
+        eta_ranking: bool = True,
+        fallback_speed_kmh: float = 30.0,
+    ) -> None:
         self.route_service = route_service
         self.hex_service = hex_service
+        self.vehicle_index = vehicle_index
+        self.eta_ranking = eta_ranking
+        self.fallback_speed_kmh = fallback_speed_kmh
+        # Optional services.preemption.PreemptionEngine, used when no unit is free.
+        self.preemption = None
 
-    def _nearest_vehicle(self, incident: dict) -> dict | None:
+    def _wanted_vehicle_types(self, incident: dict) -> tuple[str, ...]:
         incident_type = (incident.get("type") or "").lower()
 
-        # Choose appropriate vehicle types based on incident type
-        if incident_type in ("theft", "suspicious", "public_disturbance", "public_safety_issue"):
-            wanted_types = ("police",)
-        elif incident_type in ("road_accident", "medical"):
-            wanted_types = ("ambulance",)
-        elif incident_type == "fire":
-            wanted_types = ("fire",)
-        elif incident_type in ("garbage_issue", "garbage", "sanitation"):
-            wanted_types = ("municipal",)
-        elif incident_type in ("road_damage", "pothole_damage"):
-            wanted_types = ("municipal",)
-        else:
-            wanted_types = ("police", "ambulance", "fire", "municipal")
+        # Choose appropriate vehicle types based on incident type (stored category or raw report type)
+        if incident_type in ("crime", "theft", "suspicious", "public_disturbance", "public_safety_issue"):
+            return ("police",)
+        if incident_type in ("accident", "road_accident", "medical"):
+            return ("ambulance",)
+        if incident_type == "fire":
+            return ("fire",)
+        if incident_type in ("civic", "garbage_issue", "garbage", "sanitation"):
+            return ("municipal",)
+        if incident_type in ("road_damage", "pothole_damage"):
+            return ("municipal",)
+        # Unknown types never take fire or ambulance units away from life-threatening work.
+        return ("police", "municipal")
 
-        dispatchable_vehicles = fetch_all(
+    def incident_priority(self, incident: dict) -> int:
+        return INCIDENT_PRIORITY.get((incident.get("type") or "").lower(), DEFAULT_PRIORITY)
+
+    def _claim_nearest_vehicle(self, incident: dict, candidate_ids: list[str] | None = None) -> dict | None:
+        """
+        Select, lock and assign the nearest dispatchable vehicle in one statement,
+        optionally restricted to ``candidate_ids``. Candidates are tried in list
+        order (e.g. ETA rank), then by distance.
+
+        ``FOR UPDATE SKIP LOCKED`` makes concurrent dispatchers (web, Telegram,
+        dispatch-unassigned, other workers) skip vehicles another transaction is
+        claiming, so no unit is double-assigned and nobody blocks on a global lock.
+        The incident row is locked the same way and must still be unassigned, so
+        two dispatchers racing on one incident claim at most one vehicle.
+        Returns the vehicle with its status *before* the claim, or None.
+        """
+        return fetch_one(
             """
-            SELECT id, type, latitude, longitude, status, current_hex_id
+            WITH target AS (
+                SELECT id FROM incidents
+                WHERE id = %(incident_id)s AND assigned_vehicle_id IS NULL AND attended = FALSE
+                FOR UPDATE SKIP LOCKED
+            ),
+            candidate AS (
+                SELECT v.id, v.status
+                FROM vehicles v
+                WHERE v.status IN ('available', 'patrolling')
+                  AND v.type = ANY(%(types)s)
+                  AND (%(candidate_ids)s::uuid[] IS NULL OR v.id = ANY(%(candidate_ids)s::uuid[]))
+                  AND EXISTS (SELECT 1 FROM target)
+                ORDER BY array_position(%(candidate_ids)s::uuid[], v.id), 2 * 6371.0 * asin(sqrt(
+                    power(sin(radians(v.latitude - %(lat)s) / 2), 2)
+                    + cos(radians(%(lat)s)) * cos(radians(v.latitude))
+                      * power(sin(radians(v.longitude - %(lng)s) / 2), 2)
+                ))
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ),
+            claimed AS (
+                UPDATE vehicles v
+                SET status = 'busy', current_hex_id = %(hex_id)s
+                FROM candidate
+                WHERE v.id = candidate.id
+                RETURNING v.id, v.type, v.latitude, v.longitude, candidate.status AS status, v.current_hex_id
+            ),
+            assigned AS (
+                UPDATE incidents i
+                SET assigned_vehicle_id = claimed.id, status = 'assigned'
+                FROM claimed, target
+                WHERE i.id = target.id
+            )
+            SELECT id, type, latitude, longitude, status, current_hex_id FROM claimed
+            """,
+            {
+                "incident_id": incident["id"],
+                "types": list(self._wanted_vehicle_types(incident)),
+                "lat": float(incident["latitude"]),
+                "lng": float(incident["longitude"]),
+                "hex_id": incident["hex_id"],
+                "candidate_ids": candidate_ids,
+            },
+        )
+
+    def _lock_open_incident(self, incident: dict) -> bool:
+        """
+        Lock the incident row if it still needs a vehicle. False when it was
+        assigned or attended meanwhile, or another dispatcher holds it, so the
+        caller can tell that apart from "no unit free". The claim statements
+        re-lock the row; inside one transaction that is a no-op.
+        """
+        row = fetch_one(
+            """
+            SELECT id FROM incidents
+            WHERE id = %s AND assigned_vehicle_id IS NULL AND attended = FALSE
+            FOR UPDATE SKIP LOCKED
+            """,
+            (incident["id"],),
+        )
+        return row is not None
+
+    def _haversine_eta_s(self, distance_km: float) -> float:
+        return distance_km / self.fallback_speed_kmh * 3600.0
+
+    def _nearest_candidates(self, incident: dict) -> list[tuple[float, dict]]:
+        """Top-k dispatchable vehicles by straight-line distance, from the index or the table."""
+        lat = float(incident["latitude"])
+        lng = float(incident["longitude"])
+        if self.vehicle_index is not None:
+            self.vehicle_index.ensure_fresh()
+            return self.vehicle_index.nearest(lat, lng, self._wanted_vehicle_types(incident), k=INDEX_CANDIDATES)
+        rows = fetch_all(
+            """
+            SELECT id, latitude, longitude
             FROM vehicles
-            WHERE status IN ('available', 'patrolling') AND type = ANY(%s)
+            WHERE status IN ('available', 'patrolling') AND type = ANY(%(types)s)
+            ORDER BY power(latitude - %(lat)s, 2) + power((longitude - %(lng)s) * cos(radians(%(lat)s)), 2)
+            LIMIT %(k)s
             """,
-            (list(wanted_types),),
+            {"types": list(self._wanted_vehicle_types(incident)), "lat": lat, "lng": lng, "k": INDEX_CANDIDATES},
         )
-        if not dispatchable_vehicles:
+        return [(haversine_km(lat, lng, r["latitude"], r["longitude"]), r) for r in rows]
+
+    def _rank_by_eta(self, incident: dict, candidates: list[tuple[float, dict]]) -> tuple[list[str], dict, str]:
+        """
+        Order candidates by driving time from one OSRM ``/table`` call, or from
+        the precomputed hex matrix when that fails. Falls back to straight-line
+        order and a constant-speed estimate when ranking is disabled or neither
+        answers. Returns (ids, {id: eta_s}, source).
+        """
+        ids = [str(v["id"]) for _, v in candidates]
+        durations = None
+        if self.eta_ranking and len(candidates) > 0:
+            durations = self.route_service.get_durations_to(
+                [(float(v["latitude"]), float(v["longitude"])) for _, v in candidates],
+                float(incident["latitude"]),
+                float(incident["longitude"]),
+            )
+        source = "osrm_table"
+        if (durations is None or len(durations) != len(candidates)) and self.eta_ranking:
+            durations, source = self._matrix_durations(incident, candidates), "hex_matrix"
+        if durations is None or len(durations) != len(candidates):
+            return ids, {vid: self._haversine_eta_s(d) for vid, (d, _) in zip(ids, candidates)}, "haversine"
+
+        routable = {vid: duration is not None for vid, duration in zip(ids, durations)}
+        etas = {
+            vid: duration if duration is not None else self._haversine_eta_s(d)
+            for vid, duration, (d, _) in zip(ids, durations, candidates)
+        }
+        # Unroutable candidates sort after routable ones.
+        ranked = sorted(ids, key=lambda vid: (not routable[vid], etas[vid]))
+        return ranked, etas, source
+
+    def _matrix_durations(self, incident: dict, candidates: list[tuple[float, dict]]) -> list[float | None] | None:
+        """
+        Cell-to-cell durations from the precomputed hex matrix, when OSRM could
+        not answer. Units in the incident's own cell use the straight-line estimate.
+        """
+        lat, lng = float(incident["latitude"]), float(incident["longitude"])
+        origins = [(float(v["latitude"]), float(v["longitude"])) for _, v in candidates]
+        durations = self.hex_service.travel_times_to(origins, lat, lng)
+        if durations is None or np.isnan(durations).all():
             return None
+        return [
+            None if np.isnan(duration) else (self._haversine_eta_s(d) if duration == 0 else float(duration))
+            for duration, (d, _) in zip(durations, candidates)
+        ]
 
-        return min(
-            dispatchable_vehicles,
-            key=lambda vehicle: haversine_km(
-                incident["latitude"],
-                incident["longitude"],
-                vehicle["latitude"],
-                vehicle["longitude"],
-            ),
-        )
+    def rank_candidates(self, incident: dict) -> tuple[list[str], dict, str] | None:
+        """
+        Top-k straight-line candidates ranked by driving ETA, as (ids, {id: eta_s},
+        source), or None if no unit is dispatchable. The OSRM call can take
+        seconds, so run this before opening the transaction that claims.
+        """
+        candidates = self._nearest_candidates(incident)
+        if not candidates:
+            return None
+        return self._rank_by_eta(incident, candidates)
+
+    def _claim_vehicle(self, incident: dict, ranking: tuple[list[str], dict, str] | None) -> dict | None:
+        """
+        Claim the best of the ranked candidates; fall back to the full table claim
+        if there was no ranking or its units were all taken or stale.
+        Sets ``eta_s`` / ``eta_source`` on the returned vehicle.
+        """
+        if ranking is not None:
+            ranked, etas, source = ranking
+            vehicle = self._claim_nearest_vehicle(incident, ranked)
+            if vehicle is not None:
+                vehicle["eta_s"] = etas.get(str(vehicle["id"]))
+                vehicle["eta_source"] = source
+                return vehicle
+        vehicle = self._claim_nearest_vehicle(incident)
+        if vehicle is not None:
+            vehicle["eta_s"] = self._haversine_eta_s(
+                haversine_km(
+                    float(incident["latitude"]),
+                    float(incident["longitude"]),
+                    float(vehicle["latitude"]),
+                    float(vehicle["longitude"]),
+                )
+            )
+            vehicle["eta_source"] = "haversine"
+        return vehicle
 
     def _extract_route_hexes(self, route_geometry: List[List[float]]) -> List[str]:
-        route_hexes = {
-            self.hex_service.get_hex_id_from_latlng(lat=point[0], lng=point[1])
-            for point in route_geometry
-        }
-        return list(route_hexes)
+        """Green-corridor cells in the order the unit reaches them, with no gaps between vertices."""
+        route_hexes, _ = self.hex_service.route_corridor(route_geometry)
+        return route_hexes
+
+    def assign(self, incident: dict, ranking: tuple[list[str], dict, str] | None = None) -> dict | None:
+        """
+        Database half of a dispatch: atomically claim the nearest vehicle and assign
+        it to the incident, preempting a unit from lower-priority work if none is
+        free. ``ranking`` is ``rank_candidates(incident)``, computed by the caller
+        before its transaction; without it the nearest unit by straight line is
+        claimed. Runs inside the caller's transaction when one is open, so the
+        claim lock is held until that transaction commits. Updates ``incident``
+        in place; when the incident no longer needs a vehicle it is marked
+        ``claimed_elsewhere`` and None is returned.
+        """
+        if not self._lock_open_incident(incident):
+            incident["claimed_elsewhere"] = True
+            return None
+        vehicle = self._claim_vehicle(incident, ranking)
+        if vehicle is None and self.preemption is not None:
+            vehicle = self.preemption.preempt(incident)
+        if vehicle is None:
+            return None
+
+        if self.vehicle_index is not None:
+            vehicle_id = vehicle["id"]
+            after_commit(lambda: self.vehicle_index.update_status(vehicle_id, "busy"))
+        if self.preemption is not None:
+            after_commit(lambda: self.preemption.note_assigned(vehicle, incident))
+        incident["assigned_vehicle_id"] = vehicle["id"]
+        incident["status"] = "assigned"
+        return vehicle
 
     def dispatch(self, incident: dict) -> Dict:
-        vehicle = self._nearest_vehicle(incident)
+        ranking = self.rank_candidates(incident)
+        with transaction():
+            vehicle = self.assign(incident, ranking)
+        return self.complete_dispatch(incident, vehicle)
+
+    def complete_dispatch(self, incident: dict, vehicle: dict | None) -> Dict:
+        """
+        Post-commit half of a dispatch: route, green corridor, radio and socket events.
+        Kept outside the transaction so the OSRM call never holds a connection; the
+        route is stored in ``dispatch_routes`` right after it is computed.
+        """
+        if vehicle is None and incident.get("claimed_elsewhere"):
+            # Another dispatcher assigned (or someone closed) it first; it already announced the result.
+            return {
+                "incident_id": incident["id"],
+                "vehicle": None,
+                "claimed_elsewhere": True,
+                "message": "Incident already assigned or closed",
+            }
         if vehicle is None:
             payload = {
                 "incident_id": incident["id"],
@@ -75,6 +316,7 @@ class DispatchEngine:
             end_lng=incident["longitude"],
         )
         green_corridor_hexes = self._extract_route_hexes(route["geometry"])
+        record_route(incident["id"], vehicle["id"], TO_SCENE, route, green_corridor_hexes)
 
         # Activate green corridor – signals along route turn GREEN
         try:
@@ -85,15 +327,6 @@ class DispatchEngine:
 
         vehicle_prev_status = vehicle.get("status") or "available"
 
-        execute_query(
-            "UPDATE vehicles SET status = %s, current_hex_id = %s WHERE id = %s",
-            ("busy", incident["hex_id"], vehicle["id"]),
-        )
-        execute_query(
-            "UPDATE incidents SET assigned_vehicle_id = %s, status = %s WHERE id = %s",
-            (vehicle["id"], "assigned", incident["id"]),
-        )
-
         vehicle["status"] = "busy"
 
         # Simulated radio comms: control + dispatch (when patrolling -> busy)
@@ -118,11 +351,21 @@ class DispatchEngine:
             "current_hex_id": vehicle["current_hex_id"],
         }
 
+        # Prefer the full route's duration; otherwise keep the ranking estimate.
+        if route.get("duration_s") is not None:
+            eta_s, eta_source = route["duration_s"], route["source"]
+        else:
+            eta_s, eta_source = vehicle.get("eta_s"), vehicle.get("eta_source")
+
+        # Corridor and stored route use the full geometry; clients get the encoded, simplified line.
+        route_payload = self.route_service.encode_route(route)
         dispatch_payload = {
             "incident_id": incident["id"],
             "vehicle": vehicle_payload,
-            "route": route,
+            "route": route_payload,
             "green_corridor_hexes": green_corridor_hexes,
+            "eta_s": round(eta_s, 1) if eta_s is not None else None,
+            "eta_source": eta_source,
         }
 
         socketio.emit("vehicle_dispatched", dispatch_payload)
@@ -131,9 +374,41 @@ class DispatchEngine:
             {
                 "incident_id": incident["id"],
                 "vehicle_id": vehicle["id"],
-                "route": route,
+                "route": route_payload,
                 "green_corridor_hexes": green_corridor_hexes,
             },
         )
 
         return dispatch_payload
+
+    def unassigned_incidents(self) -> list[dict]:
+        """Open incidents without a vehicle, most urgent first (arrival order within a class)."""
+        rows = fetch_all(
+            """
+            SELECT id, type, latitude, longitude, hex_id
+            FROM incidents
+            WHERE attended = FALSE AND assigned_vehicle_id IS NULL
+            ORDER BY created_at
+            """
+        )
+        incidents = [{**row, "id": str(row["id"])} for row in rows]
+        return sorted(incidents, key=self.incident_priority, reverse=True)
+
+    def dispatch_unassigned(self, batch: bool = True) -> int:
+        """
+        Dispatch every open incident that has no vehicle yet. Returns how many got one.
+
+        ``batch`` solves one global assignment over all waiting incidents and
+        available vehicles (see ``services.batch_dispatch``); otherwise incidents
+        are dispatched one by one, each taking its nearest unit.
+        """
+        if batch:
+            from services.batch_dispatch import BatchDispatcher
+            return BatchDispatcher(self).dispatch_unassigned()
+
+        count = 0
+        for incident in self.unassigned_incidents():
+            result = self.dispatch(incident)
+            if result.get("vehicle"):
+                count += 1
+        return count
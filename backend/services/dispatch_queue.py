@@ -0,0 +1,194 @@
+"""
+Background dispatch queue.
+
+Incident intake persists and scores the incident, hands it to ``DispatchQueue``
+and returns 202 straight away; a small pool of worker threads runs
+``DispatchEngine.dispatch`` (vehicle claim, OSRM route, corridor, radio) off the
+request path. Results reach clients through the usual ``vehicle_dispatched`` and
+``route_update`` socket events, and per-incident progress is kept for
+``GET /api/incidents/<id>/dispatch-status``.
+
+Ordering is by severity class with aging (``services.dispatch_scheduler``).
+The queue is bounded: when it is full, a new incident displaces the newest queued
+incident of a lower class, or is refused if there is none. Displaced and refused
+incidents stay unassigned in the database for the next ``dispatch-unassigned``
+run (or are resubmitted when the change feed sees a unit free up) and are
+counted in ``stats()``.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from services.dispatch_scheduler import CLASS_NAMES, CRITICAL, ROUTINE, URGENT, LatencyTracker, PriorityScheduler
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DISPATCHING = "dispatching"
+ASSIGNED = "assigned"
+WAITING = "waiting"  # dispatched, but no unit was free
+DEFERRED = "deferred"  # queue full; left for dispatch-unassigned
+FAILED = "failed"
+
+
+class DispatchQueue:
+    def __init__(
+        self,
+        dispatch_engine,
+        workers: int = 4,
+        max_depth: int = 500,
+        status_limit: int = 5000,
+        aging_s: float = 60.0,
+        max_boost: float = 2.0,
+        slo_s: dict[int, float] | None = None,
+    ) -> None:
+        self.dispatch_engine = dispatch_engine
+        self.workers = workers
+        self.max_depth = max_depth
+        self.status_limit = status_limit
+        self._queue = PriorityScheduler(max_depth, aging_s=aging_s, max_boost=max_boost)
+        self.latency = LatencyTracker(slo_s or {CRITICAL: 5.0, URGENT: 30.0, ROUTINE: 300.0})
+        self._status: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._busy = 0
+        self._submitted = 0
+        self._started = 0
+        self._rejected = 0
+        self._displaced = 0
+        self._completed = 0
+        self._failed = 0
+        self._high_water = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._run_total_s = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"dispatch-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._queue.close()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def _set_status(self, incident_id: str, state: str, **fields) -> dict:
+        with self._lock:
+            entry = self._status.pop(incident_id, None) or {"incident_id": incident_id}
+            entry.update(fields, state=state, updated_at=time.time())
+            self._status[incident_id] = entry
+            while len(self._status) > self.status_limit:
+                self._status.popitem(last=False)
+            return dict(entry)
+
+    def _clear_status(self, incident_id: str) -> None:
+        with self._lock:
+            self._status.pop(incident_id, None)
+
+    def submit(self, incident: dict) -> dict:
+        """Enqueue a committed incident for dispatch. Returns its status entry."""
+        incident_id = str(incident["id"])
+        priority = self.dispatch_engine.incident_priority(incident)
+        now = time.time()
+        try:
+            displaced = self._queue.put_nowait(incident, priority, enqueued_at=now)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning("Dispatch queue full (%d); incident %s deferred", self.max_depth, incident_id)
+            return self._set_status(incident_id, DEFERRED, priority=CLASS_NAMES[priority], enqueued_at=None)
+        with self._lock:
+            self._submitted += 1
+            self._high_water = max(self._high_water, self._queue.qsize())
+        if displaced is not None:
+            with self._lock:
+                self._displaced += 1
+            logger.warning("Dispatch queue full; incident %s displaced by higher-priority %s", displaced["id"], incident_id)
+            self._set_status(str(displaced["id"]), DEFERRED, enqueued_at=None)
+        return self._set_status(incident_id, QUEUED, priority=CLASS_NAMES[priority], enqueued_at=now)
+
+    def owns(self, incident_id: str) -> bool:
+        """True while the incident is queued or being dispatched by a worker."""
+        with self._lock:
+            entry = self._status.get(str(incident_id))
+            return entry is not None and entry["state"] in (QUEUED, DISPATCHING)
+
+    def status(self, incident_id: str) -> dict | None:
+        with self._lock:
+            entry = self._status.get(str(incident_id))
+            return dict(entry) if entry else None
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            enqueued_at, priority, incident = item
+            incident_id = str(incident["id"])
+            started = time.time()
+            wait_s = started - enqueued_at
+            with self._lock:
+                self._busy += 1
+                self._started += 1
+                self._wait_total_s += wait_s
+                self._wait_max_s = max(self._wait_max_s, wait_s)
+            self._set_status(incident_id, DISPATCHING, started_at=started)
+            try:
+                payload = self.dispatch_engine.dispatch(incident)
+            except Exception as error:
+                logger.exception("Background dispatch of incident %s failed", incident_id)
+                with self._lock:
+                    self._failed += 1
+                self._set_status(incident_id, FAILED, finished_at=time.time(), error=str(error))
+            else:
+                vehicle = payload.get("vehicle")
+                if payload.get("claimed_elsewhere"):
+                    # Not ours to report: dispatch-status falls back to the incident row.
+                    self._clear_status(incident_id)
+                else:
+                    self._set_status(
+                        incident_id,
+                        ASSIGNED if vehicle else WAITING,
+                        finished_at=time.time(),
+                        vehicle_id=str(vehicle["id"]) if vehicle else None,
+                        eta_s=payload.get("eta_s"),
+                    )
+            finally:
+                self.latency.record(priority, time.time() - enqueued_at)
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+                    self._run_total_s += time.time() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._completed
+            started = self._started
+            return {
+                "depth": self._queue.qsize(),
+                "depth_by_class": self._queue.depths(),
+                "max_depth": self.max_depth,
+                "high_water": self._high_water,
+                "workers": len(self._threads),
+                "busy": self._busy,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "displaced": self._displaced,
+                "completed": completed,
+                "failed": self._failed,
+                "wait_avg_ms": round(self._wait_total_s / started * 1000, 2) if started else 0.0,
+                "wait_max_ms": round(self._wait_max_s * 1000, 2),
+                "dispatch_avg_ms": round(self._run_total_s / completed * 1000, 2) if completed else 0.0,
+                "time_to_dispatch": self.latency.summary(),
+            }
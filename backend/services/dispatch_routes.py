@@ -0,0 +1,115 @@
+"""
+Planned dispatch routes.
+
+``dispatch_routes`` keeps the route each unit was sent on: one row per
+(incident, leg) with the geometry as an encoded polyline, distance, duration,
+source and the green-corridor hexes. The dispatch writes the ``to_scene`` leg,
+the hospital re-route overwrites the ``to_hospital`` leg, and the rows outlive
+the incident being attended so planned routes can be compared with the tracks
+units actually drove.
+
+``GET /api/dispatches/active`` reads these rows instead of asking OSRM again.
+
+The row is written after the dispatch commits (the route is computed outside
+the transaction), and a failed write must not fail a dispatch that already
+happened. ``record_route`` therefore logs and counts failures and remembers
+the most recent failed (incident, leg) pairs, so ``/api/dispatches/active``
+can tell a route whose write failed from one not written yet and ``/health``
+shows the totals.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+
+from utils import polyline
+from utils.db import execute_query
+
+logger = logging.getLogger(__name__)
+
+TO_SCENE = "to_scene"
+TO_HOSPITAL = "to_hospital"
+
+FAILED_KEYS_LIMIT = 1000
+
+_lock = threading.Lock()
+_counts = {"stored": 0, "failed": 0}
+_failed: OrderedDict[tuple[str, str], None] = OrderedDict()
+
+
+def save_route(incident_id, vehicle_id, leg: str, route: dict, corridor_hexes: list[str]) -> None:
+    """Insert or replace the planned route for one leg of a dispatch."""
+    execute_query(
+        """
+        INSERT INTO dispatch_routes
+            (incident_id, leg, vehicle_id, geometry, distance_m, duration_s, source, corridor_hexes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (incident_id, leg) DO UPDATE SET
+            vehicle_id = EXCLUDED.vehicle_id,
+            geometry = EXCLUDED.geometry,
+            distance_m = EXCLUDED.distance_m,
+            duration_s = EXCLUDED.duration_s,
+            source = EXCLUDED.source,
+            corridor_hexes = EXCLUDED.corridor_hexes,
+            updated_at = NOW()
+        """,
+        (
+            str(incident_id),
+            leg,
+            str(vehicle_id),
+            polyline.encode(route.get("geometry") or []),
+            route.get("distance_m"),
+            route.get("duration_s"),
+            route.get("source") or "unknown",
+            list(corridor_hexes),
+        ),
+    )
+
+
+def record_route(incident_id, vehicle_id, leg: str, route: dict, corridor_hexes: list[str]) -> None:
+    """``save_route`` for the post-commit dispatch path: a failed write is logged and counted, never raised."""
+    key = (str(incident_id), leg)
+    try:
+        save_route(incident_id, vehicle_id, leg, route, corridor_hexes)
+    except Exception:
+        logger.exception("Could not store %s route for incident %s", leg, incident_id)
+        with _lock:
+            _counts["failed"] += 1
+            _failed[key] = None
+            _failed.move_to_end(key)
+            while len(_failed) > FAILED_KEYS_LIMIT:
+                _failed.popitem(last=False)
+        return
+    with _lock:
+        _counts["stored"] += 1
+        _failed.pop(key, None)
+
+
+def write_failed(incident_id, leg: str) -> bool:
+    """True if the last attempt to store this leg (in this process) failed."""
+    with _lock:
+        return (str(incident_id), leg) in _failed
+
+
+def write_stats() -> dict:
+    with _lock:
+        return {**_counts, "recent_failures": len(_failed)}
+
+
+def route_from_row(row: dict, decode: bool = True) -> dict:
+    """
+    Rebuild the ``RouteService.get_route`` shape from a stored row (columns
+    aliased ``route_*``). With ``decode=False`` the stored ``polyline`` is
+    returned as is instead of ``geometry``.
+    """
+    route = {
+        "distance_m": row["route_distance_m"],
+        "duration_s": row["route_duration_s"],
+        "source": row["route_source"],
+    }
+    if decode:
+        route["geometry"] = polyline.decode(row["route_geometry"])
+    else:
+        route["polyline"] = row["route_geometry"]
+    return route
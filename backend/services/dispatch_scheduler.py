@@ -0,0 +1,132 @@
+"""
+Priority scheduler for the background dispatch queue.
+
+Incidents wait in one FIFO per severity class (critical: fire/medical/accident,
+urgent: crime, routine: civic). Workers always take the head with the highest
+effective priority, ``base + min(age / aging_s, max_boost)``, so a surge of
+civic complaints never delays a fire, yet a civic incident does not starve
+behind a stream of crime reports: after ``aging_s`` it ties fresh urgent work
+and then moves ahead of urgent incidents that have waited less than it. Ties
+go to the higher base class, then the older incident, so with the default
+``max_boost = 2`` an aged civic incident at most ties fresh critical work and
+never overtakes it.
+
+The scheduler is bounded: when full, a new incident evicts the newest queued
+incident of a strictly lower class; if there is none it is refused.
+
+``LatencyTracker`` records enqueue-to-dispatch time per class against an SLO.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+
+CRITICAL = 3
+URGENT = 2
+ROUTINE = 1
+
+CLASS_NAMES = {CRITICAL: "critical", URGENT: "urgent", ROUTINE: "routine"}
+
+
+class PriorityScheduler:
+    def __init__(self, max_depth: int, aging_s: float = 60.0, max_boost: float = 2.0) -> None:
+        self.max_depth = max_depth
+        self.aging_s = aging_s
+        self.max_boost = max_boost
+        self._queues: dict[int, deque] = {priority: deque() for priority in CLASS_NAMES}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return self._size
+
+    def depths(self) -> dict[str, int]:
+        with self._cond:
+            return {CLASS_NAMES[p]: len(q) for p, q in self._queues.items()}
+
+    def put_nowait(self, item, priority: int, enqueued_at: float | None = None):
+        """
+        Queue ``item``. Returns the evicted lower-priority item (or None);
+        raises ``queue.Full`` when full of equal-or-higher priority work.
+        """
+        priority = priority if priority in self._queues else ROUTINE
+        entry = (enqueued_at if enqueued_at is not None else time.time(), item)
+        with self._cond:
+            evicted = None
+            if self._size >= self.max_depth:
+                victim = next((p for p in sorted(self._queues) if p < priority and self._queues[p]), None)
+                if victim is None:
+                    raise queue.Full
+                evicted = self._queues[victim].pop()[1]
+                self._size -= 1
+            self._queues[priority].append(entry)
+            self._size += 1
+            self._cond.notify()
+            return evicted
+
+    def _effective(self, priority: int, enqueued_at: float, now: float) -> float:
+        return priority + min((now - enqueued_at) / self.aging_s, self.max_boost)
+
+    def get(self):
+        """Block for the next item; returns (enqueued_at, priority, item), or None once closed."""
+        with self._cond:
+            while self._size == 0 and not self._closed:
+                self._cond.wait()
+            if self._size == 0:
+                return None
+            now = time.time()
+            best = max(
+                (p for p, q in self._queues.items() if q),
+                key=lambda p: (self._effective(p, self._queues[p][0][0], now), p, -self._queues[p][0][0]),
+            )
+            enqueued_at, item = self._queues[best].popleft()
+            self._size -= 1
+            return enqueued_at, best, item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class LatencyTracker:
+    """Rolling enqueue-to-dispatch latency per class, with SLO breach counts."""
+
+    def __init__(self, slo_s: dict[int, float], window: int = 1000) -> None:
+        self.slo_s = slo_s
+        self._samples = {priority: deque(maxlen=window) for priority in CLASS_NAMES}
+        self._counts = {priority: 0 for priority in CLASS_NAMES}
+        self._breaches = {priority: 0 for priority in CLASS_NAMES}
+        self._lock = threading.Lock()
+
+    def record(self, priority: int, latency_s: float) -> None:
+        with self._lock:
+            self._samples[priority].append(latency_s)
+            self._counts[priority] += 1
+            if latency_s > self.slo_s.get(priority, float("inf")):
+                self._breaches[priority] += 1
+
+    @staticmethod
+    def _percentile(ordered: list[float], pct: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> dict[str, dict]:
+        with self._lock:
+            result = {}
+            for priority, name in CLASS_NAMES.items():
+                ordered = sorted(self._samples[priority])
+                count = self._counts[priority]
+                result[name] = {
+                    "slo_ms": round(self.slo_s.get(priority, 0) * 1000),
+                    "dispatched": count,
+                    "slo_breaches": self._breaches[priority],
+                    "slo_met_pct": round(100 * (1 - self._breaches[priority] / count), 2) if count else 100.0,
+                    "p50_ms": round(self._percentile(ordered, 50) * 1000, 2) if ordered else 0.0,
+                    "p95_ms": round(self._percentile(ordered, 95) * 1000, 2) if ordered else 0.0,
+                    "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+                }
+            return result
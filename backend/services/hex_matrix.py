@@ -0,0 +1,92 @@
+"""
+Precomputed hex-to-hex travel times.
+
+Driving duration and distance between every pair of H3 cell centres of the
+city grid, built offline by ``scripts/build_hex_matrix.py`` (OSRM ``/table``
+in batches, or the local road graph) and stored as a directory opened
+memory-mapped:
+
+- ``durations_s.npy`` / ``distances_m.npy`` (float32, N x N): row = origin
+  cell, column = destination cell, NaN where no route was found
+- ``meta.json``: ``format_version``, ``resolution``, ``grid_version`` (hash of
+  the resolution and cell list), ``hex_ids`` (row order), ``source``,
+  ``built_at``
+
+A matrix is only used when its format and grid version match the running
+grid, so a resolution or bbox change never serves stale rows. Lookups are an
+index into the mapped arrays: no network, microseconds.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Iterable, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def grid_version(hex_ids: Iterable[str], resolution: int) -> str:
+    digest = hashlib.sha1(f"{resolution}:".encode())
+    for hex_id in sorted(hex_ids):
+        digest.update(hex_id.encode())
+    return digest.hexdigest()[:16]
+
+
+class HexTravelMatrix:
+    def __init__(self, path: str, resolution: int | None = None, hex_ids: Iterable[str] | None = None) -> None:
+        """Open the matrix at ``path``; ValueError if it was built for another format or grid."""
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"hex matrix format {self.meta.get('format_version')}, expected {FORMAT_VERSION}")
+        if resolution is not None and self.meta.get("resolution") != resolution:
+            raise ValueError(f"hex matrix built for resolution {self.meta.get('resolution')}, grid is {resolution}")
+        if hex_ids is not None and self.meta.get("grid_version") != grid_version(hex_ids, self.meta["resolution"]):
+            raise ValueError("hex matrix built for a different grid; rebuild it")
+
+        self.hex_ids: list[str] = self.meta["hex_ids"]
+        self.index = {hex_id: i for i, hex_id in enumerate(self.hex_ids)}
+        self.durations_s = np.load(os.path.join(path, "durations_s.npy"), mmap_mode="r")
+        self.distances_m = np.load(os.path.join(path, "distances_m.npy"), mmap_mode="r")
+        n = len(self.hex_ids)
+        if self.durations_s.shape != (n, n) or self.distances_m.shape != (n, n):
+            raise ValueError(f"hex matrix arrays do not match {n} cells")
+
+    @property
+    def version(self) -> str:
+        return self.meta["grid_version"]
+
+    def lookup(self, origin_hex: str, dest_hex: str) -> tuple[float, float] | None:
+        """(duration_s, distance_m) between two cell centres, or None if unknown."""
+        i = self.index.get(origin_hex)
+        j = self.index.get(dest_hex)
+        if i is None or j is None:
+            return None
+        duration = float(self.durations_s[i, j])
+        if np.isnan(duration):
+            return None
+        return duration, float(self.distances_m[i, j])
+
+    def durations_to(self, origin_hexes: Sequence[str], dest_hex: str) -> np.ndarray:
+        """Durations (s) from each origin cell to one destination cell; NaN where unknown."""
+        result = np.full(len(origin_hexes), np.nan)
+        j = self.index.get(dest_hex)
+        if j is None:
+            return result
+        rows = np.array([self.index.get(h, -1) for h in origin_hexes], dtype=np.int64)
+        known = rows >= 0
+        result[known] = self.durations_s[rows[known], j]
+        return result
+
+    def info(self) -> dict:
+        return {
+            "cells": len(self.hex_ids),
+            "resolution": self.meta.get("resolution"),
+            "grid_version": self.meta.get("grid_version"),
+            "source": self.meta.get("source"),
+            "built_at": self.meta.get("built_at"),
+        }
@@ -1,21 +1,107 @@
 from __future__ import annotations
 
-from typing import Dict, List, Set
+import hashlib
+import threading
+from typing import Dict, List, Sequence, Set, Tuple
 
 import h3
+import numpy as np
 from h3 import LatLngPoly
 
-from utils.db import execute_query, fetch_all
+from services.hex_matrix import grid_version
+from utils.db import copy_rows, execute_query, fetch_all, fetch_all_read, transaction
+from utils.geo_vector import as_points, haversine_km
+
+
+def route_corridor(points: Sequence[Sequence[float]], resolution: int) -> Tuple[List[str], np.ndarray]:
+    """
+    H3 cells a route passes through, in traversal order, with the distance
+    along the route (metres) at which each is first entered.
+
+    Segments are densified in one array pass to half an edge length, so long
+    straight segments (highways, straight-line fallbacks) still sample every
+    few hundred metres; consecutive duplicates are dropped, and any remaining
+    jump between non-adjacent cells (a clipped corner) is filled with the H3
+    grid path. A cell the route comes back to keeps its first position.
+    """
+    pts = as_points(points)
+    if len(pts) == 0:
+        return [], np.empty(0)
+
+    step_km = h3.average_hexagon_edge_length(resolution, unit="km") / 2
+    seg_km = haversine_km(pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1])
+    pieces = np.maximum(1, np.ceil(seg_km / step_km).astype(np.int64))
+    seg = np.repeat(np.arange(len(seg_km)), pieces)
+    frac = (np.arange(len(seg)) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[seg]
+    start_km = np.concatenate(([0.0], np.cumsum(seg_km)))
+    lat = np.append(pts[seg, 0] + (pts[seg + 1, 0] - pts[seg, 0]) * frac, pts[-1, 0])
+    lng = np.append(pts[seg, 1] + (pts[seg + 1, 1] - pts[seg, 1]) * frac, pts[-1, 1])
+    along_m = np.append(start_km[seg] + seg_km[seg] * frac, start_km[-1]) * 1000
+
+    cells = np.fromiter(
+        (h3.str_to_int(h3.latlng_to_cell(a, b, resolution)) for a, b in zip(lat.tolist(), lng.tolist())),
+        dtype=np.uint64,
+        count=len(lat),
+    )
+    entered = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    runs = [h3.int_to_str(int(c)) for c in cells[entered]]
+    run_m = along_m[entered].tolist()
+
+    hexes: List[str] = []
+    entry_m: List[float] = []
+    for i, (cell, distance) in enumerate(zip(runs, run_m)):
+        if i and not h3.are_neighbor_cells(runs[i - 1], cell):
+            try:
+                between = h3.grid_path_cells(runs[i - 1], cell)[1:-1]
+            except h3.H3BaseException:
+                between = []
+            for k, filler in enumerate(between, start=1):
+                hexes.append(filler)
+                entry_m.append(run_m[i - 1] + (distance - run_m[i - 1]) * k / (len(between) + 1))
+        hexes.append(cell)
+        entry_m.append(distance)
+
+    first: Dict[str, float] = {}
+    for cell, distance in zip(hexes, entry_m):
+        first.setdefault(cell, distance)
+    return list(first), np.fromiter(first.values(), dtype=np.float64, count=len(first))
 
 
 class HexService:
-    def __init__(self, chennai_bbox: Dict[str, float], resolution: int = 7) -> None:
+    def __init__(self, chennai_bbox: Dict[str, float], resolution: int = 7, travel_matrix=None) -> None:
         self.bbox = chennai_bbox
         self.resolution = resolution
+        # Optional services.hex_matrix.HexTravelMatrix for network-free ETAs between cells.
+        self.travel_matrix = travel_matrix
+        # Cell geometry never changes for a given bbox and resolution: built once, kept in memory.
+        self._geometry: Dict[str, dict] = {}
+        self._grid_version: str | None = None
+        self._bootstrapped = False
+        self._lock = threading.Lock()
 
     def get_hex_id_from_latlng(self, lat: float, lng: float) -> str:
         return h3.latlng_to_cell(lat, lng, self.resolution)
 
+    def route_corridor(self, geometry: Sequence[Sequence[float]]) -> Tuple[List[str], np.ndarray]:
+        """Ordered, gap-free cells along ``[[lat, lng], ...]`` and their entry distances (see ``route_corridor``)."""
+        return route_corridor(geometry, self.resolution)
+
+    def travel_between(self, origin_hex: str, dest_hex: str) -> Tuple[float, float] | None:
+        """(duration_s, distance_m) between two cell centres from the precomputed matrix, or None."""
+        if self.travel_matrix is None:
+            return None
+        return self.travel_matrix.lookup(origin_hex, dest_hex)
+
+    def travel_times_to(self, origins: Sequence[Tuple[float, float]], lat: float, lng: float) -> np.ndarray | None:
+        """
+        Matrix durations (s) from each (lat, lng) origin's cell to the cell of
+        (lat, lng); NaN where unknown. None without a matrix.
+        """
+        if self.travel_matrix is None:
+            return None
+        origin_hexes = [self.get_hex_id_from_latlng(float(a), float(b)) for a, b in origins]
+        return self.travel_matrix.durations_to(origin_hexes, self.get_hex_id_from_latlng(float(lat), float(lng)))
+
     def ensure_hex_exists(self, hex_id: str) -> None:
         """Insert hex into hex_cells if missing (for incident FK). Uses ON CONFLICT DO NOTHING."""
         center_lat, center_lng = h3.cell_to_latlng(hex_id)
@@ -46,48 +132,104 @@ class HexService:
         existing_rows = fetch_all("SELECT hex_id FROM hex_cells")
         existing = {row["hex_id"] for row in existing_rows}
 
-        # If DB has hexes at a different resolution, clear and repopulate at current resolution
-        for hex_id in existing:
-            if h3.get_resolution(hex_id) != self.resolution:
-                execute_query("DELETE FROM hex_cells")
-                existing = set()
-                break
+        with transaction():
+            # If DB has hexes at a different resolution, clear and repopulate at current resolution
+            for hex_id in existing:
+                if h3.get_resolution(hex_id) != self.resolution:
+                    execute_query("DELETE FROM hex_cells")
+                    existing = set()
+                    break
 
-        missing = target_hexes - existing
-        if not missing:
-            return 0
+            missing = target_hexes - existing
+            if not missing:
+                return 0
 
-        for hex_id in missing:
-            center_lat, center_lng = h3.cell_to_latlng(hex_id)
-            execute_query(
-                """
-                INSERT INTO hex_cells (hex_id, center_lat, center_lng, incident_count, patrol_priority_score)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (hex_id) DO NOTHING
-                """,
-                (hex_id, float(center_lat), float(center_lng), 0, 0.0),
+            rows = []
+            for hex_id in missing:
+                center_lat, center_lng = h3.cell_to_latlng(hex_id)
+                rows.append((hex_id, float(center_lat), float(center_lng), 0, 0.0))
+            # One COPY instead of one INSERT per cell; staging skips cells another worker inserted,
+            # so the count it reports (not len(missing)) is what this call inserted.
+            inserted = copy_rows(
+                "hex_cells",
+                ("hex_id", "center_lat", "center_lng", "incident_count", "patrol_priority_score"),
+                rows,
+                ignore_conflicts=True,
             )
-        return len(missing)
+        return inserted
+
+    def ensure_bootstrapped(self) -> int:
+        """
+        ``ensure_hex_cells_in_db`` once per process (normally at startup); later
+        calls are free. Retried on the next call if the database was unavailable.
+        """
+        if self._bootstrapped:
+            return 0
+        with self._lock:
+            if self._bootstrapped:
+                return 0
+            inserted = self.ensure_hex_cells_in_db()
+            self._bootstrapped = True
+            return inserted
 
-    def _hex_boundary(self, hex_id: str) -> List[List[float]]:
-        boundary = h3.cell_to_boundary(hex_id)
-        return [[float(lat), float(lng)] for lat, lng in boundary]
+    def warm_grid(self) -> str:
+        """Build boundaries for every grid cell and the grid version. Returns the version."""
+        with self._lock:
+            if self._grid_version is None:
+                hex_ids = self.generate_chennai_hex_ids()
+                for hex_id in hex_ids:
+                    self._geometry[hex_id] = self._build_geometry(hex_id)
+                self._grid_version = grid_version(hex_ids, self.resolution)
+            return self._grid_version
 
-    def get_hex_grid_payload(self) -> List[dict]:
-        cells = fetch_all(
+    @property
+    def grid_version(self) -> str:
+        return self._grid_version or self.warm_grid()
+
+    @staticmethod
+    def _build_geometry(hex_id: str) -> dict:
+        center_lat, center_lng = h3.cell_to_latlng(hex_id)
+        return {
+            "polygon": [[float(lat), float(lng)] for lat, lng in h3.cell_to_boundary(hex_id)],
+            "center": [float(center_lat), float(center_lng)],
+        }
+
+    def cell_geometry(self, hex_id: str) -> dict:
+        """Cached {"polygon", "center"}; cells outside the bbox grid (incidents just outside it) are added on first use."""
+        geometry = self._geometry.get(hex_id)
+        if geometry is None:
+            geometry = self._geometry.setdefault(hex_id, self._build_geometry(hex_id))
+        return geometry
+
+    def fetch_cell_counts(self) -> List[dict]:
+        """The only per-request part of the grid: which cells exist and their counts."""
+        return fetch_all_read(
             """
-            SELECT hex_id, center_lat, center_lng, incident_count, patrol_priority_score
+            SELECT hex_id, incident_count, patrol_priority_score
             FROM hex_cells
             ORDER BY hex_id ASC
             """
         )
+
+    def grid_etag(self, counts: List[dict]) -> str:
+        """Grid version plus a digest of the counts, so unchanged grids can be answered with 304."""
+        digest = hashlib.sha1()
+        for cell in counts:
+            digest.update(f"{cell['hex_id']}:{cell['incident_count']}:{float(cell['patrol_priority_score'])};".encode())
+        return f"{self.grid_version}-{digest.hexdigest()[:16]}"
+
+    def get_hex_grid_payload(self, counts: List[dict] | None = None) -> List[dict]:
+        """Cached cell geometry merged with ``counts`` (read from ``hex_cells`` when not given)."""
+        if counts is None:
+            counts = self.fetch_cell_counts()
+        if self._grid_version is None:
+            self.warm_grid()
         return [
             {
                 "hex_id": cell["hex_id"],
-                "polygon": self._hex_boundary(cell["hex_id"]),
-                "center": [cell["center_lat"], cell["center_lng"]],
+                **self.cell_geometry(cell["hex_id"]),
                 "incident_count": cell["incident_count"],
                 "patrol_priority_score": float(cell["patrol_priority_score"]),
             }
-            for cell in cells
+            for cell in counts
         ]
@@ -3,7 +3,7 @@ from __future__ import annotations
 from typing import List
 
 from extensions import socketio
-from utils.db import execute_query, fetch_one
+from utils.db import after_commit, execute_query, fetch_one
 
 
 class IncidentIntelligenceEngine:
@@ -27,19 +27,19 @@ class IncidentIntelligenceEngine:
 
     def process_incident(self, incident: dict) -> List[dict]:
         alerts: List[dict] = []
-        hex_cell = fetch_one("SELECT hex_id FROM hex_cells WHERE hex_id = %s", (incident["hex_id"],))
-
-        if hex_cell:
-            count_row = fetch_one(
-                "SELECT COUNT(*)::int AS count FROM incidents WHERE hex_id = %s",
-                (incident["hex_id"],),
-            )
-            current_count = count_row["count"] if count_row else 0
+        # Recount and store in one round trip; no row back means the hex is not in hex_cells.
+        count_row = fetch_one(
+            """
+            UPDATE hex_cells
+            SET incident_count = (SELECT COUNT(*)::int FROM incidents WHERE hex_id = %s)
+            WHERE hex_id = %s
+            RETURNING incident_count AS count
+            """,
+            (incident["hex_id"], incident["hex_id"]),
+        )
 
-            execute_query(
-                "UPDATE hex_cells SET incident_count = %s WHERE hex_id = %s",
-                (current_count, incident["hex_id"]),
-            )
+        if count_row:
+            current_count = count_row["count"]
 
             if current_count >= self.incident_density_threshold:
                 execute_query(
@@ -92,7 +92,8 @@ class IncidentIntelligenceEngine:
                 if alert:
                     alerts.append(alert)
 
+        # Inside a transaction, only announce alerts once they are committed.
         for alert in alerts:
-            self._emit_alert(alert)
+            after_commit(lambda alert=alert: self._emit_alert(alert))
 
         return alerts
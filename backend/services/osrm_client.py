@@ -0,0 +1,174 @@
+"""
+Shared HTTP client for OSRM.
+
+- one ``requests.Session`` with a keep-alive connection pool, so route and
+  table calls reuse TCP/TLS connections instead of handshaking every time;
+- bounded retries with full jitter on connection errors and 5xx. Timeouts are
+  not retried: a hung OSRM would cost the full timeout again per attempt, so
+  the call fails at once and the caller falls back;
+- a circuit breaker: after ``failure_threshold`` consecutive failures calls
+  fail fast (``OsrmUnavailable``) for ``reset_timeout_s``, then one trial call
+  decides whether to close it again. Callers fall back to straight lines
+  instead of paying a full timeout per dispatch while OSRM is down;
+- latency and error counters for ``/health``.
+
+4xx responses (e.g. ``NoRoute``) are returned as ``OsrmError`` without counting
+against OSRM's health.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class OsrmError(RuntimeError):
+    """OSRM answered but could not serve the request (4xx / non-Ok code)."""
+
+
+class OsrmUnavailable(RuntimeError):
+    """OSRM is unreachable, failing, or the circuit is open."""
+
+
+class OsrmClient:
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 16,
+        retries: int = 2,
+        backoff_s: float = 0.1,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._latencies_ms: deque[float] = deque(maxlen=1000)
+        self._counts = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "short_circuited": 0,
+            "client_errors": 0,
+            "timeouts": 0,
+            "circuit_opened": 0,
+        }
+
+    # Circuit breaker
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._counts["short_circuited"] += 1
+            return False
+
+    def _on_success(self, latency_ms: float) -> None:
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+            self._counts["succeeded"] += 1
+            self._consecutive_failures = 0
+            self._state = CLOSED
+            self._trial_in_flight = False
+
+    def _on_failure(self) -> None:
+        with self._lock:
+            self._counts["failed"] += 1
+            self._consecutive_failures += 1
+            tripped = self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold
+            self._trial_in_flight = False
+            if tripped:
+                if self._state != OPEN:
+                    self._counts["circuit_opened"] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    # Requests
+
+    def get(self, path: str, timeout: float, retries: int | None = None) -> dict:
+        """
+        GET ``{base_url}{path}`` and return the JSON body (``code == "Ok"``).
+        Raises OsrmUnavailable (network/5xx/open circuit) or OsrmError (4xx/non-Ok).
+        """
+        if not self._allow():
+            raise OsrmUnavailable("OSRM circuit open")
+        self._count("requests")
+
+        attempts = 1 + (self.retries if retries is None else retries)
+        last_error: Exception | None = None
+        attempt = 0
+        for attempt in range(attempts):
+            if attempt:
+                self._count("retries")
+                time.sleep(random.uniform(0, self.backoff_s * (2 ** (attempt - 1))))
+            started = time.perf_counter()
+            try:
+                response = self.session.get(f"{self.base_url}{path}", timeout=timeout)
+            except requests.Timeout as error:
+                self._count("timeouts")
+                last_error = error
+                break
+            except requests.RequestException as error:
+                last_error = error
+                continue
+            if response.status_code >= 500:
+                last_error = OsrmUnavailable(f"OSRM returned {response.status_code}")
+                continue
+
+            self._on_success((time.perf_counter() - started) * 1000)
+            try:
+                data = response.json()
+            except ValueError as error:
+                self._count("client_errors")
+                raise OsrmError(f"OSRM returned invalid JSON: {error}") from error
+            if response.status_code >= 400 or data.get("code") != "Ok":
+                self._count("client_errors")
+                raise OsrmError(f"OSRM {response.status_code}: {data.get('code')} {data.get('message', '')}".strip())
+            return data
+
+        self._on_failure()
+        raise OsrmUnavailable(f"OSRM request failed after {attempt + 1} attempt(s): {last_error}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            ordered = sorted(self._latencies_ms)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1) + 0.5))] if ordered else 0.0
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                **self._counts,
+                "latency_avg_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+                "latency_p95_ms": round(p95, 2),
+                "latency_max_ms": round(ordered[-1], 2) if ordered else 0.0,
+            }
@@ -0,0 +1,192 @@
+"""
+Preemptive reassignment of busy units.
+
+When no matching unit is free for an incident, ``PreemptionEngine`` looks for a
+busy unit of a suitable type that is serving a *lower*-priority incident nearby,
+redirects it to the new incident and puts the displaced incident back in the
+dispatch queue. Candidates come from ``BusyUnitIndex``, an in-memory index of
+busy units bucketed by (vehicle type, incident priority) and H3 cell, so a
+lookup only touches nearby units that could legally be preempted. Units already
+carrying a patient (``leg_phase = 'to_hospital'``) are never preempted.
+
+Like ``VehicleSpatialIndex`` the index is only a candidate generator: the
+reassignment statement re-checks, under row locks, that the unit is still busy
+on the displaced incident and that the new incident is still waiting, and
+releases the old assignment and makes the new one atomically.
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from extensions import socketio
+from services.vehicle_index import VehicleSpatialIndex
+from utils.db import after_commit, fetch_all, fetch_one
+
+logger = logging.getLogger(__name__)
+
+# Busy candidates checked (nearest first) before giving up.
+PREEMPT_CANDIDATES = 5
+
+
+class BusyUnitIndex(VehicleSpatialIndex):
+    """Busy units grouped by (vehicle type, priority of the incident they serve)."""
+
+    statuses = ("busy",)
+    extra_fields = ("incident_id", "incident_priority")
+
+    def _group(self, entry: dict):
+        return (entry["type"], entry["incident_priority"])
+
+    def upsert(self, vehicle: dict) -> None:
+        if vehicle.get("incident_id") is None:
+            self.remove(vehicle["id"])
+            return
+        super().upsert(vehicle)
+
+
+class PreemptionEngine:
+    def __init__(self, dispatch_engine, max_radius_km: float = 8.0, resync_interval_s: float = 15.0, resolution: int = 8) -> None:
+        self.dispatch_engine = dispatch_engine
+        self.max_radius_km = max_radius_km
+        self.busy_index = BusyUnitIndex(resolution=resolution, resync_interval_s=resync_interval_s)
+        # Called after commit with each displaced incident; set by the app (dispatch queue submit).
+        self.requeue = None
+        self.preemptions = 0
+
+    def resync(self) -> None:
+        rows = fetch_all(
+            """
+            SELECT v.id, v.type, v.latitude, v.longitude, v.status, v.current_hex_id,
+                   i.id AS incident_id, i.type AS incident_type
+            FROM vehicles v
+            JOIN incidents i ON i.assigned_vehicle_id = v.id AND i.attended = FALSE
+            WHERE v.status = 'busy' AND COALESCE(i.leg_phase, 'to_scene') = 'to_scene'
+            """
+        )
+        for row in rows:
+            row["incident_id"] = str(row["incident_id"])
+            row["incident_priority"] = self.dispatch_engine.incident_priority({"type": row["incident_type"]})
+        self.busy_index.load(rows)
+
+    def ensure_fresh(self) -> None:
+        if time.monotonic() - self.busy_index._loaded_at >= self.busy_index.resync_interval_s:
+            self.resync()
+
+    def note_assigned(self, vehicle: dict, incident: dict) -> None:
+        """Record a committed assignment so the unit can later be preempted."""
+        self.busy_index.upsert(
+            {
+                **vehicle,
+                "status": "busy",
+                "incident_id": str(incident["id"]),
+                "incident_priority": self.dispatch_engine.incident_priority(incident),
+            }
+        )
+
+    def _reassign(self, incident: dict, unit: dict) -> dict | None:
+        """Atomically move ``unit`` from its incident to ``incident``; None if anything changed meanwhile."""
+        return fetch_one(
+            """
+            WITH target AS (
+                SELECT id FROM incidents
+                WHERE id = %(incident_id)s AND assigned_vehicle_id IS NULL AND attended = FALSE
+                FOR UPDATE SKIP LOCKED
+            ),
+            displaced AS (
+                SELECT id FROM incidents
+                WHERE id = %(displaced_id)s AND assigned_vehicle_id = %(vehicle_id)s AND attended = FALSE
+                  AND COALESCE(leg_phase, 'to_scene') = 'to_scene'
+                  AND EXISTS (SELECT 1 FROM target)
+                FOR UPDATE SKIP LOCKED
+            ),
+            unit AS (
+                SELECT id FROM vehicles
+                WHERE id = %(vehicle_id)s AND status = 'busy' AND EXISTS (SELECT 1 FROM displaced)
+                FOR UPDATE SKIP LOCKED
+            ),
+            released AS (
+                UPDATE incidents i
+                SET assigned_vehicle_id = NULL, status = 'new'
+                FROM displaced, unit
+                WHERE i.id = displaced.id
+                RETURNING i.id
+            ),
+            moved AS (
+                UPDATE vehicles v
+                SET current_hex_id = %(hex_id)s
+                FROM unit, released
+                WHERE v.id = unit.id
+                RETURNING v.id, v.type, v.latitude, v.longitude, v.current_hex_id
+            ),
+            assigned AS (
+                UPDATE incidents i
+                SET assigned_vehicle_id = moved.id, status = 'assigned'
+                FROM moved, target
+                WHERE i.id = target.id
+            )
+            SELECT id, type, latitude, longitude, 'busy' AS status, current_hex_id FROM moved
+            """,
+            {
+                "incident_id": incident["id"],
+                "displaced_id": unit["incident_id"],
+                "vehicle_id": unit["id"],
+                "hex_id": incident["hex_id"],
+            },
+        )
+
+    def preempt(self, incident: dict) -> dict | None:
+        """
+        Redirect the nearest busy unit serving a lower-priority incident within
+        ``max_radius_km``. Runs in the caller's transaction; the displaced
+        incident is requeued and clients notified after commit. Returns the
+        vehicle (like ``DispatchEngine.assign``) or None.
+        """
+        priority = self.dispatch_engine.incident_priority(incident)
+        groups = [(t, p) for t in self.dispatch_engine._wanted_vehicle_types(incident) for p in range(1, priority)]
+        if not groups:
+            return None
+
+        self.ensure_fresh()
+        candidates = self.busy_index.nearest(
+            float(incident["latitude"]),
+            float(incident["longitude"]),
+            groups,
+            k=PREEMPT_CANDIDATES,
+            radius_km=self.max_radius_km,
+        )
+        # Take from the least urgent incident first, then the nearest unit.
+        candidates.sort(key=lambda item: (item[1]["incident_priority"], item[0]))
+        for distance_km, unit in candidates:
+            vehicle = self._reassign(incident, unit)
+            if vehicle is None:
+                # Stale entry (unit freed or reassigned elsewhere); drop it until the next resync.
+                self.busy_index.remove(unit["id"])
+                continue
+
+            displaced_id = unit["incident_id"]
+            vehicle["eta_s"] = self.dispatch_engine._haversine_eta_s(distance_km)
+            vehicle["eta_source"] = "haversine"
+            self.preemptions += 1
+            after_commit(lambda: self._after_preempt(vehicle, incident, displaced_id))
+            return vehicle
+        return None
+
+    def _after_preempt(self, vehicle: dict, incident: dict, displaced_id: str) -> None:
+        logger.info("Unit %s preempted from incident %s for %s", vehicle["id"], displaced_id, incident["id"])
+        socketio.emit(
+            "dispatch_preempted",
+            {"incident_id": displaced_id, "vehicle_id": str(vehicle["id"]), "by_incident_id": str(incident["id"])},
+        )
+        displaced = fetch_one(
+            "SELECT id, type, latitude, longitude, hex_id FROM incidents WHERE id = %s",
+            (displaced_id,),
+        )
+        if displaced is None:
+            return
+        displaced = dict(displaced)
+        displaced["id"] = str(displaced["id"])
+        if self.requeue is not None:
+            self.requeue(displaced)
+        else:
+            self.dispatch_engine.dispatch(displaced)
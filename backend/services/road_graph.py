@@ -0,0 +1,196 @@
+"""
+Offline road-graph router.
+
+A compact directed road graph for the city in CSR form, stored as a directory
+of ``.npy`` arrays and opened memory-mapped (built by
+``scripts/build_road_graph.py``):
+
+- ``node_lat.npy`` / ``node_lng.npy`` (float64, nodes sorted by latitude)
+- ``indptr.npy`` (int64, n + 1): edges of node ``u`` are ``indptr[u]:indptr[u + 1]``
+- ``indices.npy`` (int32): edge target node
+- ``length_m.npy`` / ``duration_s.npy`` (float32): edge length and travel time
+- ``shape_ptr.npy`` (int64, edges + 1) / ``shape_lat.npy`` / ``shape_lng.npy``
+  (float64): the road's vertices strictly between an edge's two nodes, in
+  travel direction. Graphs built before shapes were stored lack these and
+  route geometry then joins the junctions directly.
+- ``meta.json``: bbox, node/edge counts, ``max_speed_kmh`` (for the heuristic)
+
+``LocalRouter.route`` snaps both endpoints to the nearest node and runs A* on
+travel time with a straight-line / top-speed heuristic (admissible, so paths
+are optimal). The result has the same shape as ``RouteService.get_route``
+with ``source = "local"``.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+
+from utils.geo import haversine_km
+from utils.geo_vector import distances_from
+
+# Endpoints farther than this from any road are not routed locally.
+MAX_SNAP_KM = 2.0
+# Speed assumed on the off-road legs between an endpoint and its snapped node.
+ACCESS_SPEED_KMH = 20.0
+
+
+class LocalRouter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.node_lat = load("node_lat")
+        self.node_lng = load("node_lng")
+        self.indptr = load("indptr")
+        self.indices = load("indices")
+        self.length_m = load("length_m")
+        self.duration_s = load("duration_s")
+        self.shape_ptr = self.shape_lat = self.shape_lng = None
+        if os.path.exists(os.path.join(path, "shape_ptr.npy")):
+            self.shape_ptr = load("shape_ptr")
+            self.shape_lat = load("shape_lat")
+            self.shape_lng = load("shape_lng")
+        self.max_speed_mps = float(self.meta.get("max_speed_kmh", 100.0)) / 3.6
+
+    @property
+    def node_count(self) -> int:
+        return int(self.node_lat.shape[0])
+
+    def nearest_node(self, lat: float, lng: float) -> tuple[int, float] | None:
+        """(node, distance_km) of the closest node within MAX_SNAP_KM, via a latitude band search."""
+        band = 0.005  # ~550 m
+        while band <= MAX_SNAP_KM / 111.0 * 2:
+            lo = int(np.searchsorted(self.node_lat, lat - band, side="left"))
+            hi = int(np.searchsorted(self.node_lat, lat + band, side="right"))
+            if hi > lo:
+                lngs = self.node_lng[lo:hi]
+                mask = np.abs(lngs - lng) <= band / max(math.cos(math.radians(lat)), 0.1)
+                if mask.any():
+                    candidates = np.nonzero(mask)[0] + lo
+                    distances = distances_from(lat, lng, np.column_stack((self.node_lat[candidates], self.node_lng[candidates])))
+                    best = int(np.argmin(distances))
+                    # Only trust it if nothing outside the band could be closer.
+                    if distances[best] <= band * 111.0 * 0.99 and distances[best] <= MAX_SNAP_KM:
+                        return int(candidates[best]), float(distances[best])
+            band *= 2
+        return None
+
+    def _astar(self, source: int, target: int) -> list[int] | None:
+        node_lat, node_lng = self.node_lat, self.node_lng
+        indptr, indices, durations = self.indptr, self.indices, self.duration_s
+        target_lat, target_lng = float(node_lat[target]), float(node_lng[target])
+        speed = self.max_speed_mps
+
+        def heuristic(node: int) -> float:
+            return haversine_km(float(node_lat[node]), float(node_lng[node]), target_lat, target_lng) * 1000 / speed
+
+        best = {source: 0.0}
+        parent = {source: -1}
+        closed = set()
+        frontier = [(heuristic(source), 0.0, source)]
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == target:
+                path = [node]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            if node in closed:
+                continue
+            closed.add(node)
+            start, end = int(indptr[node]), int(indptr[node + 1])
+            for neighbour, edge_cost in zip(indices[start:end].tolist(), durations[start:end].tolist()):
+                new_cost = cost + edge_cost
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    parent[neighbour] = node
+                    heapq.heappush(frontier, (new_cost + heuristic(neighbour), new_cost, neighbour))
+        return None
+
+    def shortest_paths_from(self, source: int, targets=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Fastest-path (duration_s, length_m) from ``source`` to every node, inf when
+        unreachable (plain Dijkstra). With ``targets`` it stops once all are settled.
+        """
+        indptr, indices, durations, lengths = self.indptr, self.indices, self.duration_s, self.length_m
+        best = [math.inf] * self.node_count
+        length = [math.inf] * self.node_count
+        best[source] = length[source] = 0.0
+        remaining = set(targets) if targets is not None else None
+        frontier = [(0.0, source)]
+        while frontier:
+            cost, node = heapq.heappop(frontier)
+            if cost > best[node]:
+                continue
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+            start, end = int(indptr[node]), int(indptr[node + 1])
+            base = length[node]
+            for neighbour, edge_cost, edge_length in zip(
+                indices[start:end].tolist(), durations[start:end].tolist(), lengths[start:end].tolist()
+            ):
+                new_cost = cost + edge_cost
+                if new_cost < best[neighbour]:
+                    best[neighbour] = new_cost
+                    length[neighbour] = base + edge_length
+                    heapq.heappush(frontier, (new_cost, neighbour))
+        return np.asarray(best), np.asarray(length)
+
+    def _edge(self, u: int, v: int) -> int:
+        """Index of the cheapest u -> v edge."""
+        start, end = int(self.indptr[u]), int(self.indptr[u + 1])
+        targets = np.asarray(self.indices[start:end])
+        positions = np.nonzero(targets == v)[0] + start
+        return int(positions[np.argmin(self.duration_s[positions])])
+
+    def _edge_shape(self, edge: int) -> list[list[float]]:
+        """Road vertices between the edge's endpoints (empty for graphs without shapes)."""
+        if self.shape_ptr is None:
+            return []
+        start, end = int(self.shape_ptr[edge]), int(self.shape_ptr[edge + 1])
+        return [[float(lat), float(lng)] for lat, lng in zip(self.shape_lat[start:end], self.shape_lng[start:end])]
+
+    def route(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> dict | None:
+        """Fastest path as {distance_m, duration_s, geometry, source}; None if unroutable."""
+        start = self.nearest_node(start_lat, start_lng)
+        end = self.nearest_node(end_lat, end_lng)
+        if start is None or end is None:
+            return None
+        (source, source_km), (target, target_km) = start, end
+
+        path = self._astar(source, target)
+        if path is None:
+            return None
+
+        distance_m = 0.0
+        duration_s = 0.0
+        geometry = [[start_lat, start_lng], [float(self.node_lat[source]), float(self.node_lng[source])]]
+        for u, v in zip(path, path[1:]):
+            edge = self._edge(u, v)
+            distance_m += float(self.length_m[edge])
+            duration_s += float(self.duration_s[edge])
+            geometry.extend(self._edge_shape(edge))
+            geometry.append([float(self.node_lat[v]), float(self.node_lng[v])])
+        # Off-road legs between the endpoints and their snapped nodes.
+        access_m = (source_km + target_km) * 1000
+        distance_m += access_m
+        duration_s += access_m / (ACCESS_SPEED_KMH / 3.6)
+
+        geometry.append([end_lat, end_lng])
+        geometry = [point for i, point in enumerate(geometry) if i == 0 or point != geometry[i - 1]]
+        return {
+            "distance_m": round(distance_m, 1),
+            "duration_s": round(duration_s, 1),
+            "geometry": geometry,
+            "source": "local",
+        }
@@ -0,0 +1,124 @@
+"""
+LRU + TTL cache for OSRM routes.
+
+Keys are the start and end points snapped to H3 cells (resolution 10 by
+default, ~65 m edge), so repeated requests between practically the same
+places — a unit re-routed to the same incident, several dashboards asking for
+the same active dispatches, the patrol simulator — share one OSRM call.
+
+Concurrent misses for the same key are collapsed (single-flight): one caller
+fetches, the others wait for its result instead of issuing duplicate requests.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import h3
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+
+
+class RouteCache:
+    def __init__(self, max_entries: int = 5000, ttl_s: float = 600.0, snap_resolution: int = 10) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.snap_resolution = snap_resolution
+        self._entries: OrderedDict[Hashable, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> tuple[str, str]:
+        return (
+            h3.latlng_to_cell(float(start_lat), float(start_lng), self.snap_resolution),
+            h3.latlng_to_cell(float(end_lat), float(end_lng), self.snap_resolution),
+        )
+
+    def _lookup(self, key: Hashable) -> dict | None:
+        """Fresh cached value or None. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_s:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value: dict) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], dict],
+        cacheable: Callable[[dict], bool] = lambda value: True,
+    ) -> dict:
+        """Cached value for ``key``, or ``compute()`` (stored when ``cacheable``)."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.value is not None:
+                return flight.value
+            return compute()  # the leader failed; fetch independently
+
+        try:
+            value = compute()
+            flight.value = value
+            if cacheable(value):
+                with self._lock:
+                    self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "inflight": len(self._inflight),
+            }
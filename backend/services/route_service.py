@@ -1,13 +1,49 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import requests
+from services.osrm_client import OsrmClient
+from utils import polyline
+from utils.geo_vector import meters_per_pixel, simplify
+
+logger = logging.getLogger(__name__)
+
+OSRM = "osrm"
+LOCAL = "local"
+
+# Geometry precision for route payloads.
+FULL = "full"
+SIMPLIFIED = "simplified"
+# Simplified routes may deviate from the full one by this many screen pixels at the target zoom.
+SIMPLIFY_TOLERANCE_PX = 1.0
 
 
 class RouteService:
-    def __init__(self, osrm_base_url: str) -> None:
+    def __init__(
+        self,
+        osrm_base_url: str,
+        table_timeout_s: float = 1.0,
+        route_timeout_s: float = 4.0,
+        cache=None,
+        client: OsrmClient | None = None,
+        local_router=None,
+        engine: str = OSRM,
+        simplify_zoom: float = 15.0,
+    ) -> None:
         self.osrm_base_url = osrm_base_url.rstrip("/")
+        # Pooled, retrying client with a circuit breaker; failures fall back to straight lines.
+        self.client = client or OsrmClient(self.osrm_base_url)
+        self.table_timeout_s = table_timeout_s
+        self.route_timeout_s = route_timeout_s
+        # Optional services.route_cache.RouteCache; road routes (OSRM or local) are cached.
+        self.cache = cache
+        # Optional services.road_graph.LocalRouter. With engine="local" it is tried
+        # before OSRM; otherwise it replaces the straight line when OSRM fails.
+        self.local_router = local_router
+        self.engine = engine
+        # Map zoom simplified payloads are drawn for (ROUTE_SIMPLIFY_ZOOM).
+        self.simplify_zoom = simplify_zoom
 
     def _fallback_route(
         self,
@@ -30,16 +66,61 @@ class RouteService:
         end_lat: float,
         end_lng: float,
     ) -> Dict:
-        url = (
-            f"{self.osrm_base_url}/route/v1/driving/"
+        if self.cache is None:
+            return self._fetch_route(start_lat, start_lng, end_lat, end_lng)
+        route = self.cache.get_or_compute(
+            self.cache.key(start_lat, start_lng, end_lat, end_lng),
+            lambda: self._fetch_route(start_lat, start_lng, end_lat, end_lng),
+            cacheable=lambda value: value["source"] in (OSRM, LOCAL),
+        )
+        return dict(route)
+
+    def _fetch_route(
+        self,
+        start_lat: float,
+        start_lng: float,
+        end_lat: float,
+        end_lng: float,
+    ) -> Dict:
+        engines = (self._local_route, self._osrm_route)
+        if self.engine != LOCAL:
+            engines = engines[::-1]
+        for engine in engines:
+            route = engine(start_lat, start_lng, end_lat, end_lng)
+            if route is not None:
+                return route
+        return self._fallback_route(start_lat, start_lng, end_lat, end_lng)
+
+    def _local_route(
+        self,
+        start_lat: float,
+        start_lng: float,
+        end_lat: float,
+        end_lng: float,
+    ) -> Optional[Dict]:
+        if self.local_router is None:
+            return None
+        try:
+            return self.local_router.route(float(start_lat), float(start_lng), float(end_lat), float(end_lng))
+        except Exception:
+            logger.exception("Local routing failed")
+            return None
+
+    def _osrm_route(
+        self,
+        start_lat: float,
+        start_lng: float,
+        end_lat: float,
+        end_lng: float,
+    ) -> Optional[Dict]:
+        path = (
+            "/route/v1/driving/"
             f"{start_lng},{start_lat};{end_lng},{end_lat}"
             "?overview=full&geometries=geojson"
         )
 
         try:
-            response = requests.get(url, timeout=4)
-            response.raise_for_status()
-            data = response.json()
+            data = self.client.get(path, timeout=self.route_timeout_s)
             route = data.get("routes", [])[0]
             coordinates: List[List[float]] = route.get("geometry", {}).get("coordinates", [])
 
@@ -47,7 +128,70 @@ class RouteService:
                 "distance_m": route.get("distance"),
                 "duration_s": route.get("duration"),
                 "geometry": [[lat, lng] for lng, lat in coordinates],
-                "source": "osrm",
+                "source": OSRM,
             }
         except Exception:
-            return self._fallback_route(start_lat, start_lng, end_lat, end_lng)
+            return None
+
+    def encode_route(self, route: Dict, precision: str = SIMPLIFIED, zoom: Optional[float] = None) -> Dict:
+        """
+        Wire form of a ``get_route`` result: ``geometry`` is replaced by a Google
+        encoded ``polyline``. Unless ``precision`` is FULL, the line is first
+        Douglas–Peucker simplified to SIMPLIFY_TOLERANCE_PX at ``zoom`` (default
+        ``simplify_zoom``), which drops most vertices of long OSRM routes.
+        """
+        geometry = route.get("geometry") or []
+        if precision != FULL and len(geometry) > 2:
+            zoom = self.simplify_zoom if zoom is None else zoom
+            mid_lat = (geometry[0][0] + geometry[-1][0]) / 2
+            keep = simplify(geometry, meters_per_pixel(mid_lat, zoom) * SIMPLIFY_TOLERANCE_PX)
+            geometry = [geometry[i] for i in keep]
+        payload = {key: value for key, value in route.items() if key != "geometry"}
+        payload["polyline"] = polyline.encode(geometry)
+        payload["precision"] = FULL if precision == FULL else SIMPLIFIED
+        return payload
+
+    def get_durations_to(
+        self,
+        origins: Sequence[Tuple[float, float]],
+        end_lat: float,
+        end_lng: float,
+    ) -> Optional[List[Optional[float]]]:
+        """
+        Driving durations (seconds) from each (lat, lng) origin to one destination,
+        in a single OSRM ``/table`` call (or local A* queries when the local engine
+        is preferred or OSRM fails). Entries are None for unroutable origins;
+        returns None when no engine could answer within budget.
+        """
+        if not origins:
+            return []
+        if self.engine == LOCAL and self.local_router is not None:
+            return self._local_durations(origins, end_lat, end_lng)
+        coordinates = ";".join(f"{lng},{lat}" for lat, lng in origins)
+        sources = ";".join(str(i) for i in range(len(origins)))
+        path = (
+            "/table/v1/driving/"
+            f"{coordinates};{end_lng},{end_lat}"
+            f"?sources={sources}&destinations={len(origins)}&annotations=duration"
+        )
+
+        try:
+            # No retries: the ranking budget is one short call, then haversine.
+            data = self.client.get(path, timeout=self.table_timeout_s, retries=0)
+            return [row[0] for row in data.get("durations", [])]
+        except Exception:
+            if self.local_router is None:
+                return None
+            return self._local_durations(origins, end_lat, end_lng)
+
+    def _local_durations(
+        self,
+        origins: Sequence[Tuple[float, float]],
+        end_lat: float,
+        end_lng: float,
+    ) -> Optional[List[Optional[float]]]:
+        durations = []
+        for lat, lng in origins:
+            route = self._local_route(lat, lng, end_lat, end_lng)
+            durations.append(route["duration_s"] if route else None)
+        return durations if any(d is not None for d in durations) else None
@@ -4,7 +4,7 @@ import random
 from typing import Dict
 
 from extensions import socketio
-from utils.db import execute_query, fetch_one
+from utils.db import execute_query, execute_values, fetch_one, transaction
 
 
 class SimulationEngine:
@@ -44,6 +44,8 @@ class SimulationEngine:
 
         if scenario == "vehicle_unavailability":
             execute_query("UPDATE vehicles SET status = %s", ("busy",))
+            if self.dispatch_engine.vehicle_index is not None:
+                self.dispatch_engine.vehicle_index.set_all_statuses("busy")
             result = {"scenario": scenario, "updated_vehicles": "all_marked_busy"}
             socketio.emit("simulation_update", result)
             return result
@@ -56,29 +58,44 @@ class SimulationEngine:
             socketio.emit("simulation_update", result)
             return result
 
-        generated_incidents = []
+        rows = []
         for _ in range(count):
             lat, lng = self._random_point_for_hex(target_hex) if target_hex else (
                 random.uniform(12.9, 13.2),
                 random.uniform(80.0, 80.3),
             )
-
             hex_id = self.hex_service.get_hex_id_from_latlng(lat, lng)
-            incident = fetch_one(
+            rows.append((incident_type, lat, lng, hex_id, "new"))
+
+        # ETA ranking calls OSRM, so it happens per point before the transaction opens.
+        rankings = {}
+        for _, lat, lng, _, _ in rows:
+            if (lat, lng) not in rankings:
+                rankings[(lat, lng)] = self.dispatch_engine.rank_candidates(
+                    {"type": incident_type, "latitude": lat, "longitude": lng}
+                )
+
+        # Insert the whole batch in one statement, score and assign in the same transaction,
+        # then route and announce each dispatch after commit.
+        assignments = []
+        with transaction():
+            incidents = execute_values(
                 """
                 INSERT INTO incidents (type, latitude, longitude, hex_id, status)
-                VALUES (%s, %s, %s, %s, %s)
+                VALUES %s
                 RETURNING id, type, latitude, longitude, hex_id, assigned_vehicle_id, status, created_at
                 """,
-                (incident_type, lat, lng, hex_id, "new"),
+                rows,
+                fetch=True,
             )
+            for incident in incidents:
+                self.intelligence_engine.process_incident(incident)
+                ranking = rankings.get((incident["latitude"], incident["longitude"]))
+                assignments.append((incident, self.dispatch_engine.assign(incident, ranking)))
 
-            if not incident:
-                continue
-
-            self.intelligence_engine.process_incident(incident)
-            dispatch_payload = self.dispatch_engine.dispatch(incident)
-
+        generated_incidents = []
+        for incident, vehicle in assignments:
+            dispatch_payload = self.dispatch_engine.complete_dispatch(incident, vehicle)
             generated_incidents.append(
                 {
                     "id": incident["id"],
@@ -101,6 +118,8 @@ class SimulationEngine:
     def reset(self) -> Dict:
         execute_query("DELETE FROM incidents")
         execute_query("UPDATE vehicles SET status = %s", ("available",))
+        if self.dispatch_engine.vehicle_index is not None:
+            self.dispatch_engine.vehicle_index.set_all_statuses("available")
         execute_query(
             "UPDATE hex_cells SET incident_count = %s, patrol_priority_score = %s",
             (0, 0.0),
@@ -0,0 +1,214 @@
+"""
+In-memory spatial index of dispatchable vehicles.
+
+Vehicles with status ``available`` or ``patrolling`` are bucketed by (type, H3
+cell) at a fine resolution. A nearest query walks k-rings outward from the
+incident's cell and stops as soon as no unvisited ring can hold anything closer
+than the k-th best found, so cost depends on local density, not fleet size.
+
+The index is a candidate generator: the database claim in DispatchEngine still
+re-checks status under a row lock, so a slightly stale entry can cost a
+fallback but never a double assignment. It is kept current by position
+updates, status changes in this process, change-feed events from other
+processes, and a periodic full resync.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Iterable
+
+import h3
+
+from utils.db import fetch_all
+from utils.geo_vector import distances_from
+
+DISPATCHABLE_STATUSES = ("available", "patrolling")
+
+
+class VehicleSpatialIndex:
+    # Statuses that are bucketed (queryable by ``nearest``) and extra row fields kept per entry.
+    statuses: tuple[str, ...] = DISPATCHABLE_STATUSES
+    extra_fields: tuple[str, ...] = ()
+
+    def __init__(self, resolution: int = 8, resync_interval_s: float = 30.0, max_rings: int = 40) -> None:
+        self.resolution = resolution
+        self.resync_interval_s = resync_interval_s
+        self.max_rings = max_rings
+        # Conservative lower bound on the distance to anything in ring r is (1.5 r - 2) edges.
+        self._edge_km = h3.average_hexagon_edge_length(resolution, unit="km")
+        self._lock = threading.RLock()
+        self._vehicles: dict[str, dict] = {}
+        self._buckets: dict[tuple, set[str]] = {}
+        self._dispatchable_by_type: dict = {}
+        self._loaded_at = 0.0
+
+    def _group(self, entry: dict):
+        """Bucket group key; ``nearest`` takes a list of these as ``types``."""
+        return entry["type"]
+
+    def _ring_min_km(self, ring: int) -> float:
+        return max(0.0, (1.5 * ring - 2) * self._edge_km * 0.9)
+
+    def _unbucket(self, entry: dict) -> None:
+        group = self._group(entry)
+        key = (group, entry["cell"])
+        bucket = self._buckets.get(key)
+        if bucket is not None and entry["id"] in bucket:
+            bucket.discard(entry["id"])
+            if not bucket:
+                del self._buckets[key]
+            self._dispatchable_by_type[group] -= 1
+
+    def _bucket(self, entry: dict) -> None:
+        if entry["status"] not in self.statuses:
+            return
+        group = self._group(entry)
+        self._buckets.setdefault((group, entry["cell"]), set()).add(entry["id"])
+        self._dispatchable_by_type[group] = self._dispatchable_by_type.get(group, 0) + 1
+
+    def upsert(self, vehicle: dict) -> None:
+        """Insert or replace a vehicle from a row with id, type, latitude, longitude, status."""
+        vehicle_id = str(vehicle["id"])
+        lat, lng = float(vehicle["latitude"]), float(vehicle["longitude"])
+        entry = {
+            "id": vehicle_id,
+            "type": vehicle["type"],
+            "latitude": lat,
+            "longitude": lng,
+            "status": vehicle["status"],
+            "current_hex_id": vehicle.get("current_hex_id"),
+            "cell": h3.latlng_to_cell(lat, lng, self.resolution),
+        }
+        entry.update({field: vehicle.get(field) for field in self.extra_fields})
+        with self._lock:
+            old = self._vehicles.get(vehicle_id)
+            if old is not None:
+                self._unbucket(old)
+            self._vehicles[vehicle_id] = entry
+            self._bucket(entry)
+
+    def update_position(self, vehicle_id, latitude: float, longitude: float, current_hex_id: str | None = None) -> None:
+        vehicle_id = str(vehicle_id)
+        with self._lock:
+            entry = self._vehicles.get(vehicle_id)
+            if entry is None:
+                return
+            cell = h3.latlng_to_cell(latitude, longitude, self.resolution)
+            if cell != entry["cell"]:
+                self._unbucket(entry)
+                entry["cell"] = cell
+                self._bucket(entry)
+            entry["latitude"], entry["longitude"] = float(latitude), float(longitude)
+            if current_hex_id is not None:
+                entry["current_hex_id"] = current_hex_id
+
+    def update_status(self, vehicle_id, status: str) -> None:
+        vehicle_id = str(vehicle_id)
+        with self._lock:
+            entry = self._vehicles.get(vehicle_id)
+            if entry is None or entry["status"] == status:
+                return
+            self._unbucket(entry)
+            entry["status"] = status
+            self._bucket(entry)
+
+    def set_all_statuses(self, status: str) -> None:
+        with self._lock:
+            for entry in self._vehicles.values():
+                self._unbucket(entry)
+                entry["status"] = status
+                self._bucket(entry)
+
+    def remove(self, vehicle_id) -> None:
+        with self._lock:
+            entry = self._vehicles.pop(str(vehicle_id), None)
+            if entry is not None:
+                self._unbucket(entry)
+
+    def load(self, vehicles: Iterable[dict]) -> None:
+        """Replace the whole index with ``vehicles``."""
+        with self._lock:
+            self._vehicles.clear()
+            self._buckets.clear()
+            self._dispatchable_by_type.clear()
+            for vehicle in vehicles:
+                self.upsert(vehicle)
+            self._loaded_at = time.monotonic()
+
+    def resync(self) -> None:
+        self.load(fetch_all("SELECT id, type, latitude, longitude, status, current_hex_id FROM vehicles"))
+
+    def ensure_fresh(self) -> None:
+        """Reload from the database if the last full sync is older than resync_interval_s."""
+        if time.monotonic() - self._loaded_at >= self.resync_interval_s:
+            self.resync()
+
+    def get(self, vehicle_id) -> dict | None:
+        with self._lock:
+            entry = self._vehicles.get(str(vehicle_id))
+            return dict(entry) if entry else None
+
+    def _measure(self, lat: float, lng: float, entries: list[dict], radius_km: float | None) -> list[tuple[float, dict]]:
+        """(distance_km, entry) for entries within radius_km, computed in one array op."""
+        if not entries:
+            return []
+        distances = distances_from(lat, lng, [(e["latitude"], e["longitude"]) for e in entries])
+        return [
+            (float(distance), entry)
+            for distance, entry in zip(distances, entries)
+            if radius_km is None or distance <= radius_km
+        ]
+
+    def _scan(self, lat: float, lng: float, types: tuple[str, ...], radius_km: float | None) -> list[tuple[float, dict]]:
+        entries = [
+            self._vehicles[vehicle_id]
+            for (vehicle_type, _), ids in self._buckets.items()
+            if vehicle_type in types
+            for vehicle_id in ids
+        ]
+        found = self._measure(lat, lng, entries, radius_km)
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        types: Iterable[str],
+        k: int = 1,
+        radius_km: float | None = None,
+    ) -> list[tuple[float, dict]]:
+        """Up to ``k`` dispatchable vehicles of ``types`` closest to (lat, lng), as (distance_km, vehicle)."""
+        types = tuple(types)
+        with self._lock:
+            available = sum(self._dispatchable_by_type.get(t, 0) for t in types)
+            if available == 0:
+                return []
+
+            origin = h3.latlng_to_cell(lat, lng, self.resolution)
+            found: list[tuple[float, dict]] = []
+            seen = 0
+            for ring in range(self.max_rings + 1):
+                ring_min = self._ring_min_km(ring)
+                if radius_km is not None and ring_min > radius_km:
+                    break
+                if len(found) >= k and found[k - 1][0] <= ring_min:
+                    break
+                if seen >= available:
+                    break
+                cells = [origin] if ring == 0 else h3.grid_ring(origin, ring)
+                entries = [
+                    self._vehicles[vehicle_id]
+                    for cell in cells
+                    for vehicle_type in types
+                    for vehicle_id in self._buckets.get((vehicle_type, cell), ())
+                ]
+                seen += len(entries)
+                found.extend(self._measure(lat, lng, entries, radius_km))
+                found.sort(key=lambda item: item[0])
+            else:
+                # Candidates are sparse and far away: a direct scan is cheaper than more rings.
+                found = self._scan(lat, lng, types, radius_km)
+
+            return [(distance, dict(entry)) for distance, entry in found[:k]]
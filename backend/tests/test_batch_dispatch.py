@@ -0,0 +1,57 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from services.batch_dispatch import INFEASIBLE, _hungarian, solve_assignment
+
+
+def _brute_force(cost: np.ndarray) -> float:
+    """Cheapest total over every way to give each row its own column (rows <= columns)."""
+    n, m = cost.shape
+    return min(cost[np.arange(n), list(cols)].sum() for cols in permutations(range(m), n))
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (2, 2), (3, 3), (3, 5), (4, 4), (4, 6), (5, 5), (2, 7)])
+def test_hungarian_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(25):
+        cost = rng.uniform(-50, 50, size=shape).round(2)
+        rows, cols = _hungarian(cost)
+        assert list(rows) == list(range(shape[0]))
+        assert len(set(cols.tolist())) == shape[0]
+        assert cost[rows, cols].sum() == pytest.approx(_brute_force(cost))
+
+
+def test_hungarian_handles_ties_and_duplicates():
+    cost = np.array([[1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [0.0, 0.0, 5.0]])
+    rows, cols = _hungarian(cost)
+    assert cost[rows, cols].sum() == pytest.approx(_brute_force(cost))
+
+
+def _total(cost: np.ndarray, pairs: list[tuple[int, int]]) -> float:
+    return sum(cost[r, c] for r, c in pairs)
+
+
+def test_solve_assignment_fallback_matches_scipy(monkeypatch):
+    scipy_optimize = pytest.importorskip("scipy.optimize")
+    rng = np.random.default_rng(7)
+    for shape in [(6, 4), (4, 6), (8, 8)]:
+        cost = rng.uniform(0, 100, size=shape)
+        monkeypatch.setattr("services.batch_dispatch.linear_sum_assignment", scipy_optimize.linear_sum_assignment)
+        with_scipy = solve_assignment(cost)
+        monkeypatch.setattr("services.batch_dispatch.linear_sum_assignment", None)
+        fallback = solve_assignment(cost)
+        assert len(fallback) == len(with_scipy) == min(shape)
+        assert _total(cost, fallback) == pytest.approx(_total(cost, with_scipy))
+
+
+def test_solve_assignment_drops_infeasible_pairs(monkeypatch):
+    monkeypatch.setattr("services.batch_dispatch.linear_sum_assignment", None)
+    cost = np.array([[INFEASIBLE, INFEASIBLE], [3.0, 1.0], [2.0, INFEASIBLE]])
+    pairs = solve_assignment(cost)
+    assert sorted(pairs) == [(1, 1), (2, 0)]
+
+
+def test_solve_assignment_empty():
+    assert solve_assignment(np.zeros((0, 3))) == []
@@ -0,0 +1,126 @@
+import queue
+import threading
+
+import pytest
+
+from services import dispatch_scheduler
+from services.dispatch_scheduler import CRITICAL, ROUTINE, URGENT, LatencyTracker, PriorityScheduler
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze ``time.time()`` inside the scheduler at NOW."""
+    monkeypatch.setattr(dispatch_scheduler.time, "time", lambda: NOW)
+
+
+def _drain(scheduler: PriorityScheduler) -> list:
+    items = []
+    while scheduler.qsize():
+        items.append(scheduler.get()[2])
+    return items
+
+
+def test_higher_class_first_then_fifo_within_class(clock):
+    scheduler = PriorityScheduler(max_depth=10)
+    scheduler.put_nowait("civic", ROUTINE, NOW)
+    scheduler.put_nowait("crime-1", URGENT, NOW - 1)
+    scheduler.put_nowait("fire", CRITICAL, NOW)
+    scheduler.put_nowait("crime-2", URGENT, NOW)
+    assert _drain(scheduler) == ["fire", "crime-1", "crime-2", "civic"]
+
+
+def test_aged_routine_overtakes_fresher_urgent(clock):
+    scheduler = PriorityScheduler(max_depth=10, aging_s=60.0)
+    scheduler.put_nowait("civic", ROUTINE, NOW - 90)  # effective 2.5
+    scheduler.put_nowait("crime", URGENT, NOW - 10)  # effective ~2.17
+    assert scheduler.get()[2] == "civic"
+
+
+def test_aged_tie_goes_to_higher_class(clock):
+    scheduler = PriorityScheduler(max_depth=10, aging_s=60.0)
+    scheduler.put_nowait("civic", ROUTINE, NOW - 60)  # effective 2.0
+    scheduler.put_nowait("crime", URGENT, NOW)  # effective 2.0
+    assert scheduler.get()[2] == "crime"
+
+
+def test_max_boost_never_lets_routine_overtake_fresh_critical(clock):
+    scheduler = PriorityScheduler(max_depth=10, aging_s=60.0, max_boost=2.0)
+    scheduler.put_nowait("civic", ROUTINE, NOW - 3600)  # capped at 3.0
+    scheduler.put_nowait("fire", CRITICAL, NOW)
+    assert _drain(scheduler) == ["fire", "civic"]
+
+
+def test_get_returns_enqueue_time_and_class(clock):
+    scheduler = PriorityScheduler(max_depth=10)
+    scheduler.put_nowait("crime", URGENT, NOW - 5)
+    assert scheduler.get() == (NOW - 5, URGENT, "crime")
+
+
+def test_unknown_priority_is_queued_as_routine(clock):
+    scheduler = PriorityScheduler(max_depth=10)
+    scheduler.put_nowait("odd", 42, NOW)
+    assert scheduler.depths() == {"critical": 0, "urgent": 0, "routine": 1}
+
+
+def test_full_queue_evicts_newest_of_lowest_lower_class(clock):
+    scheduler = PriorityScheduler(max_depth=3)
+    assert scheduler.put_nowait("civic-old", ROUTINE, NOW - 2) is None
+    assert scheduler.put_nowait("civic-new", ROUTINE, NOW - 1) is None
+    assert scheduler.put_nowait("crime", URGENT, NOW) is None
+    assert scheduler.put_nowait("fire", CRITICAL, NOW) == "civic-new"
+    assert scheduler.qsize() == 3
+    assert _drain(scheduler) == ["fire", "crime", "civic-old"]
+
+
+def test_full_queue_refuses_equal_or_lower_class(clock):
+    scheduler = PriorityScheduler(max_depth=2)
+    scheduler.put_nowait("crime", URGENT, NOW)
+    scheduler.put_nowait("fire", CRITICAL, NOW)
+    with pytest.raises(queue.Full):
+        scheduler.put_nowait("crime-2", URGENT, NOW)
+    with pytest.raises(queue.Full):
+        scheduler.put_nowait("civic", ROUTINE, NOW)
+    assert scheduler.depths() == {"critical": 1, "urgent": 1, "routine": 0}
+
+
+def test_close_wakes_blocked_getter():
+    scheduler = PriorityScheduler(max_depth=1)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(scheduler.get()))
+    worker.start()
+    scheduler.close()
+    worker.join(timeout=2)
+    assert not worker.is_alive()
+    assert results == [None]
+
+
+def test_close_drains_queued_items_before_returning_none(clock):
+    scheduler = PriorityScheduler(max_depth=2)
+    scheduler.put_nowait("fire", CRITICAL, NOW)
+    scheduler.close()
+    assert scheduler.get()[2] == "fire"
+    assert scheduler.get() is None
+
+
+def test_latency_tracker_counts_breaches_per_class():
+    tracker = LatencyTracker({CRITICAL: 0.5, ROUTINE: 5.0})
+    for latency_s in (0.1, 0.2, 0.6, 0.3):
+        tracker.record(CRITICAL, latency_s)
+    tracker.record(ROUTINE, 1.0)
+    summary = tracker.summary()
+    assert summary["critical"]["dispatched"] == 4
+    assert summary["critical"]["slo_breaches"] == 1
+    assert summary["critical"]["slo_met_pct"] == 75.0
+    assert summary["critical"]["max_ms"] == 600.0
+    assert summary["routine"]["slo_breaches"] == 0
+    assert summary["urgent"] == {
+        "slo_ms": 0,
+        "dispatched": 0,
+        "slo_breaches": 0,
+        "slo_met_pct": 100.0,
+        "p50_ms": 0.0,
+        "p95_ms": 0.0,
+        "max_ms": 0.0,
+    }
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from utils.geo_vector import EARTH_RADIUS_KM, as_points, meters_per_pixel, simplify
+
+
+def _to_metres(pts: np.ndarray) -> np.ndarray:
+    lat0 = np.radians(pts[:, 0].mean())
+    return np.column_stack(
+        (
+            np.radians(pts[:, 1]) * np.cos(lat0) * EARTH_RADIUS_KM * 1000,
+            np.radians(pts[:, 0]) * EARTH_RADIUS_KM * 1000,
+        )
+    )
+
+
+def _max_deviation_m(points, keep) -> float:
+    """Farthest any dropped vertex lies from the simplified segment that spans it."""
+    xy = _to_metres(as_points(points))
+    worst = 0.0
+    for start, end in zip(keep[:-1], keep[1:]):
+        a, b = xy[start], xy[end]
+        chord = b - a
+        for p in xy[start + 1 : end]:
+            t = np.clip((p - a) @ chord / (chord @ chord), 0.0, 1.0) if chord @ chord else 0.0
+            worst = max(worst, float(np.hypot(*(p - (a + t * chord)))))
+    return worst
+
+
+def _wiggly_route(n: int = 400, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    lat = 13.0 + np.cumsum(rng.normal(0, 2e-4, n))
+    lng = 80.2 + np.cumsum(rng.normal(1e-4, 2e-4, n))
+    return np.column_stack((lat, lng))
+
+
+@pytest.mark.parametrize("tolerance_m", [1.0, 5.0, 25.0])
+def test_simplify_keeps_endpoints_and_stays_within_tolerance(tolerance_m):
+    route = _wiggly_route()
+    keep = simplify(route, tolerance_m)
+    assert keep[0] == 0 and keep[-1] == len(route) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert len(keep) < len(route)
+    assert _max_deviation_m(route, keep) <= tolerance_m + 1e-6
+
+
+def test_simplify_drops_collinear_points():
+    line = [(13.0, 80.0 + i * 1e-4) for i in range(20)]
+    assert simplify(line, 0.5).tolist() == [0, 19]
+
+
+def test_simplify_keeps_a_back_tracking_vertex():
+    # The middle vertex overshoots the end along the chord: on the infinite line, off the segment.
+    route = [(13.0, 80.0), (13.0, 80.01), (13.0, 80.005)]
+    assert simplify(route, 5.0).tolist() == [0, 1, 2]
+
+
+def test_simplify_short_or_disabled_returns_everything():
+    assert simplify([(13.0, 80.0), (13.1, 80.1)], 10.0).tolist() == [0, 1]
+    route = _wiggly_route(50)
+    assert simplify(route, 0).tolist() == list(range(50))
+
+
+def test_meters_per_pixel_halves_per_zoom_level():
+    # 156 543 m at the equator uses the WGS84 equatorial radius; the mean radius is 0.1% shorter.
+    assert meters_per_pixel(0.0, 0) == pytest.approx(156_543, rel=2e-3)
+    assert meters_per_pixel(13.0, 15) == pytest.approx(meters_per_pixel(13.0, 14) / 2)
@@ -0,0 +1,35 @@
+import pytest
+
+from utils import polyline
+
+# Example from Google's encoded polyline format reference.
+REFERENCE_POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+REFERENCE_ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode_matches_reference():
+    assert polyline.encode(REFERENCE_POINTS) == REFERENCE_ENCODED
+
+
+def test_decode_matches_reference():
+    assert polyline.decode(REFERENCE_ENCODED) == [list(p) for p in REFERENCE_POINTS]
+
+
+def test_empty_route():
+    assert polyline.encode([]) == ""
+    assert polyline.decode("") == []
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_round_trip_within_precision(precision):
+    points = [(13.0827, 80.2707), (13.08271234, 80.27079876), (13.0, 80.0), (12.9, 80.3), (-33.8688, 151.2093)]
+    decoded = polyline.decode(polyline.encode(points, precision), precision)
+    assert len(decoded) == len(points)
+    for (lat, lng), (dlat, dlng) in zip(points, decoded):
+        assert dlat == pytest.approx(lat, abs=0.5 / 10**precision)
+        assert dlng == pytest.approx(lng, abs=0.5 / 10**precision)
+
+
+def test_repeated_points_survive():
+    points = [[13.05, 80.25], [13.05, 80.25], [13.06, 80.24]]
+    assert polyline.decode(polyline.encode(points)) == points
@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from scripts.build_road_graph import KMH_PER_MPH, SPEED_KMH, _speed, build
+from services.road_graph import LocalRouter
+
+GRID = 6
+STEP = 0.004  # ~440 m between junctions
+
+
+def _grid_osm(seed: int = 11) -> dict:
+    """A GRID x GRID street grid with mixed classes and oneways, plus one curved road."""
+    rng = np.random.default_rng(seed)
+    classes = ["primary", "secondary", "residential", "tertiary"]
+    elements = []
+    node_id = {}
+    for r in range(GRID):
+        for c in range(GRID):
+            node_id[r, c] = len(node_id) + 1
+            elements.append({"type": "node", "id": node_id[r, c], "lat": 13.0 + r * STEP, "lon": 80.2 + c * STEP})
+    way_id = 1000
+    for r in range(GRID):
+        for c in range(GRID):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr >= GRID or c + dc >= GRID:
+                    continue
+                tags = {"highway": classes[int(rng.integers(len(classes)))]}
+                if rng.random() < 0.2:
+                    tags["oneway"] = "yes"
+                way_id += 1
+                elements.append({"type": "way", "id": way_id, "nodes": [node_id[r, c], node_id[r + dr, c + dc]], "tags": tags})
+    # A bowed road from the south-west corner to the next junction north, through two shape vertices.
+    elements.append({"type": "node", "id": 9001, "lat": 13.0 + STEP / 3, "lon": 80.2 - STEP / 2})
+    elements.append({"type": "node", "id": 9002, "lat": 13.0 + 2 * STEP / 3, "lon": 80.2 - STEP / 2})
+    elements.append(
+        {
+            "type": "way",
+            "id": 9999,
+            "nodes": [node_id[0, 0], 9001, 9002, node_id[1, 0]],
+            "tags": {"highway": "motorway_link", "maxspeed": "60 mph"},
+        }
+    )
+    return {"elements": elements}
+
+
+@pytest.fixture(scope="module")
+def router(tmp_path_factory):
+    arrays = build(_grid_osm())
+    path = tmp_path_factory.mktemp("road_graph")
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    max_speed_kmh = float((arrays["length_m"] / arrays["duration_s"]).max() * 3.6)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"max_speed_kmh": max_speed_kmh}, f)
+    return LocalRouter(str(path))
+
+
+def test_speed_reads_kmh_mph_and_class_defaults():
+    assert _speed({"maxspeed": "50"}) == 50.0
+    assert _speed({"maxspeed": "30 mph"}) == pytest.approx(30 * KMH_PER_MPH)
+    assert _speed({"maxspeed": "40;60"}) == 40.0
+    assert _speed({"maxspeed": "signals", "highway": "primary"}) == SPEED_KMH["primary"]
+    assert _speed({"highway": "unknown"}) == 25.0
+
+
+def test_csr_arrays_are_consistent(router):
+    edges = router.indices.shape[0]
+    assert router.indptr[0] == 0 and router.indptr[-1] == edges
+    assert np.all(np.diff(router.indptr) >= 0)
+    assert np.all(np.diff(router.node_lat) >= 0)
+    assert router.shape_ptr.shape[0] == edges + 1
+    assert router.shape_ptr[-1] == router.shape_lat.shape[0] == 4  # two vertices, both directions
+
+
+def test_astar_matches_dijkstra(router):
+    rng = np.random.default_rng(5)
+    for source in rng.choice(router.node_count, size=8, replace=False).tolist():
+        best, _ = router.shortest_paths_from(source)
+        for target in range(router.node_count):
+            path = router._astar(source, target)
+            if not np.isfinite(best[target]):
+                assert path is None
+                continue
+            assert path[0] == source and path[-1] == target
+            cost = sum(float(router.duration_s[router._edge(u, v)]) for u, v in zip(path, path[1:]))
+            assert cost == pytest.approx(best[target], rel=1e-5)
+
+
+def test_shortest_paths_from_stops_once_targets_settle(router):
+    full, _ = router.shortest_paths_from(0)
+    targets = [1, router.node_count - 1]
+    partial, _ = router.shortest_paths_from(0, targets)
+    assert partial[targets].tolist() == pytest.approx(full[targets].tolist())
+
+
+def test_route_follows_edge_shape(router):
+    # Along the bowed motorway link, which is faster than the primary/secondary street beside it.
+    route = router.route(13.0, 80.2, 13.0 + STEP, 80.2)
+    assert route["source"] == "local"
+    assert [13.0 + STEP / 3, 80.2 - STEP / 2] in route["geometry"]
+    assert [13.0 + 2 * STEP / 3, 80.2 - STEP / 2] in route["geometry"]
+    assert route["geometry"][0] == [13.0, 80.2] and route["geometry"][-1] == [13.0 + STEP, 80.2]
+
+
+def test_route_outside_the_graph_is_none(router):
+    assert router.route(13.0, 80.2, 14.0, 81.0) is None
@@ -0,0 +1,59 @@
+import h3
+import numpy as np
+import pytest
+
+from services.hex_service import route_corridor
+
+RESOLUTION = 9
+
+
+def _assert_gap_free(hexes):
+    for a, b in zip(hexes, hexes[1:]):
+        assert h3.grid_distance(a, b) == 1, (a, b)
+
+
+def test_long_straight_segment_is_densified():
+    # ~20 km with no intermediate vertices, like a straight-line fallback.
+    route = [(12.95, 80.10), (13.13, 80.10)]
+    hexes, entry_m = route_corridor(route, RESOLUTION)
+    assert hexes[0] == h3.latlng_to_cell(*route[0], RESOLUTION)
+    assert hexes[-1] == h3.latlng_to_cell(*route[-1], RESOLUTION)
+    assert len(hexes) > 20
+    _assert_gap_free(hexes)
+
+
+@pytest.mark.parametrize("resolution", [7, 9])
+def test_diagonal_route_is_ordered_and_gap_free(resolution):
+    route = [(13.00, 80.20), (13.02, 80.23), (13.05, 80.22), (13.07, 80.26)]
+    hexes, entry_m = route_corridor(route, resolution)
+    assert len(hexes) == len(set(hexes)) == len(entry_m)
+    assert hexes[0] == h3.latlng_to_cell(*route[0], resolution)
+    assert hexes[-1] == h3.latlng_to_cell(*route[-1], resolution)
+    _assert_gap_free(hexes)
+    assert np.all(np.diff(entry_m) >= 0)
+
+
+def test_entry_distances_start_at_zero_and_end_within_route_length():
+    route = [(13.00, 80.20), (13.03, 80.20)]
+    hexes, entry_m = route_corridor(route, RESOLUTION)
+    assert entry_m[0] == 0.0
+    # 0.03 degrees of latitude is about 3.34 km.
+    assert entry_m[-1] <= 3340
+    assert entry_m[-1] > 3000
+
+
+def test_revisited_cell_keeps_first_position():
+    there = (13.00, 80.20)
+    back = (13.00, 80.23)
+    hexes, entry_m = route_corridor([there, back, there], RESOLUTION)
+    assert hexes[0] == h3.latlng_to_cell(*there, RESOLUTION)
+    assert len(hexes) == len(set(hexes))
+    assert entry_m[0] == 0.0
+
+
+def test_single_point_and_empty_route():
+    hexes, entry_m = route_corridor([(13.0, 80.2)], RESOLUTION)
+    assert hexes == [h3.latlng_to_cell(13.0, 80.2, RESOLUTION)]
+    assert entry_m.tolist() == [0.0]
+    hexes, entry_m = route_corridor([], RESOLUTION)
+    assert hexes == [] and len(entry_m) == 0
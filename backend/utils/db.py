@@ -1,7 +1,20 @@
+import csv
+import io
+import logging
 import os
-from typing import Any
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
 import psycopg2
+import psycopg2.extras
+from psycopg2 import extensions as pg_extensions
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
 
 
@@ -11,160 +24,766 @@ def _normalize_database_url(database_url: str) -> str:
     return database_url
 
 
-def get_connection():
-    database_url = os.getenv(
-        "DATABASE_URL",
-        "postgresql://localhost:5432/civic1",
+def get_database_url() -> str:
+    return _normalize_database_url(
+        os.getenv(
+            "DATABASE_URL",
+            "postgresql://localhost:5432/civic1",
+        )
     )
-    return psycopg2.connect(_normalize_database_url(database_url))
 
 
-def execute_query(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> int:
-    connection = None
-    cursor = None
-    try:
-        connection = get_connection()
-        cursor = connection.cursor()
-        cursor.execute(query, params)
-        connection.commit()
-        return cursor.rowcount
-    except psycopg2.Error as error:
-        if connection:
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Callers block (up to ``timeout`` seconds) when ``max_size`` connections are
+    checked out instead of opening more, so a surge cannot exhaust Postgres
+    ``max_connections``. Connections that sat idle longer than
+    ``health_check_after_s`` are pinged with ``SELECT 1`` before reuse and
+    replaced if the server dropped them.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        health_check_after_s: float = 30.0,
+    ) -> None:
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.health_check_after_s = health_check_after_s
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()  # (connection, returned_at)
+        self._open = 0
+        self._checked_out = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._open += 1
+            self._created += 1
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn)
+
+    def _is_healthy(self, connection, returned_at: float) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after_s:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
             connection.rollback()
-        raise RuntimeError(f"Database query execution failed: {error.pgerror or str(error)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, connection) -> None:
+        """Close a connection that will not be reused; callers count it under the lock."""
+        try:
             connection.close()
+        except psycopg2.Error:
+            pass
 
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Database connection pool is closed")
+            self._waiting += 1
+            try:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise RuntimeError(
+                            f"Database connection pool exhausted ({self.max_size} in use, "
+                            f"waited {self.timeout:.1f}s)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
 
-def fetch_one(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> dict | None:
-    connection = None
-    cursor = None
+            waited = time.monotonic() - started
+            self._wait_total_s += waited
+            self._wait_max_s = max(self._wait_max_s, waited)
+            self._checkouts += 1
+            self._checked_out += 1
+
+            if self._idle:
+                connection, returned_at = self._idle.pop()
+            else:
+                connection, returned_at = None, 0.0
+                self._open += 1
+
+        # Health check and connect happen outside the lock; the slot is already reserved.
+        discarded = created = 0
+        try:
+            if connection is not None and not self._is_healthy(connection, returned_at):
+                self._discard(connection)
+                discarded = 1
+                connection = None
+            if connection is None:
+                connection = self._connect()
+                created = 1
+        except psycopg2.Error:
+            with self._cond:
+                self._discarded += discarded
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        if discarded or created:
+            with self._cond:
+                self._discarded += discarded
+                self._created += created
+        return connection
+
+    def putconn(self, connection, discard: bool = False) -> None:
+        if not discard and not connection.closed:
+            status = connection.info.transaction_status
+            if status != pg_extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    discard = True
+        with self._cond:
+            self._checked_out -= 1
+            if discard or connection.closed or self._closed:
+                self._open -= 1
+                self._discarded += 1
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._open -= 1
+                self._discarded += 1
+                self._discard(connection)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total_s * 1000, 3),
+                "wait_avg_ms": round(self._wait_total_s * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max_s * 1000, 3),
+            }
+
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_read_database_url() -> str | None:
+    url = os.getenv("READ_DATABASE_URL")
+    return _normalize_database_url(url) if url else None
+
+
+def _create_pool(role: str) -> ConnectionPool:
+    if role == REPLICA:
+        return ConnectionPool(
+            get_read_database_url(),
+            min_size=int(os.getenv("DB_READ_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_READ_POOL_MAX_SIZE", "10")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT_S", "10")),
+            health_check_after_s=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER_S", "30")),
+        )
+    return ConnectionPool(
+        get_database_url(),
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT_S", "10")),
+        health_check_after_s=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER_S", "30")),
+    )
+
+
+def get_pool(role: str = PRIMARY) -> ConnectionPool:
+    """Return the process-wide pool for ``role``, creating it on first use (and again after a fork)."""
+    global _pools, _pools_pid
+    pid = os.getpid()
+    pool = _pools.get(role) if _pools_pid == pid else None
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        if _pools_pid != pid:
+            _pools = {}
+            _pools_pid = pid
+        if role not in _pools:
+            try:
+                _pools[role] = _create_pool(role)
+            except psycopg2.Error as error:
+                raise RuntimeError(f"Database connection failed: {error}")
+    return _pools[role]
+
+
+def get_pool_stats(role: str = PRIMARY) -> dict | None:
+    """Pool statistics for this process, or None if that pool has not been used yet."""
+    if _pools_pid != os.getpid() or role not in _pools:
+        return None
+    return _pools[role].stats()
+
+
+def close_pool() -> None:
+    global _pools, _pools_pid
+    with _pool_lock:
+        if _pools_pid == os.getpid():
+            for pool in _pools.values():
+                pool.closeall()
+        _pools = {}
+        _pools_pid = None
+
+
+def get_connection():
+    """Open a standalone (unpooled) connection. Prefer pooled_connection() for queries."""
+    return psycopg2.connect(get_database_url())
+
+
+def _is_disconnect(error: BaseException | None) -> bool:
+    """
+    True if ``error`` is, or was raised while handling, a driver error that
+    leaves the connection unusable. The query helpers re-raise driver errors as
+    RuntimeError, so the original is found on the exception chain.
+    """
+    while error is not None:
+        if isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@contextmanager
+def pooled_connection(role: str = PRIMARY):
+    """Borrow a connection from the pool; it is returned (or discarded if broken) on exit."""
+    pool = get_pool(role)
     try:
-        connection = get_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query, params)
-        row = cursor.fetchone()
-        connection.commit()
-        return dict(row) if row else None
+        connection = pool.getconn()
     except psycopg2.Error as error:
-        if connection:
-            connection.rollback()
-        raise RuntimeError(f"Database fetch_one failed: {error.pgerror or str(error)}")
+        raise RuntimeError(f"Database connection failed: {error}")
+    broken = False
+    try:
+        yield connection
+    except BaseException as error:
+        broken = _is_disconnect(error)
+        raise
     finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+        pool.putconn(connection, discard=broken or bool(connection.closed))
 
 
-def fetch_all(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> list[dict]:
-    connection = None
-    cursor = None
-    try:
-        connection = get_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("utils.db.slow")
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Warn when one request runs the same statement this many times (likely an N+1 loop).
+REPEATED_QUERY_WARN = int(os.getenv("DB_REPEATED_QUERY_WARN", "20"))
+
+_SQL_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|%s"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+]
+
+# Per-thread state: the open transaction and the current request's query metrics.
+_local = threading.local()
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and replace literals/placeholders with ? so similar statements group together."""
+    normalized = query
+    for pattern, replacement in _SQL_LITERALS:
+        normalized = pattern.sub(replacement, normalized)
+    return normalized.strip()
+
+
+class QueryStats:
+    """Process-wide per-statement timing and row counts, plus a ring buffer of slow queries."""
+
+    def __init__(self, max_statements: int = 500, max_slow: int = 100) -> None:
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._by_statement: dict[str, dict] = {}
+        self._slow: deque = deque(maxlen=max_slow)
+        self._queries = 0
+        self._total_ms = 0.0
+
+    def record(self, statement: str, duration_ms: float, rows: int) -> None:
+        with self._lock:
+            self._queries += 1
+            self._total_ms += duration_ms
+            entry = self._by_statement.get(statement)
+            if entry is None:
+                if len(self._by_statement) >= self.max_statements:
+                    return
+                entry = self._by_statement[statement] = {
+                    "statement": statement, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["rows"] += max(rows, 0)
+            if duration_ms >= SLOW_QUERY_MS:
+                self._slow.append({
+                    "statement": statement,
+                    "duration_ms": round(duration_ms, 3),
+                    "rows": rows,
+                    "at": time.time(),
+                })
+
+    def summary(self, limit: int = 20) -> dict:
+        with self._lock:
+            statements = sorted(self._by_statement.values(), key=lambda e: e["total_ms"], reverse=True)
+            return {
+                "queries": self._queries,
+                "total_ms": round(self._total_ms, 3),
+                "slow_query_ms": SLOW_QUERY_MS,
+                "top_statements": [
+                    {
+                        **entry,
+                        "total_ms": round(entry["total_ms"], 3),
+                        "max_ms": round(entry["max_ms"], 3),
+                        "avg_ms": round(entry["total_ms"] / entry["calls"], 3),
+                    }
+                    for entry in statements[:limit]
+                ],
+                "slow_queries": list(self._slow),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_statement.clear()
+            self._slow.clear()
+            self._queries = 0
+            self._total_ms = 0.0
+
+
+query_stats = QueryStats()
+
+
+def start_request_metrics() -> None:
+    """Begin collecting query count and DB time for the request handled on this thread."""
+    _local.request_metrics = {"queries": 0, "db_ms": 0.0, "statements": Counter()}
+    _local.request_wrote = False
+
+
+def finish_request_metrics() -> dict | None:
+    """Stop collecting and return {"queries", "db_ms", "repeated"} for this request."""
+    metrics = getattr(_local, "request_metrics", None)
+    _local.request_metrics = None
+    _local.request_wrote = None
+    if metrics is None:
+        return None
+    repeated = {
+        statement: calls
+        for statement, calls in metrics["statements"].items()
+        if calls >= REPEATED_QUERY_WARN
+    }
+    return {"queries": metrics["queries"], "db_ms": metrics["db_ms"], "repeated": repeated}
+
+
+def _record_query(query, duration_s: float, rows: int) -> None:
+    statement = normalize_sql(query) if isinstance(query, str) else str(query)
+    duration_ms = duration_s * 1000
+    query_stats.record(statement, duration_ms, rows)
+    metrics = getattr(_local, "request_metrics", None)
+    if metrics is not None:
+        metrics["queries"] += 1
+        metrics["db_ms"] += duration_ms
+        metrics["statements"][statement] += 1
+    if duration_ms >= SLOW_QUERY_MS:
+        slow_query_logger.warning("Slow query (%.1f ms, %s rows): %s", duration_ms, rows, statement)
+
+
+def _execute(connection, query: str, params, fetch: str):
+    cursor_factory = None if fetch == "rowcount" else RealDictCursor
+    started = time.perf_counter()
+    with connection.cursor(cursor_factory=cursor_factory) as cursor:
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        connection.commit()
-        return [dict(row) for row in rows]
-    except psycopg2.Error as error:
-        if connection:
-            connection.rollback()
-        raise RuntimeError(f"Database fetch_all failed: {error.pgerror or str(error)}")
+        if fetch == "rowcount":
+            result = cursor.rowcount
+            rows = result
+        elif fetch == "one":
+            row = cursor.fetchone()
+            result = dict(row) if row else None
+            rows = 1 if row else 0
+        else:
+            result = [dict(row) for row in cursor.fetchall()]
+            rows = len(result)
+    _record_query(query, time.perf_counter() - started, rows)
+    return result
+
+
+class Transaction:
+    """
+    One connection, one commit. Module-level helpers (execute_query, fetch_one, ...)
+    called on the same thread while a transaction is open run on its connection,
+    so services compose into a single unit of work without passing it around.
+    """
+
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self._after_commit: list[Callable[[], None]] = []
+
+    def _run(self, query: str, params, fetch: str, label: str):
+        try:
+            return _execute(self.connection, query, params, fetch)
+        except psycopg2.Error as error:
+            raise RuntimeError(f"Database {label} failed: {error.pgerror or str(error)}")
+
+    def execute(self, query: str, params: tuple[Any, ...] | list[Any] | None = None) -> int:
+        return self._run(query, params, "rowcount", "query execution")
+
+    def fetch_one(self, query: str, params: tuple[Any, ...] | list[Any] | None = None) -> dict | None:
+        return self._run(query, params, "one", "fetch_one")
+
+    def fetch_all(self, query: str, params: tuple[Any, ...] | list[Any] | None = None) -> list[dict]:
+        return self._run(query, params, "all", "fetch_all")
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """Run callback once the transaction commits; dropped on rollback."""
+        self._after_commit.append(callback)
+
+
+def current_transaction() -> Transaction | None:
+    return getattr(_local, "transaction", None)
+
+
+@contextmanager
+def transaction() -> Iterator[Transaction]:
+    """
+    Open a transaction on a pooled connection: commit on success, roll back on error.
+    Nested calls join the outer transaction.
+    """
+    outer = current_transaction()
+    if outer is not None:
+        yield outer
+        return
+
+    with pooled_connection() as connection:
+        tx = Transaction(connection)
+        _local.transaction = tx
+        try:
+            yield tx
+            connection.commit()
+            _note_write()
+        except psycopg2.Error as error:
+            if not connection.closed:
+                connection.rollback()
+            raise RuntimeError(f"Database transaction failed: {error.pgerror or str(error)}")
+        except BaseException:
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            _local.transaction = None
+
+    for callback in tx._after_commit:
+        callback()
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """Defer callback (e.g. a socket emit) until the current transaction commits; run now if none."""
+    tx = current_transaction()
+    if tx is None:
+        callback()
+    else:
+        tx.after_commit(callback)
+
+
+def _with_connection(work: Callable[[Any], Any], label: str, role: str = PRIMARY, write: bool = True):
+    """Run work(connection) in the open transaction, or on a pooled connection with its own commit."""
+    tx = current_transaction()
+    if tx is not None:
+        try:
+            return work(tx.connection)
+        except psycopg2.Error as error:
+            raise RuntimeError(f"Database {label} failed: {error.pgerror or str(error)}")
+    with pooled_connection(role) as connection:
+        try:
+            result = work(connection)
+            connection.commit()
+            if write:
+                _note_write()
+            return result
+        except psycopg2.Error as error:
+            if not connection.closed:
+                connection.rollback()
+            raise RuntimeError(f"Database {label} failed: {error.pgerror or str(error)}")
+
+
+def _is_select(query: str) -> bool:
+    return query.lstrip()[:6].upper() == "SELECT"
+
+
+def _run(query: str, params, fetch: str, label: str, role: str = PRIMARY):
+    return _with_connection(
+        lambda connection: _execute(connection, query, params, fetch),
+        label,
+        role=role,
+        write=not _is_select(query),
+    )
+
+
+def _note_write() -> None:
+    """Remember that the current request wrote to the primary (read-your-writes guard)."""
+    if getattr(_local, "request_wrote", None) is False:
+        _local.request_wrote = True
+
+
+MAX_REPLICA_LAG_S = float(os.getenv("READ_MAX_REPLICA_LAG_S", "5"))
+_REPLICA_LAG_CHECK_S = 5.0
+_replica_state = {"checked_at": 0.0, "fresh": True}
+_replica_lock = threading.Lock()
+
+
+def _replica_fresh() -> bool:
+    """True if the replica's replay lag is under MAX_REPLICA_LAG_S (checked at most every 5 s)."""
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < _REPLICA_LAG_CHECK_S:
+        return _replica_state["fresh"]
+    with _replica_lock:
+        if now - _replica_state["checked_at"] < _REPLICA_LAG_CHECK_S:
+            return _replica_state["fresh"]
+        try:
+            with pooled_connection(REPLICA) as connection:
+                with connection.cursor() as cursor:
+                    # Zero when fully replayed (or not a standby at all, e.g. a second local database).
+                    cursor.execute(
+                        """
+                        SELECT CASE
+                            WHEN NOT pg_is_in_recovery() THEN 0
+                            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                        END
+                        """
+                    )
+                    lag_s = float(cursor.fetchone()[0])
+                connection.rollback()
+            fresh = lag_s <= MAX_REPLICA_LAG_S
+        except (psycopg2.Error, RuntimeError) as error:
+            logger.warning("Replica lag check failed, reading from primary: %s", error)
+            fresh = False
+        _replica_state.update(checked_at=now, fresh=fresh)
+        return fresh
+
+
+@contextmanager
+def primary_reads():
+    """Route read helpers to the primary inside this block (e.g. right after writing elsewhere)."""
+    previous = getattr(_local, "force_primary", False)
+    _local.force_primary = True
+    try:
+        yield
     finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+        _local.force_primary = previous
+
+
+def _read_role() -> str:
+    if get_read_database_url() is None:
+        return PRIMARY
+    if current_transaction() is not None:
+        return PRIMARY
+    if getattr(_local, "force_primary", False) or getattr(_local, "request_wrote", None):
+        return PRIMARY
+    return REPLICA if _replica_fresh() else PRIMARY
+
+
+def _run_read(query: str, params, fetch: str, label: str):
+    role = _read_role()
+    if role == PRIMARY:
+        return _run(query, params, fetch, label)
+    try:
+        return _run(query, params, fetch, label, role=REPLICA)
+    except RuntimeError as error:
+        logger.warning("Replica read failed, retrying on primary: %s", error)
+        _replica_state.update(checked_at=time.monotonic(), fresh=False)
+        return _run(query, params, fetch, label)
+
+
+def fetch_one_read(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> dict | None:
+    """fetch_one for read-only dashboard queries: served by READ_DATABASE_URL when it is safe."""
+    return _run_read(query, params, "one", "fetch_one")
+
+
+def fetch_all_read(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> list[dict]:
+    """fetch_all for read-only dashboard queries: served by READ_DATABASE_URL when it is safe."""
+    return _run_read(query, params, "all", "fetch_all")
+
+
+def execute_query(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> int:
+    return _run(query, params, "rowcount", "query execution")
+
+
+def fetch_one(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> dict | None:
+    return _run(query, params, "one", "fetch_one")
+
+
+def fetch_all(query: str, params: tuple[Any, ...] | list[Any] | None = None) -> list[dict]:
+    return _run(query, params, "all", "fetch_all")
 
 
 def execute_insert_returning(
     query: str, params: tuple[Any, ...] | list[Any] | None = None
 ) -> dict | None:
     """Execute INSERT ... RETURNING and return the first row as dict, or None."""
-    connection = None
-    cursor = None
-    try:
-        connection = get_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query, params)
-        row = cursor.fetchone()
-        connection.commit()
-        return dict(row) if row else None
-    except psycopg2.Error as error:
-        if connection:
-            connection.rollback()
-        raise RuntimeError(f"Database execute_insert_returning failed: {error.pgerror or str(error)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+    return _run(query, params, "one", "execute_insert_returning")
 
 
-def ensure_vehicles_table() -> None:
-    """Create vehicles table if it does not exist (for deploy and patrol simulator)."""
-    execute_query(
-        """
-        CREATE TABLE IF NOT EXISTS vehicles (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            type VARCHAR(20) NOT NULL,
-            latitude DOUBLE PRECISION NOT NULL,
-            longitude DOUBLE PRECISION NOT NULL,
-            status VARCHAR(30) NOT NULL DEFAULT 'available',
-            current_hex_id VARCHAR(20)
-        )
-        """
-    )
+def stream_rows(
+    query: str,
+    params: tuple[Any, ...] | list[Any] | dict | None = None,
+    itersize: int = 1000,
+    read: bool = False,
+) -> Iterator[dict]:
+    """
+    Yield rows one at a time through a named (server-side) cursor, fetching
+    ``itersize`` rows per round trip, so memory stays flat however many rows match.
+    Uses its own pooled connection for as long as the generator is alive; close the
+    generator (or exhaust it) to return the connection. ``read=True`` routes it
+    like fetch_all_read.
+    """
+    started = time.perf_counter()
+    rows = 0
+    with pooled_connection(_read_role() if read else PRIMARY) as connection:
+        try:
+            with connection.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    rows += 1
+                    yield dict(row)
+            connection.commit()
+            # Duration includes time the consumer spent between rows.
+            _record_query(query, time.perf_counter() - started, rows)
+        except psycopg2.Error as error:
+            if not connection.closed:
+                connection.rollback()
+            raise RuntimeError(f"Database stream_rows failed: {error.pgerror or str(error)}")
 
 
-def ensure_incidents_table() -> None:
-    """Create incidents table if it does not exist and add missing columns."""
-    execute_query(
-        """
-        CREATE TABLE IF NOT EXISTS incidents (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            type VARCHAR(80) NOT NULL,
-            latitude DOUBLE PRECISION NOT NULL,
-            longitude DOUBLE PRECISION NOT NULL,
-            hex_id VARCHAR(20),
-            assigned_vehicle_id UUID REFERENCES vehicles(id),
-            status VARCHAR(30) NOT NULL DEFAULT 'new',
-            attended BOOLEAN NOT NULL DEFAULT FALSE,
-            report_id VARCHAR(80),
-            photo_url TEXT,
-            hospital_lat DOUBLE PRECISION,
-            hospital_lng DOUBLE PRECISION,
-            leg_phase VARCHAR(20) DEFAULT 'to_scene',
-            photo_file_id TEXT,
-            video_url TEXT,
-            voice_url TEXT,
-            source VARCHAR(20) DEFAULT 'web',
-            created_at TIMESTAMPTZ DEFAULT NOW()
-        )
-        """
-    )
-    _add_incidents_columns_if_missing()
-
-
-def _add_incidents_columns_if_missing() -> None:
-    """Add attended, report_id, photo_url, etc. if they don't exist."""
-    columns_to_add = [
-        ("attended", "BOOLEAN NOT NULL DEFAULT FALSE"),
-        ("report_id", "VARCHAR(80)"),
-        ("photo_url", "TEXT"),
-        ("hospital_lat", "DOUBLE PRECISION"),
-        ("hospital_lng", "DOUBLE PRECISION"),
-        ("leg_phase", "VARCHAR(20) DEFAULT 'to_scene'"),
-        ("photo_file_id", "TEXT"),
-        ("video_url", "TEXT"),
-        ("voice_url", "TEXT"),
-        ("source", "VARCHAR(20) DEFAULT 'web'"),
-    ]
-    for col, typ in columns_to_add:
-        execute_query(
-            f"ALTER TABLE incidents ADD COLUMN IF NOT EXISTS {col} {typ}"
-        )
+def execute_values(
+    query: str,
+    rows: Sequence[Sequence[Any]],
+    template: str | None = None,
+    page_size: int = 1000,
+    fetch: bool = False,
+) -> list[dict] | int:
+    """
+    Multi-row write: ``query`` contains a single ``VALUES %s`` placeholder that is
+    expanded to ``page_size`` rows per statement. With ``fetch=True`` the rows
+    produced by a RETURNING clause are returned; otherwise the number of rows sent.
+    """
+    if not rows:
+        return [] if fetch else 0
+
+    def work(connection):
+        started = time.perf_counter()
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            result = psycopg2.extras.execute_values(
+                cursor, query, rows, template=template, page_size=page_size, fetch=fetch
+            )
+        _record_query(query, time.perf_counter() - started, len(rows))
+        if fetch:
+            return [dict(row) for row in result]
+        return len(rows)
+
+    return _with_connection(work, "execute_values", write=True)
+
+
+def copy_rows(
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    ignore_conflicts: bool = False,
+) -> int:
+    """
+    Stream rows into ``table`` with ``COPY FROM STDIN`` (CSV; ``None`` becomes NULL).
+    With ``ignore_conflicts=True`` the rows are copied into a temporary staging
+    table and merged with ``INSERT ... ON CONFLICT DO NOTHING``, so existing keys
+    are skipped instead of aborting the copy. Returns the number of rows written.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        count += 1
+    if count == 0:
+        return 0
+    buffer.seek(0)
+
+    column_list = sql.SQL(", ").join(sql.Identifier(column) for column in columns)
+
+    def work(connection):
+        started = time.perf_counter()
+        result = _copy(connection)
+        _record_query(f"COPY {table} ({', '.join(columns)})", time.perf_counter() - started, result)
+        return result
+
+    def _copy(connection):
+        with connection.cursor() as cursor:
+            if not ignore_conflicts:
+                cursor.copy_expert(
+                    sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                        sql.Identifier(table), column_list
+                    ),
+                    buffer,
+                )
+                return cursor.rowcount if cursor.rowcount >= 0 else count
+
+            staging = sql.Identifier(f"_copy_staging_{table}")
+            cursor.execute(
+                sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+                    staging, sql.Identifier(table)
+                )
+            )
+            cursor.copy_expert(
+                sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(staging, column_list),
+                buffer,
+            )
+            cursor.execute(
+                sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} ON CONFLICT DO NOTHING").format(
+                    sql.Identifier(table), column_list, column_list, staging
+                )
+            )
+            inserted = cursor.rowcount
+            cursor.execute(sql.SQL("DROP TABLE {}").format(staging))
+            return inserted
+
+    return _with_connection(work, "copy_rows")
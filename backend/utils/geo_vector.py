@@ -0,0 +1,131 @@
+"""Vectorized geo kernels (NumPy) for batch distance and nearest-candidate work.
+
+Scalar ``utils.geo.haversine_km`` stays the reference for single pairs; these
+functions give the same results over arrays without a Python loop.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Length of one degree of latitude; longitude degrees shrink by cos(lat).
+KM_PER_DEG_LAT = 111.32
+
+
+def as_points(points) -> np.ndarray:
+    """Coerce a sequence of (lat, lng) pairs to a float64 array of shape (N, 2)."""
+    array = np.asarray(points, dtype=np.float64)
+    if array.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    return array.reshape(-1, 2)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_from(lat: float, lng: float, points) -> np.ndarray:
+    """Distance (km) from one point to each of ``points`` (N, 2) → shape (N,)."""
+    pts = as_points(points)
+    return haversine_km(lat, lng, pts[:, 0], pts[:, 1])
+
+
+def distance_matrix_km(points_a, points_b) -> np.ndarray:
+    """Pairwise distances (km) between N points and M points → shape (N, M)."""
+    a = as_points(points_a)
+    b = as_points(points_b)
+    return haversine_km(a[:, 0:1], a[:, 1:2], b[None, :, 0], b[None, :, 1])
+
+
+def bbox_mask(points, lat: float, lng: float, radius_km: float) -> np.ndarray:
+    """
+    Cheap prefilter: True for points inside the lat/lng box that encloses the
+    ``radius_km`` circle. Run exact haversine only on the survivors.
+    """
+    pts = as_points(points)
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlng = radius_km / (KM_PER_DEG_LAT * max(np.cos(np.radians(lat)), 1e-6))
+    return (
+        (np.abs(pts[:, 0] - lat) <= dlat)
+        & (np.abs(pts[:, 1] - lng) <= dlng)
+    )
+
+
+def nearest_k(points, lat: float, lng: float, k: int = 1, radius_km: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Indices into ``points`` of the ``k`` nearest to (lat, lng), closest first, and
+    their distances in km. With ``radius_km``, points outside it are excluded
+    (bbox prefilter, then exact check).
+    """
+    pts = as_points(points)
+    candidates = np.arange(len(pts))
+    if radius_km is not None and len(pts):
+        candidates = candidates[bbox_mask(pts, lat, lng, radius_km)]
+    if len(candidates) == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    distances = distances_from(lat, lng, pts[candidates])
+    if radius_km is not None:
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+    if len(candidates) > k:
+        top = np.argpartition(distances, k - 1)[:k]
+        candidates, distances = candidates[top], distances[top]
+    order = np.argsort(distances, kind="stable")
+    return candidates[order], distances[order]
+
+
+def meters_per_pixel(lat: float, zoom: float) -> float:
+    """Ground size of one web-mercator (256 px tile) pixel at ``lat`` and ``zoom``."""
+    return 2 * np.pi * EARTH_RADIUS_KM * 1000 * float(np.cos(np.radians(lat))) / (256 * 2**zoom)
+
+
+def simplify(points, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas–Peucker: indices of the vertices to keep so no dropped vertex lies
+    more than ``tolerance_m`` from the simplified line. Endpoints are always
+    kept. Points are projected to local metres once; each split measures the
+    whole span against its chord in one array op.
+    """
+    pts = as_points(points)
+    n = len(pts)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+
+    lat0 = np.radians(pts[:, 0].mean())
+    xy = np.column_stack(
+        (
+            np.radians(pts[:, 1]) * np.cos(lat0) * EARTH_RADIUS_KM * 1000,
+            np.radians(pts[:, 0]) * EARTH_RADIUS_KM * 1000,
+        )
+    )
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        span = xy[start + 1 : end]
+        chord = b - a
+        length_sq = float(chord @ chord)
+        if length_sq == 0.0:
+            distances = np.hypot(*(span - a).T)
+        else:
+            # Distance to the chord segment (not the infinite line), so back-tracking vertices count.
+            t = np.clip((span - a) @ chord / length_sq, 0.0, 1.0)
+            distances = np.hypot(*(span - (a + t[:, None] * chord)).T)
+        worst = int(np.argmax(distances))
+        if distances[worst] > tolerance_m:
+            split = start + 1 + worst
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.nonzero(keep)[0]
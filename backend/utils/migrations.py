@@ -0,0 +1,294 @@
+"""
+Versioned schema migrations.
+
+Each migration is applied once, in its own transaction, and recorded in
+``schema_migrations``. A transaction-scoped advisory lock serialises workers
+that boot at the same time, so only one of them applies a given version.
+Statements must stay idempotent (``IF NOT EXISTS``) because databases created
+before the runner existed already have part of the schema.
+"""
+from __future__ import annotations
+
+import logging
+
+from utils.db import execute_query, fetch_all, transaction
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary app-wide key for pg_advisory_xact_lock.
+_MIGRATION_LOCK_KEY = 72_450_001
+
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (
+        1,
+        "base_schema",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS vehicles (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                type VARCHAR(20) NOT NULL,
+                latitude DOUBLE PRECISION NOT NULL,
+                longitude DOUBLE PRECISION NOT NULL,
+                status VARCHAR(30) NOT NULL DEFAULT 'available',
+                current_hex_id VARCHAR(20)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS hex_cells (
+                hex_id VARCHAR(20) PRIMARY KEY,
+                center_lat DOUBLE PRECISION NOT NULL,
+                center_lng DOUBLE PRECISION NOT NULL,
+                incident_count INT NOT NULL DEFAULT 0,
+                patrol_priority_score DOUBLE PRECISION NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS incidents (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                type VARCHAR(80) NOT NULL,
+                latitude DOUBLE PRECISION NOT NULL,
+                longitude DOUBLE PRECISION NOT NULL,
+                hex_id VARCHAR(20),
+                assigned_vehicle_id UUID REFERENCES vehicles(id),
+                status VARCHAR(30) NOT NULL DEFAULT 'new',
+                attended BOOLEAN NOT NULL DEFAULT FALSE,
+                report_id VARCHAR(80),
+                photo_url TEXT,
+                hospital_lat DOUBLE PRECISION,
+                hospital_lng DOUBLE PRECISION,
+                leg_phase VARCHAR(20) DEFAULT 'to_scene',
+                photo_file_id TEXT,
+                video_url TEXT,
+                voice_url TEXT,
+                source VARCHAR(20) DEFAULT 'web',
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            )
+            """,
+            # Columns added after the first deployments; no-ops on fresh databases.
+            """
+            ALTER TABLE incidents
+                ADD COLUMN IF NOT EXISTS attended BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS report_id VARCHAR(80),
+                ADD COLUMN IF NOT EXISTS photo_url TEXT,
+                ADD COLUMN IF NOT EXISTS hospital_lat DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS hospital_lng DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS leg_phase VARCHAR(20) DEFAULT 'to_scene',
+                ADD COLUMN IF NOT EXISTS photo_file_id TEXT,
+                ADD COLUMN IF NOT EXISTS video_url TEXT,
+                ADD COLUMN IF NOT EXISTS voice_url TEXT,
+                ADD COLUMN IF NOT EXISTS source VARCHAR(20) DEFAULT 'web'
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS patrol_alerts (
+                id SERIAL PRIMARY KEY,
+                hex_id VARCHAR(20),
+                alert_type VARCHAR(60) NOT NULL,
+                message TEXT NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        "hot_path_indexes",
+        [
+            # Intelligence engine per-hex counts
+            "CREATE INDEX IF NOT EXISTS idx_incidents_hex_id ON incidents (hex_id)",
+            "CREATE INDEX IF NOT EXISTS idx_incidents_hex_id_type ON incidents (hex_id, type)",
+            # Arrival checks in /api/vehicles/position and active dispatches
+            """
+            CREATE INDEX IF NOT EXISTS idx_incidents_open_by_vehicle
+            ON incidents (assigned_vehicle_id) WHERE attended = FALSE
+            """,
+            # GET /api/incidents ordering
+            "CREATE INDEX IF NOT EXISTS idx_incidents_created_at ON incidents (created_at DESC)",
+            # Dispatch candidate lookup
+            "CREATE INDEX IF NOT EXISTS idx_vehicles_status_type ON vehicles (status, type)",
+            # GET /api/patrol-alerts
+            "CREATE INDEX IF NOT EXISTS idx_patrol_alerts_created_at ON patrol_alerts (created_at DESC)",
+        ],
+    ),
+    (
+        3,
+        "incidents_keyset_index",
+        [
+            # Keyset pagination on GET /api/incidents orders by (created_at, id)
+            "CREATE INDEX IF NOT EXISTS idx_incidents_created_at_id ON incidents (created_at DESC, id DESC)",
+            "DROP INDEX IF EXISTS idx_incidents_created_at",
+        ],
+    ),
+    (
+        4,
+        "change_feed_triggers",
+        [
+            # Payloads stay small (NOTIFY caps them at 8000 bytes): ids and state, no media URLs.
+            """
+            CREATE OR REPLACE FUNCTION civic_notify_change() RETURNS trigger AS $$
+            DECLARE
+                rec RECORD;
+                payload JSON;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    rec := OLD;
+                ELSE
+                    rec := NEW;
+                END IF;
+                IF TG_TABLE_NAME = 'incidents' THEN
+                    payload := json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'id', rec.id,
+                        'type', rec.type, 'status', rec.status, 'attended', rec.attended,
+                        'assigned_vehicle_id', rec.assigned_vehicle_id, 'hex_id', rec.hex_id,
+                        'leg_phase', rec.leg_phase
+                    );
+                ELSE
+                    payload := json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'id', rec.id,
+                        'type', rec.type, 'status', rec.status, 'current_hex_id', rec.current_hex_id
+                    );
+                END IF;
+                PERFORM pg_notify('civic_changes', payload::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS incidents_notify_insert_delete ON incidents",
+            """
+            CREATE TRIGGER incidents_notify_insert_delete
+            AFTER INSERT OR DELETE ON incidents
+            FOR EACH ROW EXECUTE FUNCTION civic_notify_change()
+            """,
+            "DROP TRIGGER IF EXISTS incidents_notify_update ON incidents",
+            """
+            CREATE TRIGGER incidents_notify_update
+            AFTER UPDATE OF assigned_vehicle_id, status, attended, leg_phase ON incidents
+            FOR EACH ROW
+            WHEN (
+                OLD.assigned_vehicle_id IS DISTINCT FROM NEW.assigned_vehicle_id
+                OR OLD.status IS DISTINCT FROM NEW.status
+                OR OLD.attended IS DISTINCT FROM NEW.attended
+                OR OLD.leg_phase IS DISTINCT FROM NEW.leg_phase
+            )
+            EXECUTE FUNCTION civic_notify_change()
+            """,
+            "DROP TRIGGER IF EXISTS vehicles_notify_insert_delete ON vehicles",
+            """
+            CREATE TRIGGER vehicles_notify_insert_delete
+            AFTER INSERT OR DELETE ON vehicles
+            FOR EACH ROW EXECUTE FUNCTION civic_notify_change()
+            """,
+            # Position updates are deliberately excluded: they are the high-volume path.
+            "DROP TRIGGER IF EXISTS vehicles_notify_status ON vehicles",
+            """
+            CREATE TRIGGER vehicles_notify_status
+            AFTER UPDATE OF status ON vehicles
+            FOR EACH ROW
+            WHEN (OLD.status IS DISTINCT FROM NEW.status)
+            EXECUTE FUNCTION civic_notify_change()
+            """,
+        ],
+    ),
+    (
+        5,
+        "change_feed_vehicle_position",
+        [
+            # Vehicle events (insert, delete, status change) also carry the position at that
+            # moment so listeners can place new units in spatial indexes. Position-only
+            # updates still do not notify (see vehicles_notify_status).
+            """
+            CREATE OR REPLACE FUNCTION civic_notify_change() RETURNS trigger AS $$
+            DECLARE
+                rec RECORD;
+                payload JSON;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    rec := OLD;
+                ELSE
+                    rec := NEW;
+                END IF;
+                IF TG_TABLE_NAME = 'incidents' THEN
+                    payload := json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'id', rec.id,
+                        'type', rec.type, 'status', rec.status, 'attended', rec.attended,
+                        'assigned_vehicle_id', rec.assigned_vehicle_id, 'hex_id', rec.hex_id,
+                        'leg_phase', rec.leg_phase
+                    );
+                ELSE
+                    payload := json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'id', rec.id,
+                        'type', rec.type, 'status', rec.status, 'current_hex_id', rec.current_hex_id,
+                        'latitude', rec.latitude, 'longitude', rec.longitude
+                    );
+                END IF;
+                PERFORM pg_notify('civic_changes', payload::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+        ],
+    ),
+    (
+        6,
+        "dispatch_routes",
+        [
+            # Planned route per dispatch leg (services/dispatch_routes.py); kept after the incident is attended.
+            """
+            CREATE TABLE IF NOT EXISTS dispatch_routes (
+                incident_id UUID NOT NULL REFERENCES incidents(id) ON DELETE CASCADE,
+                leg VARCHAR(20) NOT NULL,
+                vehicle_id UUID REFERENCES vehicles(id) ON DELETE SET NULL,
+                geometry TEXT NOT NULL,
+                distance_m DOUBLE PRECISION,
+                duration_s DOUBLE PRECISION,
+                source VARCHAR(20) NOT NULL,
+                corridor_hexes TEXT[] NOT NULL DEFAULT '{}',
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (incident_id, leg)
+            )
+            """,
+        ],
+    ),
+]
+
+
+def _ensure_migrations_table() -> None:
+    execute_query(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def applied_versions() -> set[int]:
+    _ensure_migrations_table()
+    return {row["version"] for row in fetch_all("SELECT version FROM schema_migrations")}
+
+
+def run_migrations() -> list[int]:
+    """Apply pending migrations in order. Returns the versions applied by this call."""
+    applied = applied_versions()
+    newly_applied: list[int] = []
+
+    for version, name, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        with transaction() as tx:
+            tx.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_KEY,))
+            # Another worker may have applied it while we waited for the lock.
+            if tx.fetch_one("SELECT 1 AS done FROM schema_migrations WHERE version = %s", (version,)):
+                continue
+            for statement in statements:
+                tx.execute(statement)
+            tx.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+        logger.info("Applied migration %s_%s", version, name)
+        newly_applied.append(version)
+
+    return newly_applied
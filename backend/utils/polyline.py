@@ -0,0 +1,53 @@
+"""Google encoded polyline format for route geometry.
+
+Coordinates are rounded to ``precision`` decimal places (5 ≈ 1 m), delta-coded
+against the previous point and written as 5-bit chunks in printable ASCII, so a
+route is a short string instead of a JSON list of float pairs. Points are
+``[lat, lng]`` like ``RouteService.get_route`` geometry.
+"""
+from __future__ import annotations
+
+DEFAULT_PRECISION = 5
+
+
+def _encode_value(value: int, out: list[str]) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(points, precision: int = DEFAULT_PRECISION) -> str:
+    factor = 10**precision
+    out: list[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_i, lng_i = round(float(lat) * factor), round(float(lng) * factor)
+        _encode_value(lat_i - prev_lat, out)
+        _encode_value(lng_i - prev_lng, out)
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(out)
+
+
+def decode(encoded: str, precision: int = DEFAULT_PRECISION) -> list[list[float]]:
+    factor = 10**precision
+    points: list[list[float]] = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                chunk = ord(encoded[index]) - 63
+                index += 1
+                result |= (chunk & 0x1F) << shift
+                shift += 5
+                if chunk < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lat / factor, lng / factor])
+    return points
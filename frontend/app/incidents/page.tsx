@@ -18,24 +18,60 @@ const TYPE_LABELS: Record<string, string> = {
   public_disturbance: "Public Disturbance",
 };
 
+const PAGE_SIZE = 200;
+
 export default function IncidentsPage() {
-  const [incidents, setIncidents] = useState<IncidentListItem[]>([]);
+  // Loaded incidents (newest first) and the cursor of the page after the last one loaded.
+  const [list, setList] = useState<{ incidents: IncidentListItem[]; nextCursor: string | null }>({
+    incidents: [],
+    nextCursor: null,
+  });
+  const incidents = list.incidents;
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [markingId, setMarkingId] = useState<string | null>(null);
 
+  // Refreshes the newest page; older pages already loaded with "Load more" are kept.
   const load = useCallback(async () => {
     setLoading(true);
     try {
-      const data = await fetchIncidents();
-      setIncidents(data.incidents);
+      const page = await fetchIncidents({ limit: PAGE_SIZE });
+      const ids = new Set(page.incidents.map((i) => i.id));
+      const oldest = page.incidents[page.incidents.length - 1]?.created_at;
+      setList((prev) => {
+        const older = oldest ? prev.incidents.filter((i) => !ids.has(i.id) && i.created_at < oldest) : [];
+        return {
+          incidents: [...page.incidents, ...older],
+          nextCursor: older.length > 0 ? prev.nextCursor : page.next_cursor,
+        };
+      });
     } catch (err) {
       console.error("Failed to fetch incidents:", err);
-      setIncidents([]);
+      setList({ incidents: [], nextCursor: null });
     } finally {
       setLoading(false);
     }
   }, []);
 
+  const loadMore = async () => {
+    if (!list.nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchIncidents({ limit: PAGE_SIZE, before: list.nextCursor });
+      setList((prev) => {
+        const ids = new Set(prev.incidents.map((i) => i.id));
+        return {
+          incidents: [...prev.incidents, ...page.incidents.filter((i) => !ids.has(i.id))],
+          nextCursor: page.next_cursor,
+        };
+      });
+    } catch (err) {
+      console.error("Failed to fetch more incidents:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     load();
     const id = setInterval(load, 10000);
@@ -46,9 +82,10 @@ export default function IncidentsPage() {
     setMarkingId(id);
     try {
       await markIncidentAttended(id);
-      setIncidents((prev) =>
-        prev.map((i) => (i.id === id ? { ...i, attended: true, status: "attended" } : i)),
-      );
+      setList((prev) => ({
+        ...prev,
+        incidents: prev.incidents.map((i) => (i.id === id ? { ...i, attended: true, status: "attended" } : i)),
+      }));
     } catch (err) {
       console.error("Failed to mark attended:", err);
     } finally {
@@ -144,6 +181,16 @@ export default function IncidentsPage() {
                 </div>
               </div>
             ))}
+            {list.nextCursor && (
+              <button
+                type="button"
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="w-full rounded border border-[#2d3238] py-2 text-sm text-amber-400 hover:bg-[#252a31] disabled:opacity-50"
+              >
+                {loadingMore ? "Loading…" : "Load more"}
+              </button>
+            )}
           </div>
         )}
       </div>
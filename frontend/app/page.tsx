@@ -10,8 +10,8 @@ import StatusBar from "@/components/StatusBar";
 import { useRadio } from "@/components/RadioProvider";
 import {
   fetchActiveDispatches,
+  fetchAllIncidents,
   fetchHexGrid,
-  fetchIncidents,
   fetchPatrolAlerts,
   fetchTrafficSignals,
   fetchVehicles,
@@ -20,12 +20,14 @@ import {
   runSimulation,
   updateSimulationConfig,
 } from "@/lib/api";
+import { withGeometry } from "@/lib/polyline";
 import { disconnectSocket, getSocketClient } from "@/lib/socket";
 import type {
   DispatchPayload,
   HexCell,
   Incident,
   PatrolAlert,
+  RoutePayload,
   SimulationConfig,
   SimulationResult,
   Vehicle,
@@ -111,7 +113,7 @@ export default function Home() {
           setVehiclesById(byId);
         }),
         fetchTrafficSignals().then((data) => setTrafficSignals(data.signals)),
-        fetchIncidents().then((data) => {
+        fetchAllIncidents().then((data) => {
           const mapped: Incident[] = data.incidents.map((i) => ({
             id: i.id,
             type: i.type as Incident["type"],
@@ -206,7 +208,8 @@ export default function Home() {
       );
     };
 
-    const onVehicleDispatched = (event: DispatchPayload) => {
+    const onVehicleDispatched = (payload: DispatchPayload) => {
+      const event = withGeometry(payload);
       setLastDispatch(event);
       const vehicle = event.vehicle;
       if (vehicle) {
@@ -226,14 +229,15 @@ export default function Home() {
         );
         // Radio playback handled by RadioProvider via radio_comm socket events
       }
-      if (event.route?.geometry) {
-        setRouteGeometry(event.route.geometry);
+      const geometry = event.route?.geometry;
+      if (geometry) {
+        setRouteGeometry(geometry);
         setAllDispatchRoutes((prev) => {
           const next = prev.filter((r) => r.incidentId !== event.incident_id);
           next.push({
             incidentId: event.incident_id,
             vehicleId: String(vehicle?.id ?? ""),
-            geometry: event.route!.geometry,
+            geometry,
           });
           return next;
         });
@@ -241,10 +245,8 @@ export default function Home() {
       setGreenCorridorHexes(event.green_corridor_hexes ?? []);
     };
 
-    const onRouteUpdate = (event: {
-      route: { geometry: [number, number][] };
-      green_corridor_hexes: string[];
-    }) => {
+    const onRouteUpdate = (payload: { route: RoutePayload; green_corridor_hexes: string[] }) => {
+      const event = withGeometry(payload);
       setRouteGeometry(event.route.geometry ?? []);
       setGreenCorridorHexes(event.green_corridor_hexes ?? []);
     };
@@ -287,6 +289,16 @@ export default function Home() {
       }
     };
 
+    const onDispatchPreempted = (event: { incident_id: string }) => {
+      // Its unit was redirected to a higher-priority incident; it waits for redispatch.
+      setIncidents((prev) =>
+        prev.map((i) =>
+          i.id === event.incident_id ? { ...i, assigned_vehicle_id: null, status: "new" } : i,
+        ),
+      );
+      setAllDispatchRoutes((prev) => prev.filter((r) => r.incidentId !== event.incident_id));
+    };
+
     const onIncidentAttended = (event: { incident_id: string }) => {
       setIncidents((prev) =>
         prev.map((i) =>
@@ -306,6 +318,7 @@ export default function Home() {
     socket.on("vehicle_position", onVehiclePosition);
     socket.on("vehicle_removed", onVehicleRemoved);
     socket.on("incident_attended", onIncidentAttended);
+    socket.on("dispatch_preempted", onDispatchPreempted);
 
     return () => {
       socket.off("connect", onConnect);
@@ -318,6 +331,7 @@ export default function Home() {
       socket.off("vehicle_position", onVehiclePosition);
       socket.off("vehicle_removed", onVehicleRemoved);
       socket.off("incident_attended", onIncidentAttended);
+      socket.off("dispatch_preempted", onDispatchPreempted);
       disconnectSocket();
     };
   }, []);
@@ -327,25 +341,33 @@ export default function Home() {
       setSubmittingIncident(true);
       try {
         const data = await postIncident(payload);
-        setIncidents((previous) => [data.incident, ...previous]);
-        setLastDispatch(data.dispatch);
+        // new_incident (and possibly vehicle_dispatched) may already have arrived over the socket.
+        setIncidents((previous) =>
+          previous.some((i) => i.id === data.incident.id) ? previous : [data.incident, ...previous],
+        );
         setAlerts((previous) => [...data.alerts, ...previous]);
-        const vehicle = data.dispatch.vehicle;
-        if (vehicle) {
-          setVehiclesById((previous) => ({ ...previous, [vehicle.id]: vehicle }));
-        }
-        if (data.dispatch.route?.geometry && data.dispatch.vehicle) {
-          setRouteGeometry(data.dispatch.route.geometry);
-          setAllDispatchRoutes((prev) => {
-            const next = prev.filter((r) => r.incidentId !== data.incident.id);
-            next.push({
-              incidentId: data.incident.id,
-              vehicleId: String(data.dispatch.vehicle.id),
-              geometry: data.dispatch.route.geometry,
+        // With background dispatch the result arrives via the vehicle_dispatched event.
+        const dispatch = data.dispatch;
+        if (dispatch) {
+          setLastDispatch(dispatch);
+          const vehicle = dispatch.vehicle;
+          if (vehicle) {
+            setVehiclesById((previous) => ({ ...previous, [vehicle.id]: vehicle }));
+          }
+          const geometry = dispatch.route?.geometry;
+          if (geometry && vehicle) {
+            setRouteGeometry(geometry);
+            setAllDispatchRoutes((prev) => {
+              const next = prev.filter((r) => r.incidentId !== data.incident.id);
+              next.push({
+                incidentId: data.incident.id,
+                vehicleId: String(vehicle.id),
+                geometry,
+              });
+              return next;
             });
-            return next;
-          });
-          setGreenCorridorHexes(data.dispatch.green_corridor_hexes ?? []);
+            setGreenCorridorHexes(dispatch.green_corridor_hexes ?? []);
+          }
         }
         if (radioEnabled) {
           void playIncidentRadio();
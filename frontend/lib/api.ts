@@ -2,6 +2,7 @@ import axios from "axios";
 
 import type {
   DispatchPayload,
+  DispatchStatus,
   HexCell,
   Incident,
   PatrolAlert,
@@ -9,6 +10,7 @@ import type {
   SimulationResult,
   TrafficSignal,
 } from "@/types";
+import { withGeometry } from "@/lib/polyline";
 
 const apiBaseURL = process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://localhost:8000";
 
@@ -21,7 +23,10 @@ export const api = axios.create({
 });
 
 export async function fetchHexGrid() {
-  const { data } = await api.get<{ resolution: number; inserted: number; cells: HexCell[] }>("/api/hex-grid");
+  // The browser revalidates with If-None-Match; an unchanged grid comes back as 304 from its cache.
+  const { data } = await api.get<{ resolution: number; version: string; inserted: number; cells: HexCell[] }>(
+    "/api/hex-grid",
+  );
   return data;
 }
 
@@ -46,10 +51,12 @@ export async function postIncident(payload: {
 }) {
   const { data } = await api.post<{
     incident: Incident;
-    dispatch: DispatchPayload;
+    // null when dispatch was queued; the result arrives via vehicle_dispatched
+    dispatch: DispatchPayload | null;
+    dispatch_status: DispatchStatus | null;
     alerts: PatrolAlert[];
   }>("/api/incidents", payload);
-  return data;
+  return { ...data, dispatch: data.dispatch ? withGeometry(data.dispatch) : null };
 }
 
 export async function fetchPatrolAlerts() {
@@ -121,11 +128,43 @@ export interface IncidentListItem {
   created_at: string;
 }
 
-export async function fetchIncidents() {
-  const { data } = await api.get<{ incidents: IncidentListItem[] }>("/api/incidents");
+export interface IncidentPage {
+  incidents: IncidentListItem[];
+  next_cursor: string | null;
+}
+
+export interface IncidentQuery {
+  /** next_cursor of the previous page */
+  before?: string;
+  /** Page size; the backend defaults to 200 and caps at 1000 */
+  limit?: number;
+  attended?: boolean;
+  status?: string;
+  type?: string;
+  hex_id?: string;
+  source?: string;
+  since?: string;
+  until?: string;
+}
+
+/** One page of incidents, newest first. Pass `next_cursor` back as `before` for the next one. */
+export async function fetchIncidents(query: IncidentQuery = {}) {
+  const { data } = await api.get<IncidentPage>("/api/incidents", { params: query });
   return data;
 }
 
+/** Every matching incident: follows next_cursor until the last page. */
+export async function fetchAllIncidents(query: Omit<IncidentQuery, "before" | "limit"> = {}) {
+  const incidents: IncidentListItem[] = [];
+  let before: string | undefined;
+  do {
+    const page = await fetchIncidents({ ...query, limit: 1000, before });
+    incidents.push(...page.incidents);
+    before = page.next_cursor ?? undefined;
+  } while (before);
+  return { incidents };
+}
+
 export async function markIncidentAttended(incidentId: string) {
   const { data } = await api.patch<{ ok: boolean }>(`/api/incidents/${incidentId}/attended`);
   return data;
@@ -138,16 +177,15 @@ export interface DispatchItem {
 }
 
 export async function fetchActiveDispatches() {
-  const { data } = await api.get<{ dispatches: DispatchPayload[] }>("/api/dispatches/active");
-  return data;
+  const { data } = await api.get<{ dispatches: DispatchPayload[]; partial?: boolean }>("/api/dispatches/active");
+  return { ...data, dispatches: data.dispatches.map(withGeometry) };
 }
 
 export async function fetchDispatches(): Promise<{ dispatches: DispatchItem[] }> {
-  const [incRes, vehRes] = await Promise.all([
-    api.get<{ incidents: IncidentListItem[] }>("/api/incidents"),
+  const [{ incidents }, vehRes] = await Promise.all([
+    fetchAllIncidents({ attended: false }),
     api.get<{ vehicles: import("@/types").Vehicle[] }>("/api/vehicles"),
   ]);
-  const incidents = incRes.data.incidents;
   const vehicles = vehRes.data.vehicles;
   const active = incidents.filter(
     (i) => !i.attended && i.assigned_vehicle_id && ["assigned", "dispatched", "new"].includes(i.status),
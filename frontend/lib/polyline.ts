@@ -0,0 +1,35 @@
+import type { RoutePayload } from "@/types";
+
+// Google encoded polyline (precision 5), as sent by the backend in route.polyline.
+export function decodePolyline(encoded: string, precision = 5): [number, number][] {
+  const factor = 10 ** precision;
+  const points: [number, number][] = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+  while (index < encoded.length) {
+    const deltas = [0, 0];
+    for (let k = 0; k < 2; k++) {
+      let shift = 0;
+      let result = 0;
+      let chunk: number;
+      do {
+        chunk = encoded.charCodeAt(index++) - 63;
+        result |= (chunk & 0x1f) << shift;
+        shift += 5;
+      } while (chunk >= 0x20);
+      deltas[k] = result & 1 ? ~(result >> 1) : result >> 1;
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / factor, lng / factor]);
+  }
+  return points;
+}
+
+// Fill route.geometry from route.polyline so map code can keep using [lat, lng] lists.
+export function withGeometry<T extends { route?: RoutePayload }>(payload: T): T {
+  const route = payload.route;
+  if (!route || route.geometry || !route.polyline) return payload;
+  return { ...payload, route: { ...route, geometry: decodePolyline(route.polyline) } };
+}
@@ -50,8 +50,11 @@ export interface PatrolAlert {
 export interface RoutePayload {
   distance_m: number | null;
   duration_s: number | null;
-  geometry: [number, number][];
-  source: "osrm" | "fallback";
+  /** Encoded polyline from the server; decoded into geometry by withGeometry() */
+  polyline?: string;
+  precision?: "full" | "simplified";
+  geometry?: [number, number][];
+  source: "osrm" | "local" | "fallback";
 }
 
 export interface DispatchPayload {
@@ -59,9 +62,24 @@ export interface DispatchPayload {
   vehicle: Vehicle | null;
   route?: RoutePayload;
   green_corridor_hexes?: string[];
+  eta_s?: number | null;
+  eta_source?: string | null;
+  /** Set by GET /api/dispatches/active */
+  leg?: "to_scene" | "to_hospital";
+  route_timed_out?: boolean;
+  route_stored?: boolean;
+  route_store_failed?: boolean;
   message?: string;
 }
 
+export interface DispatchStatus {
+  incident_id: string;
+  state: "queued" | "dispatching" | "assigned" | "waiting" | "deferred" | "failed" | "attended";
+  vehicle_id?: string | null;
+  eta_s?: number | null;
+  error?: string;
+}
+
 export interface SimulationConfig {
   hex_id?: string;
   incident_type?: IncidentType;